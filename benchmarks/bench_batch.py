@@ -0,0 +1,77 @@
+# Batch assembly benchmark: preprocess --schedule + assemble of many synthetic programs (see
+# synthetic.py) with a `python -m isa_assembler` process per step and file, and with the batch
+# command (`python -m isa_assembler batch`) on 1 and on --jobs worker processes. Outputs are compared
+# with the per-file ones; throughput is files and instructions per second of wall time.
+#
+# usage: python benchmarks/bench_batch.py [--files N] [--instructions N] [--jobs N] [--isa rv32im_isa.csv]
+
+import argparse
+import filecmp
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from isa_assembler import convert
+from synthetic import write_program
+
+ENV = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get('PYTHONPATH', ''))
+
+
+def run(*argv):
+    subprocess.run([sys.executable, '-m', 'isa_assembler', *argv], check=True, env=ENV, stdout=subprocess.DEVNULL)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="many files: one process per file vs. the batch command")
+    parser.add_argument('--files', type=int, default=40)
+    parser.add_argument('--instructions', type=int, default=2000, help="instructions per file (default: %(default)s)")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help="workers of the parallel batch (default: %(default)s)")
+    parser.add_argument('--isa', default=convert.ISA_FILENAME)
+    args = parser.parse_args()
+    isa = os.path.abspath(args.isa)
+    total = args.files * args.instructions
+
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, 'src')
+        sources = []
+        for i in range(args.files):
+            directory = os.path.join(src, f'dir{i % 4}')
+            os.makedirs(directory, exist_ok=True)
+            sources.append(os.path.join(directory, f'file{i}.asm'))
+            write_program(sources[-1], args.instructions, seed=i)
+
+        print(f"{args.files} files x {args.instructions} instructions")
+        print(f"{'mode':<24} | {'seconds':>8} | {'files/s':>8} | {'inst/s':>10} | speedup")
+        print('-' * 68)
+        start = time.perf_counter()
+        for source in sources:
+            out1, out2 = source[:-4] + '_out1.txt', source[:-4] + '_out2.bin'
+            run('--isa', isa, 'preprocess', source, '--schedule', '-o', out1)
+            run('--isa', isa, 'assemble', out1, '-o', out2)
+        base = time.perf_counter() - start
+        print(f"{'process per file':<24} | {base:>8.2f} | {args.files / base:>8.1f} | {total / base:>10,.0f} |")
+
+        for jobs in sorted({1, args.jobs}):
+            out_dir = os.path.join(tmp, f'out{jobs}')
+            report = os.path.join(tmp, f'report{jobs}.json')
+            start = time.perf_counter()
+            run('--isa', isa, 'batch', os.path.join(src, '**', '*.asm'), '-o', out_dir, '-j', str(jobs), '--report', report)
+            seconds = time.perf_counter() - start
+            with open(report) as f:
+                totals = json.load(f)['totals']
+            assert totals['failed'] == 0 and totals['instructions'] == total
+            for source in sources:
+                relative = os.path.relpath(source[:-4], src)
+                for suffix in ('_out1.txt', '_out2.bin'):
+                    assert filecmp.cmp(source[:-4] + suffix, os.path.join(out_dir, relative + suffix), shallow=False), source
+            print(f"{f'batch -j {jobs}':<24} | {seconds:>8.2f} | {args.files / seconds:>8.1f} | {total / seconds:>10,.0f} | {base / seconds:>6.1f}x")
+
+
+if __name__ == '__main__':
+    main()
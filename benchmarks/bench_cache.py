@@ -0,0 +1,49 @@
+# Artifact cache benchmark: preprocess_file(schedule=True) + assemble_file() of synthetic programs
+# (see synthetic.py) without a cache, on a cache miss (work + store) and on a cache hit (copy out).
+#
+# usage: python benchmarks/bench_cache.py [--sizes N ...] [--isa rv32im_isa.csv]
+
+import argparse
+import filecmp
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from isa_assembler import Assembler, convert
+from isa_assembler.cache import ArtifactCache
+from synthetic import write_program
+
+
+def run(assembler, src, tmp, tag):
+    start = time.perf_counter()
+    out1 = assembler.preprocess_file(src, os.path.join(tmp, f'{tag}_out1.txt'), schedule=True)
+    out2 = assembler.assemble_file(out1, os.path.join(tmp, f'{tag}_out2.bin'))
+    return time.perf_counter() - start, out2
+
+
+def main():
+    parser = argparse.ArgumentParser(description="assembly time without a cache, on a miss and on a hit")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument('--isa', default=convert.ISA_FILENAME)
+    args = parser.parse_args()
+
+    plain = Assembler(isa_filename=args.isa)
+    print(f"{'instructions':>12} | {'no cache':>9} | {'miss':>9} | {'hit':>9} | {'speedup':>7}")
+    with tempfile.TemporaryDirectory() as tmp:
+        cached = Assembler(isa=plain.isa, cache=ArtifactCache(os.path.join(tmp, 'cache')))
+        for n in args.sizes:
+            src = os.path.join(tmp, f'bench{n}.asm')
+            write_program(src, n)
+            base, expected = run(plain, src, tmp, 'plain')
+            miss, _ = run(cached, src, tmp, 'miss')
+            hit, out = run(cached, src, tmp, 'hit')
+            assert filecmp.cmp(expected, out, shallow=False), "cached output differs"
+            print(f"{n:>12} | {base:>7.3f} s | {miss:>7.3f} s | {hit:>7.4f} s | {base / hit:>6.0f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+# Daemon latency benchmark: per-file latency of preprocess --schedule + assemble on small synthetic
+# programs (see synthetic.py) with a fresh `python -m isa_assembler` process per step (cold), with the
+# thin client (`python -m isa_assembler.client`) talking to a running daemon, one process per step
+# and file or one per step for all files, and with requests over one open connection (the daemon's
+# own latency). Outputs are compared. The batched mode reports its average time per file.
+#
+# usage: python benchmarks/bench_daemon.py [--files N] [--instructions N] [--isa rv32im_isa.csv]
+
+import argparse
+import filecmp
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from isa_assembler import convert
+from isa_assembler.client import Client
+from synthetic import write_program
+
+ENV = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get('PYTHONPATH', ''))
+
+
+def run(*argv):
+    subprocess.run([sys.executable, '-m', *argv], check=True, env=ENV, stdout=subprocess.DEVNULL)
+
+
+def wait_for(socket_path, timeout=30):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with Client(socket_path) as client:
+                client.request('ping')
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+
+
+def summary(name, latencies, base=None):
+    median = statistics.median(latencies)
+    p95 = sorted(latencies)[int(0.95 * (len(latencies) - 1))]
+    speedup = f"{base / median:>6.1f}x" if base else f"{'':>7}"
+    print(f"{name:<28} | {1000 * median:>8.1f} ms | {1000 * p95:>8.1f} ms | {speedup}")
+    return median
+
+
+def main():
+    parser = argparse.ArgumentParser(description="per-file latency: cold process vs. daemon")
+    parser.add_argument('--files', type=int, default=30)
+    parser.add_argument('--instructions', type=int, default=200, help="instructions per file (default: %(default)s)")
+    parser.add_argument('--isa', default=convert.ISA_FILENAME)
+    args = parser.parse_args()
+    isa = os.path.abspath(args.isa)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sources = []
+        for i in range(args.files):
+            sources.append(os.path.join(tmp, f'file{i}.asm'))
+            write_program(sources[-1], args.instructions, seed=i)
+        socket_path = os.path.join(tmp, 'daemon.sock')
+        daemon = subprocess.Popen([sys.executable, '-m', 'isa_assembler', '--isa', isa, 'serve', '--socket', socket_path],
+                                  env=ENV, stderr=subprocess.DEVNULL)
+        try:
+            wait_for(socket_path)
+            modes = {}
+
+            latencies = []
+            for src in sources:
+                out1, out2 = src[:-4] + '_cold_out1.txt', src[:-4] + '_cold_out2.bin'
+                start = time.perf_counter()
+                run('isa_assembler', '--isa', isa, 'preprocess', src, '--schedule', '-o', out1)
+                run('isa_assembler', '--isa', isa, 'assemble', out1, '-o', out2)
+                latencies.append(time.perf_counter() - start)
+            modes['cold process'] = latencies
+
+            latencies = []
+            for src in sources:
+                out1, out2 = src[:-4] + '_client_out1.txt', src[:-4] + '_client_out2.bin'
+                start = time.perf_counter()
+                run('isa_assembler.client', '--socket', socket_path, 'preprocess', src, '--schedule', '-o', out1)
+                run('isa_assembler.client', '--socket', socket_path, 'assemble', out1, '-o', out2)
+                latencies.append(time.perf_counter() - start)
+            modes['client process + daemon'] = latencies
+
+            # one client process for every file of a step, as a build system would batch them
+            start = time.perf_counter()
+            run('isa_assembler.client', '--socket', socket_path, 'preprocess', *sources, '--schedule')
+            run('isa_assembler.client', '--socket', socket_path, 'assemble', *[src[:-4] + '_out1.txt' for src in sources])
+            modes['batched client + daemon'] = [(time.perf_counter() - start) / len(sources)]
+
+            latencies = []
+            with Client(socket_path) as client:
+                for src in sources:
+                    out1, out2 = src[:-4] + '_conn_out1.txt', src[:-4] + '_conn_out2.bin'
+                    start = time.perf_counter()
+                    client.request('preprocess', file=src, output=out1, schedule=True)
+                    client.request('assemble', file=out1, output=out2)
+                    latencies.append(time.perf_counter() - start)
+                modes['open connection + daemon'] = latencies
+                client.request('shutdown')
+        finally:
+            daemon.wait(timeout=30)
+
+        for src in sources:
+            cold = src[:-4] + '_cold_out2.bin'
+            for out2 in (src[:-4] + '_client_out2.bin', src[:-4] + '_conn_out2.bin', src[:-4] + '_out2.bin'):
+                assert filecmp.cmp(cold, out2, shallow=False), "daemon output differs"
+
+    print(f"{args.files} files of {args.instructions} instructions, preprocess --schedule + assemble per file")
+    print(f"{'mode':<28} | {'median':>11} | {'p95':>11} | {'speedup':>7}")
+    base = None
+    for name, latencies in modes.items():
+        median = summary(name, latencies, base)
+        base = base or median
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+# Dependency check microbenchmark: cost of one "does A write a register B reads" test,
+# string operands (get_rd(A) in get_rs(B)) vs. precomputed register bitmasks (defs & uses).
+#
+# usage: python benchmarks/bench_dependency_check.py [--pairs N] [--repeat N]
+
+import argparse
+import os
+import random
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from isa_assembler import rearrange
+from bench_scheduler import make_block
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--pairs', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    block = make_block(1_000)
+    rng = random.Random(0)
+    pairs = [(rng.randrange(len(block)), rng.randrange(len(block))) for _ in range(args.pairs)]
+
+    def strings():
+        get_rd, get_rs = rearrange.get_rd, rearrange.get_rs
+        return [get_rd(block[a]) in get_rs(block[b]) for a, b in pairs]
+
+    def analyse():
+        return [rearrange.get_reg_masks(instruction) for instruction in block]
+
+    masks = analyse()
+    def bitmasks():
+        return [bool(masks[a][1] & masks[b][0]) for a, b in pairs]
+
+    string_time = min(timeit.repeat(strings, number=1, repeat=args.repeat))
+    mask_time = min(timeit.repeat(bitmasks, number=1, repeat=args.repeat))
+    analyse_time = min(timeit.repeat(analyse, number=1, repeat=args.repeat))
+    print(f"{'check':<22} | {'ns/check':>9}")
+    print(f"{'get_rd() in get_rs()':<22} | {string_time / args.pairs * 1e9:>9.0f}")
+    print(f"{'defs & uses':<22} | {mask_time / args.pairs * 1e9:>9.0f}")
+    print(f"one-time analysis: {analyse_time / len(block) * 1e9:.0f} ns/instruction")
+    print(f"speedup per check: {string_time / mask_time:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
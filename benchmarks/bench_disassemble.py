@@ -0,0 +1,49 @@
+# Round-trip benchmark: synthetic programs (see synthetic.py) are pre-processed and encoded, saved as
+# text (*_out2.bin) and raw images, then read back and disassembled with decode.disassemble_file().
+# Every disassembly must equal the pre-processed instructions and encode back to the same words.
+#
+# usage: python benchmarks/bench_disassemble.py [--sizes N ...] [--isa rv32im_isa.csv]
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from isa_assembler import convert, decode, preprocess, rearrange
+from synthetic import generate_program
+
+
+def main():
+    parser = argparse.ArgumentParser(description="disassembly throughput of text and raw machine code")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--isa', default=convert.ISA_FILENAME)
+    args = parser.parse_args()
+
+    isa = convert.get_isa(args.isa)
+    table = convert.build_encoder_table(isa)
+    index = decode.build_decode_index(decode.build_decode_table(isa))
+    print(f"{'instructions':>12} | {'format':>6} | {'read':>9} | {'decode':>9} | {'words/s':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.sizes:
+            inst_asm = preprocess.preprocess(rearrange.tokenize(generate_program(n)), isa)
+            words = convert.encode_machine_code(inst_asm, isa, table)
+            for fmt in ('text', 'raw'):
+                filename = os.path.join(tmp, 'bench_out' + ('2.bin' if fmt == 'text' else '2.img'))
+                convert.save_bin(words, filename, fmt)
+                start = time.perf_counter()
+                read = decode.read_program(filename, fmt)
+                middle = time.perf_counter()
+                back = decode.disassemble_words(read, isa, index)
+                end = time.perf_counter()
+                assert back == inst_asm, "disassembly differs from the pre-processed instructions"
+                assert convert.encode_machine_code(back, isa, table) == words, "round trip changed the machine code"
+                print(f"{len(words):>12} | {fmt:>6} | {middle - start:>7.3f} s | {end - middle:>7.3f} s | "
+                      f"{len(words) / (end - start) / 1e6:>7.2f} M")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+# Import-time benchmark: cost of `import isa_assembler` (and each module) in a fresh interpreter.
+#
+# usage: python benchmarks/bench_import_time.py [--repeat N]
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = ['isa_assembler', 'isa_assembler.convert', 'isa_assembler.rearrange', 'isa_assembler.__main__']
+
+
+## Best wall time of a fresh interpreter running `code`
+def run(code, repeat, cwd=None):
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    best = float('inf')
+    for _ in range(repeat):
+        start = timeit.default_timer()
+        subprocess.run([sys.executable, '-c', code], env=env, cwd=cwd, check=True)
+        best = min(best, timeit.default_timer() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    baseline = run('pass', args.repeat)
+    print(f"{'module':<24} | {'import':>10}")
+    print(f"{'(interpreter start)':<24} | {baseline*1e3:>7.2f} ms")
+    # run from an empty directory: importing must not need rv32im_isa.csv or any example file
+    with tempfile.TemporaryDirectory() as cwd:
+        for module in MODULES:
+            elapsed = run(f"import {module}", args.repeat, cwd)
+            print(f"{module:<24} | {(elapsed - baseline)*1e3:>7.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+# Incremental reassembly benchmark: full rebuild (reorder_program -> preprocess -> encode_machine_code)
+# vs. IncrementalAssembler.build() after editing a few lines of a synthetic program (see synthetic.py).
+# Each edit replaces, inserts or deletes one instruction, so later subsets move; every incremental
+# result is checked against the full rebuild.
+#
+# usage: python benchmarks/bench_incremental.py [--sizes N ...] [--edits N] [--rounds N] [--isa rv32im_isa.csv]
+
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from isa_assembler import Assembler, convert, preprocess, rearrange
+from synthetic import generate_program
+
+
+def full_build(lines, isa, table):
+    instructions = rearrange.reorder_program(rearrange.tokenize(lines))
+    return convert.encode_machine_code(preprocess.preprocess(instructions, isa), isa, table)
+
+
+## Replaces, inserts or deletes `edits` instructions (never labels, branches or jumps)
+def edit(lines, edits, rng):
+    done = 0
+    while done < edits:
+        i = rng.randrange(len(lines))
+        op = lines[i].split()[0]
+        if op.endswith(':') or op in ('jal', 'beq', 'bne', 'blt', 'bge'):
+            continue
+        kind = rng.random()
+        if kind < 0.4:
+            lines[i] = "    add t0, t1, t2\n"
+        elif kind < 0.7:
+            lines.insert(i, "    xor a0, a0, a1\n")
+        else:
+            del lines[i]
+        done += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="full vs. incremental rebuilds after small edits")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--edits', type=int, default=5, help="lines edited between builds (default: 5)")
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--isa', default=convert.ISA_FILENAME)
+    args = parser.parse_args()
+
+    assembler = Assembler(isa_filename=args.isa)
+    isa, table = assembler.isa, assembler.encoder_table
+    print(f"{'instructions':>12} | {'full':>9} | {'cold':>9} | {'warm':>9} | {'speedup':>7} | {'hit rate':>8} | {'saved':>9}")
+    for n in args.sizes:
+        rng = random.Random(n)
+        lines = generate_program(n)
+        builder = assembler.incremental()
+        start = time.perf_counter()
+        builder.build(lines)
+        cold = time.perf_counter() - start
+        full = warm = 0.0
+        hit_rate = saved = 0.0
+        for _ in range(args.rounds):
+            edit(lines, args.edits, rng)
+            start = time.perf_counter()
+            words = builder.build(lines)
+            warm += time.perf_counter() - start
+            start = time.perf_counter()
+            expected = full_build(lines, isa, table)
+            full += time.perf_counter() - start
+            assert words == expected, "incremental build differs from the full rebuild"
+            hit_rate += builder.stats['hit_rate']
+            saved += builder.stats['saved_seconds']
+        full, warm = full / args.rounds, warm / args.rounds
+        print(f"{n:>12} | {full:>7.3f} s | {cold:>7.3f} s | {warm:>7.3f} s | {full / warm:>6.1f}x | "
+              f"{100 * hit_rate / args.rounds:>7.2f}% | {saved / args.rounds:>7.3f} s")
+
+
+if __name__ == '__main__':
+    main()
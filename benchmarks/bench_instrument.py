@@ -0,0 +1,70 @@
+# Instrumentation overhead: the full pipeline (tokenize -> reorder_program -> preprocess -> encode ->
+# save_bin) on a synthetic program with instrument.py disabled, enabled, and enabled with a Chrome trace.
+#
+# usage: python benchmarks/bench_instrument.py [--instructions N] [--repeat N] [--isa rv32im_isa.csv]
+
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from isa_assembler import convert, instrument, preprocess, rearrange
+from synthetic import write_program
+
+
+def run_pipeline(src, tmp, isa):
+    instructions = rearrange.reorder_program(rearrange.tokenize_file(src))
+    out1 = os.path.join(tmp, 'bench_out1.txt')
+    preprocess.save_processed(preprocess.preprocess(instructions, isa), out1)
+    words = convert.encode_machine_code(convert.read_processed(out1, isa), isa)
+    convert.save_bin(words, os.path.join(tmp, 'bench_out2.bin'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="instrumentation overhead on the full pipeline")
+    parser.add_argument('--instructions', type=int, default=200_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--isa', default=convert.ISA_FILENAME)
+    args = parser.parse_args()
+
+    isa = convert.get_isa(args.isa)
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, 'bench.asm')
+        write_program(src, args.instructions)
+        times = {}
+        # interleaved so drift in machine load affects every mode alike
+        for _ in range(args.repeat):
+            for mode in ('disabled', 'enabled', 'trace'):
+                if mode != 'disabled':
+                    instrument.reset()
+                    instrument.enable(trace=mode == 'trace')
+                gc.collect()
+                seconds = timeit.timeit(lambda: run_pipeline(src, tmp, isa), number=1)
+                instrument.disable()
+                times[mode] = min(seconds, times.get(mode, seconds))
+
+    print(f"{'mode':<9} | {'time':>9} | {'overhead':>8}")
+    for mode, seconds in times.items():
+        print(f"{mode:<9} | {seconds:>7.3f} s | {100 * (seconds / times['disabled'] - 1):>7.2f}%")
+    report = instrument.report()
+    print(f"events: {report['events']}")
+
+    # the wall-clock difference is within run-to-run noise; this estimate is not:
+    # one record per stage call and at most two counter updates per scheduled subset
+    calls = sum(entry['calls'] for stage in report['stages'].values() for entry in stage['functions'].values())
+    updates = 2 * report['events'].get('schedule.subsets', 0)
+    probe = instrument.timed('probe')(lambda: None)
+    instrument.enable(trace=True)
+    call_cost = min(timeit.repeat(probe, number=100_000, repeat=3)) / 100_000
+    update_cost = min(timeit.repeat(lambda: instrument.count('probe'), number=100_000, repeat=3)) / 100_000
+    instrument.disable()
+    print(f"{calls} stage calls at {call_cost * 1e6:.2f} us and {updates} counter updates at {update_cost * 1e6:.2f} us: "
+          f"{100 * (calls * call_cost + updates * update_cost) / times['disabled']:.3f}% of the pipeline")
+
+if __name__ == '__main__':
+    main()
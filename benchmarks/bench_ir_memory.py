@@ -0,0 +1,79 @@
+# Memory benchmark of the program representations: bytes per instruction of the token lists
+# (convert.read_processed, rearrange.tokenize_file) and of ir.Program on synthetic programs
+# (see synthetic.py), measured with tracemalloc, plus read and encode times of both.
+#
+# usage: python benchmarks/bench_ir_memory.py [--sizes N ...] [--isa rv32im_isa.csv]
+
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from isa_assembler import convert, ir, preprocess, rearrange
+from synthetic import write_program
+
+
+def allocated(build):
+    '''(result, bytes still allocated by build() once it returns)'''
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+
+def timed(build):
+    start = time.perf_counter()
+    result = build()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="bytes per instruction of token lists vs. ir.Program")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--isa', default=convert.ISA_FILENAME)
+    args = parser.parse_args()
+
+    isa = convert.get_isa(args.isa)
+    table = convert.build_encoder_table(isa)
+    print(f"{'instructions':>12} | {'representation':<30} | {'bytes/inst':>10} | {'read':>9} | {'encode':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.sizes:
+            src = os.path.join(tmp, f'bench{n}.asm')
+            write_program(src, n)
+            out1 = os.path.join(tmp, f'bench{n}_out1.txt')
+            preprocess.save_processed(preprocess.preprocess(rearrange.tokenize_file(src), isa), out1)
+
+            rows = [
+                ('tokenize_file (lists)', lambda: rearrange.tokenize_file(src), None),
+                ('Program.from_lists (source)', lambda: ir.Program.from_lists(rearrange.tokenize_file(src), isa), None),
+                ('read_processed (lists)', lambda: convert.read_processed(out1, isa),
+                 lambda program: convert.encode_machine_code(program, isa, table)),
+                ('read_processed_program', lambda: ir.read_processed_program(out1, isa),
+                 lambda program: ir.encode_program(program, table)),
+            ]
+            words = None
+            for name, build, encode in rows:
+                result, size = allocated(build)
+                del result
+                result, read = timed(build)
+                encoded = ''
+                if encode is not None:
+                    encoded_words, seconds = timed(lambda: encode(result))
+                    assert words is None or encoded_words == words, "encoders differ"
+                    words = encoded_words
+                    encoded = f"{seconds:.3f} s"
+                print(f"{n:>12} | {name:<30} | {size / n:>10.1f} | {read:>7.3f} s | {encoded:>9}")
+                del result
+
+
+if __name__ == '__main__':
+    main()
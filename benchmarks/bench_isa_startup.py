@@ -0,0 +1,50 @@
+# Startup-time benchmark: loading `rv32im_isa.csv` by parsing the csv vs. from the binary cache.
+#
+# usage: python benchmarks/bench_isa_startup.py [path/to/rv32im_isa.csv] [--repeat N]
+
+import argparse
+import os
+import subprocess
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from isa_assembler import isa_table
+
+
+## Time a fresh interpreter that imports isa_table and loads the table once
+def cold_start(csv_path, use_cache, repeat):
+    code = f"from isa_assembler import isa_table; isa_table.load_isa({csv_path!r}, use_cache={use_cache})"
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    best = float('inf')
+    for _ in range(repeat):
+        start = timeit.default_timer()
+        subprocess.run([sys.executable, '-c', code], env=env, check=True)
+        best = min(best, timeit.default_timer() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('csv', nargs='?', default='rv32im_isa.csv')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    # warm the cache so the cached runs measure a hit
+    isa_table.load_isa(args.csv)
+
+    number = 1000
+    csv_load = min(timeit.repeat(lambda: isa_table.load_isa(args.csv, use_cache=False), number=number, repeat=5)) / number
+    cached_load = min(timeit.repeat(lambda: isa_table.load_isa(args.csv), number=number, repeat=5)) / number
+    print(f"{'load':<24} | {'csv':>12} | {'cache':>12} | {'speedup':>7}")
+    print(f"{'in-process load_isa()':<24} | {csv_load*1e6:>9.1f} us | {cached_load*1e6:>9.1f} us | {csv_load/cached_load:>6.2f}x")
+
+    csv_cold = cold_start(args.csv, False, args.repeat)
+    cached_cold = cold_start(args.csv, True, args.repeat)
+    print(f"{'cold process start':<24} | {csv_cold*1e3:>9.2f} ms | {cached_cold*1e3:>9.2f} ms | {csv_cold/cached_cold:>6.2f}x")
+
+
+if __name__ == '__main__':
+    main()
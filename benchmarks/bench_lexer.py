@@ -0,0 +1,74 @@
+# Lexer benchmark: the four rearrange passes vs. the single-pass iter_tokens(), in lines/s.
+#
+# usage: python benchmarks/bench_lexer.py [example.asm] [--lines N] [--repeat N]
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from isa_assembler import rearrange
+
+REGS = ['zero', 'ra', 'sp', 's0', 's1', 'a0', 'a1', 'a2', 't0', 't1', 't2', 't3', 't4', 't5', 't6']
+
+
+## Assembly source in the style of example.asm: labels, comments, R/I-type and lw/sw
+def write_source(filename, n, seed=0):
+    rng = random.Random(seed)
+    with open(filename, 'w') as f:
+        for i in range(n):
+            kind = rng.random()
+            if kind < 0.05:
+                f.write(f"block{i}:\n")
+            elif kind < 0.10:
+                f.write("    # a full-line comment\n")
+            elif kind < 0.12:
+                f.write("\n")
+            elif kind < 0.35:
+                op = rng.choice(['lw', 'sw'])
+                f.write(f"    {op} {rng.choice(REGS)}, {4 * rng.randrange(64)}({rng.choice(REGS)})\n")
+            else:
+                op = rng.choice(['add', 'sub', 'or', 'and', 'addi'])
+                last = str(rng.randrange(-64, 64)) if op == 'addi' else rng.choice(REGS)
+                comment = "    # trailing comment" if rng.random() < 0.3 else ""
+                f.write(f"    {op} {rng.choice(REGS)}, {rng.choice(REGS)}, {last}{comment}\n")
+
+
+def four_passes(filename):
+    instructions = rearrange.read(filename)
+    instructions = rearrange.remove_comments(instructions)
+    instructions = rearrange.split_arg(instructions)
+    instructions = rearrange.remove_empty(instructions)
+    return rearrange.loadsave_arg_reorder(instructions)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('source', nargs='?', help="assembly file to check for parity (e.g. example.asm)")
+    parser.add_argument('--lines', type=int, default=200_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    if args.source:
+        assert rearrange.tokenize_file(args.source) == four_passes(args.source), "lexer output differs"
+        print(f"parity on {args.source}: ok")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, 'bench.asm')
+        write_source(src, args.lines)
+        assert rearrange.tokenize_file(src) == four_passes(src), "lexer output differs"
+        legacy = min(timeit.repeat(lambda: four_passes(src), number=1, repeat=args.repeat))
+        fused = min(timeit.repeat(lambda: rearrange.tokenize_file(src), number=1, repeat=args.repeat))
+    print(f"{'lexer':<12} | {'time':>9} | {'lines/s':>10}")
+    print(f"{'four passes':<12} | {legacy:>7.3f} s | {args.lines / legacy:>10.0f}")
+    print(f"{'single pass':<12} | {fused:>7.3f} s | {args.lines / fused:>10.0f}")
+    print(f"speedup: {legacy / fused:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+# Output format benchmark: file size and write throughput of each save_bin() format.
+#
+# usage: python benchmarks/bench_output_formats.py [--words N] [--repeat N]
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import timeit
+from array import array
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from isa_assembler import convert, output
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--words', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    words = array('I', [rng.getrandbits(32) for _ in range(args.words)])
+    strings = [format(word, '032b') for word in words]
+
+    print(f"{'format':<16} | {'size':>10} | {'bytes/inst':>10} | {'write':>9} | {'MB/s':>8} | {'Minst/s':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        cases = [('text (strings)', lambda path: convert.save_bin(strings, path))]
+        cases += [(fmt, lambda path, fmt=fmt: convert.save_bin(words, path, fmt)) for fmt in output.FORMATS]
+        for name, write in cases:
+            path = os.path.join(tmp, 'out')
+            elapsed = min(timeit.repeat(lambda: write(path), number=1, repeat=args.repeat))
+            size = os.path.getsize(path)
+            print(f"{name:<16} | {size:>10} | {size / args.words:>10.2f} | {elapsed:>7.3f} s"
+                  f" | {size / elapsed / 1e6:>8.1f} | {args.words / elapsed / 1e6:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+# Scaling benchmark for sharded multi-core encoding of one *_out1.txt file.
+#
+# usage: python benchmarks/bench_parallel_encoding.py [path/to/rv32im_isa.csv] [--lines N] [--workers 1 2 4 ...]
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from isa_assembler import convert, load_isa, parallel
+from bench_streaming import write_program
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('csv', nargs='?', default='rv32im_isa.csv')
+    parser.add_argument('--lines', type=int, default=10_000_000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    parser.add_argument('--format', default='raw', choices=sorted(parallel.RECORD_BYTES))
+    args = parser.parse_args()
+
+    isa = load_isa(args.csv)
+    print(f"{os.cpu_count()} cores, {args.lines} lines, {args.format} output")
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, 'bench_out1.txt')
+        out = os.path.join(tmp, 'bench_out2')
+        write_program(src, isa, args.lines)
+
+        start = time.perf_counter()
+        convert.stream_machine_code(src, out, isa=isa, fmt=args.format)
+        serial = time.perf_counter() - start
+        with open(out, 'rb') as f:
+            expected = f.read()
+        print(f"{'workers':>7} | {'time':>9} | {'Mlines/s':>8} | {'speedup':>7} | {'efficiency':>10}")
+        print(f"{'serial':>7} | {serial:>7.2f} s | {args.lines / serial / 1e6:>8.2f} | {1:>6.2f}x | {'':>10}")
+        for workers in args.workers:
+            start = time.perf_counter()
+            parallel.encode_file_parallel(src, out, workers, args.format, isa=isa)
+            elapsed = time.perf_counter() - start
+            with open(out, 'rb') as f:
+                assert f.read() == expected, "parallel output differs from the serial output"
+            speedup = serial / elapsed
+            print(f"{workers:>7} | {elapsed:>7.2f} s | {args.lines / elapsed / 1e6:>8.2f} | {speedup:>6.2f}x | {speedup / workers:>9.0%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+# Parallel scheduling benchmark: reorder_program() vs. parallel.schedule_program_parallel() on
+# synthetic programs (see synthetic.py) for several worker counts. Every parallel result is
+# checked against the serial one. Speedups need as many free cores as workers.
+#
+# usage: python benchmarks/bench_parallel_scheduling.py [--sizes N ...] [--workers N ...] [--engine schedule|reorder]
+
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from isa_assembler import parallel, rearrange
+from synthetic import generate_program
+
+ENGINES = {'schedule': rearrange.schedule_instructions, 'reorder': rearrange.reorder_instructions}
+
+
+def serial(instructions, engine):
+    reordered = []
+    for subset in rearrange.splitAssemblyIntoSubsets(instructions):
+        reordered += subset if len(subset) <= 2 else engine(subset)
+    return reordered
+
+
+def main():
+    parser = argparse.ArgumentParser(description="serial vs. parallel scheduling for several worker counts")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--engine', choices=ENGINES, default='schedule',
+                        help="schedule_instructions (reorder_program) or the legacy reorder_instructions")
+    args = parser.parse_args()
+    engine = ENGINES[args.engine]
+
+    print(f"{os.cpu_count()} cores")
+    print(f"{'instructions':>12} | {'workers':>7} | {'time':>9} | {'speedup':>7}")
+    for n in args.sizes:
+        instructions = rearrange.tokenize(generate_program(n))
+        start = time.perf_counter()
+        expected = serial([list(line) for line in instructions], engine)
+        base = time.perf_counter() - start
+        print(f"{n:>12} | {'serial':>7} | {base:>7.3f} s | {1:>6.2f}x")
+        for workers in args.workers:
+            copy = [list(line) for line in instructions]
+            start = time.perf_counter()
+            reordered = parallel.schedule_program_parallel(copy, workers, engine)
+            seconds = time.perf_counter() - start
+            assert reordered == expected, "parallel schedule differs from the serial one"
+            print(f"{n:>12} | {workers:>7} | {seconds:>7.3f} s | {base / seconds:>6.2f}x")
+
+
+if __name__ == '__main__':
+    main()
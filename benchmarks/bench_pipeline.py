@@ -0,0 +1,127 @@
+# End-to-end benchmark: times every stage of the assembler on synthetic programs (see synthetic.py)
+# of 1k to 10M instructions and writes the timings as JSON, so runs on different commits can be
+# compared with --compare.
+#
+# Stages: lex (rearrange.tokenize), split (splitAssemblyIntoSubsets), reorder (reorder_instructions
+# on every subset), schedule (schedule_instructions on every subset, what reorder_program runs),
+# preprocess (labels -> offsets) and save_processed, read_processed, get_machine_code and save_bin.
+#
+# usage: python benchmarks/bench_pipeline.py [--sizes N ...] [-o results.json] [--compare old.json]
+#                                            [--seed N] [--block-size N] [--dependency P] [--repeat N]
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from isa_assembler import convert, preprocess, rearrange
+from synthetic import write_program
+
+STAGES = ('lex', 'split', 'reorder', 'schedule', 'preprocess', 'save_processed',
+          'read_processed', 'get_machine_code', 'save_bin')
+
+
+def _reorder_subsets(subsets, engine):
+    reordered = []
+    for subset in subsets:
+        reordered += subset if len(subset) <= 2 else engine(list(subset))
+    return reordered
+
+
+## One pass over the source `src`, writing into `tmp`; returns {stage: seconds}
+def run_pipeline(src, tmp, isa):
+    times = {}
+    clock = time.perf_counter
+
+    def timed(stage, function, *args):
+        start = clock()
+        result = function(*args)
+        times[stage] = clock() - start
+        return result
+
+    lines = rearrange.read(src)
+    tokens = timed('lex', rearrange.tokenize, lines)
+    del lines
+    subsets = timed('split', rearrange.splitAssemblyIntoSubsets, tokens)
+    timed('reorder', _reorder_subsets, subsets, rearrange.reorder_instructions)
+    scheduled = timed('schedule', _reorder_subsets, subsets, rearrange.schedule_instructions)
+    del subsets, tokens
+    processed = timed('preprocess', preprocess.preprocess, scheduled, isa)
+    del scheduled
+    out1 = os.path.join(tmp, 'bench_out1.txt')
+    timed('save_processed', preprocess.save_processed, processed, out1)
+    del processed
+    inst_asm = timed('read_processed', convert.read_processed, out1, isa)
+    machine_code = timed('get_machine_code', convert.get_machine_code, inst_asm, isa)
+    del inst_asm
+    timed('save_bin', convert.save_bin, machine_code, os.path.join(tmp, 'bench_out2.bin'))
+    return times
+
+
+def _commit():
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() or None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="times every assembler stage on synthetic programs")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000, 1_000_000, 10_000_000])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--block-size', type=int, default=8)
+    parser.add_argument('--dependency', type=float, default=0.5)
+    parser.add_argument('--repeat', type=int, default=1, help="best of N runs per stage (default: 1)")
+    parser.add_argument('--isa', default=convert.ISA_FILENAME)
+    parser.add_argument('-o', '--output', help="write the results as JSON")
+    parser.add_argument('--compare', help="JSON results of an earlier run to compare against")
+    args = parser.parse_args()
+
+    isa = convert.get_isa(args.isa)
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = {entry['instructions']: entry['stages'] for entry in json.load(f)['results']}
+
+    results = []
+    print(f"{'instructions':>12} | " + " | ".join(f"{stage:>16}" for stage in STAGES) + f" | {'total':>9} | {'inst/s':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, 'bench.asm')
+        for n in args.sizes:
+            write_program(src, n, args.seed, args.block_size, args.dependency)
+            best = {}
+            for _ in range(args.repeat):
+                for stage, seconds in run_pipeline(src, tmp, isa).items():
+                    best[stage] = min(seconds, best.get(stage, seconds))
+            total = sum(best.values())
+            results.append({'instructions': n, 'stages': best, 'total': total, 'instructions_per_second': n / total})
+            print(f"{n:>12} | " + " | ".join(f"{best[stage]:>14.4f} s" for stage in STAGES)
+                  + f" | {total:>7.3f} s | {n / total:>9.0f}")
+            if n in baseline:
+                old = baseline[n]
+                print(f"{'speedup':>12} | " + " | ".join(
+                    f"{old[stage] / best[stage]:>15.2f}x" if old.get(stage) and best[stage] else f"{'-':>16}"
+                    for stage in STAGES) + f" | {sum(old.values()) / total:>8.2f}x |")
+
+    if args.output:
+        report = {'benchmark': 'pipeline', 'commit': _commit(), 'python': platform.python_version(),
+                  'platform': platform.platform(), 'isa': os.path.abspath(args.isa),
+                  'params': {'seed': args.seed, 'block_size': args.block_size,
+                             'dependency': args.dependency, 'repeat': args.repeat},
+                  'results': results}
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
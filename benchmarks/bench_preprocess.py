@@ -0,0 +1,57 @@
+# Label resolution benchmark: preprocess() time on programs with a growing number of labels,
+# in instructions/s. Linear resolution keeps the rate flat as the program grows.
+#
+# usage: python benchmarks/bench_preprocess.py [--sizes N ...] [--repeat N] [--isa rv32im_isa.csv]
+
+import argparse
+import os
+import random
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from isa_assembler import convert, preprocess
+
+REGS = ['zero', 'ra', 'sp', 's0', 's1', 'a0', 'a1', 'a2', 't0', 't1', 't2', 't3', 't4', 't5', 't6']
+
+
+## Tokenized program with a label every 4 instructions; branches and jumps go to nearby labels
+def make_program(n, seed=0):
+    rng = random.Random(seed)
+    labels = n // 4
+    program = []
+    for i in range(n):
+        if i % 4 == 0:
+            program.append([f"L{i // 4}:"])
+        kind = rng.random()
+        target = f"L{min(max(i // 4 + rng.randrange(-200, 200), 0), labels - 1)}"
+        if kind < 0.15:
+            program.append([rng.choice(['beq', 'bne', 'blt', 'bge']), rng.choice(REGS), rng.choice(REGS), target])
+        elif kind < 0.20:
+            program.append(['jal', rng.choice(REGS), target])
+        elif kind < 0.40:
+            program.append(['lw', rng.choice(REGS), rng.choice(REGS), str(4 * rng.randrange(64))])
+        else:
+            program.append(['add', rng.choice(REGS), rng.choice(REGS), rng.choice(REGS)])
+    return program, labels
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 400_000, 1_000_000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--isa', default=convert.ISA_FILENAME)
+    args = parser.parse_args()
+
+    isa = convert.get_isa(args.isa)
+    print(f"{'instructions':>12} | {'labels':>8} | {'time':>9} | {'inst/s':>10}")
+    for n in args.sizes:
+        program, labels = make_program(n)
+        elapsed = min(timeit.repeat(lambda: preprocess.preprocess(program, isa), number=1, repeat=args.repeat))
+        print(f"{n:>12} | {labels:>8} | {elapsed:>7.3f} s | {n / elapsed:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+# Input reading benchmark: convert.read_processed() (memory-mapped, chunked) against the text-mode
+# reader it replaced, and rearrange.tokenize_file(), on synthetic programs (see synthetic.py).
+# Each measurement runs in a fresh process so its peak resident set can be reported.
+#
+# usage: python benchmarks/bench_read.py [--sizes N ...] [--isa rv32im_isa.csv]
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from isa_assembler import convert, preprocess, rearrange
+from synthetic import write_program
+
+
+def text_mode_read_processed(filename, isa):
+    with open(filename, 'r') as f:
+        return [convert.parse_processed_line(line, isa) for line in f]
+
+
+READERS = {
+    'text-mode read_processed': lambda filename, isa: text_mode_read_processed(filename, isa),
+    'read_processed': lambda filename, isa: convert.read_processed(filename, isa),
+    'tokenize_file': lambda filename, isa: rearrange.tokenize_file(filename),
+}
+
+
+def peak_rss_kib():
+    # ru_maxrss survives exec on Linux (the child would report the parent's peak), VmHWM does not
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def child(reader, filename, isa_filename):
+    isa = convert.get_isa(isa_filename)
+    before = peak_rss_kib()
+    start = time.perf_counter()
+    result = READERS[reader](filename, isa)
+    seconds = time.perf_counter() - start
+    peak = peak_rss_kib() - before
+    print(json.dumps({'seconds': seconds, 'rss_mib': peak / 1024, 'lines': len(result)}))
+
+
+def measure(reader, filename, isa_filename):
+    out = subprocess.run([sys.executable, __file__, '--child', reader, filename, '--isa', isa_filename],
+                         check=True, capture_output=True, text=True).stdout
+    return json.loads(out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="read time and peak memory of the input readers")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100_000, 1_000_000, 5_000_000])
+    parser.add_argument('--isa', default=convert.ISA_FILENAME)
+    parser.add_argument('--child', nargs=2, metavar=('READER', 'FILE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.child[0], args.child[1], args.isa)
+        return
+
+    isa = convert.get_isa(args.isa)
+    print(f"{'instructions':>12} | {'reader':<25} | {'time':>9} | {'peak RSS':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.sizes:
+            src = os.path.join(tmp, f'bench{n}.asm')
+            write_program(src, n)
+            out1 = os.path.join(tmp, f'bench{n}_out1.txt')
+            preprocess.save_processed(preprocess.preprocess(rearrange.tokenize_file(src), isa), out1)
+            for reader in READERS:
+                result = measure(reader, src if reader == 'tokenize_file' else out1, args.isa)
+                print(f"{n:>12} | {reader:<25} | {result['seconds']:>7.3f} s | {result['rss_mib']:>6.0f} MiB")
+            assert convert.read_processed(out1, isa) == text_mode_read_processed(out1, isa), "readers differ"
+
+
+if __name__ == '__main__':
+    main()
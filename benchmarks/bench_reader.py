@@ -0,0 +1,65 @@
+# Reader benchmark: per-token throughput of read_processed() vs. the regex-per-token reader it replaced.
+#
+# usage: python benchmarks/bench_reader.py [path/to/rv32im_isa.csv] [--lines N] [--hex]
+
+import argparse
+import os
+import re
+import sys
+import tempfile
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from isa_assembler import convert, load_isa
+from bench_streaming import write_program
+
+
+## The reader before the format-aware classifier
+def read_processed_regex(filename):
+    asm_inst = list()
+    with open(filename, 'r') as f:
+        for line in f:
+            asm_inst.append([(int(arg) if re.fullmatch("[+-]?[0-9]+", arg) else arg) for arg in line.split()])
+    return asm_inst
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('csv', nargs='?', default='rv32im_isa.csv')
+    parser.add_argument('--lines', type=int, default=500_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    isa = load_isa(args.csv)
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, 'bench_out1.txt')
+        write_program(src, isa, args.lines)
+        with open(src) as f:
+            tokens = sum(len(line.split()) for line in f)
+        assert read_processed_regex(src) == convert.read_processed(src, isa), "readers disagree"
+
+        # the same program with every immediate written in hex
+        hex_src = os.path.join(tmp, 'bench_hex_out1.txt')
+        with open(src) as f, open(hex_src, 'w') as out:
+            for line in f:
+                args_ = line.split()
+                if isa[args_[0]].format != 'R':
+                    imm = int(args_[-1])
+                    args_[-1] = f"{'-' if imm < 0 else ''}0x{abs(imm):x}"
+                out.write(' '.join(args_) + '\n')
+
+        cases = [
+            ('regex per token', lambda: read_processed_regex(src)),
+            ('classifier', lambda: convert.read_processed(src, isa)),
+            ('classifier, hex', lambda: convert.read_processed(hex_src, isa)),
+        ]
+        print(f"{'reader':<16} | {'time':>9} | {'Mtokens/s':>9}")
+        for name, func in cases:
+            elapsed = min(timeit.repeat(func, number=1, repeat=args.repeat))
+            print(f"{name:<16} | {elapsed:>7.3f} s | {tokens / elapsed / 1e6:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+# Reorder engine benchmark: list moves (pop/insert and instructions[:max_index] copies) vs. the
+# linked order used by reorder_instructions(), on straight-line blocks of 10k-100k instructions.
+#
+# usage: python benchmarks/bench_reorder_moves.py [--sizes N ...] [--repeat N]
+
+import argparse
+import os
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from isa_assembler import rearrange
+from bench_scheduler import make_block
+
+
+## The same search on a Python list, moving entries with move_instruction_above_index()
+def list_reorder(instructions):
+    max_index = len(instructions)
+    masks = [rearrange.get_reg_masks(instruction) for instruction in instructions]
+    for current_index in reversed(range(1, len(instructions))):
+        if masks[current_index - 1][1] & masks[current_index][0]:
+            test_index = rearrange.find_above_instruction_without_dependencies(instructions, current_index, masks)
+            if test_index is False:
+                test_index = rearrange.find_below_instruction_without_dependencies(
+                    instructions[:max_index], current_index, masks[:max_index])
+            if test_index is not False:
+                instructions = rearrange.move_instruction_above_index(instructions, current_index, test_index)
+                masks = rearrange.move_instruction_above_index(masks, current_index, test_index)
+                max_index = current_index - 1
+    return instructions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 30_000, 100_000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'block':>8} | {'list moves':>10} | {'linked order':>12} | {'speedup':>7}")
+    for n in args.sizes:
+        block = make_block(n)
+        assert list_reorder(list(block)) == rearrange.reorder_instructions(list(block)), "orders differ"
+        listed = min(timeit.repeat(lambda: list_reorder(list(block)), number=1, repeat=args.repeat))
+        linked = min(timeit.repeat(lambda: rearrange.reorder_instructions(list(block)), number=1, repeat=args.repeat))
+        print(f"{n:>8} | {listed:>8.3f} s | {linked:>10.3f} s | {listed / linked:>6.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+# Scheduler benchmark: reorder_instructions() search vs. the schedule_instructions() list scheduler
+# on one straight-line block of growing size.
+#
+# usage: python benchmarks/bench_scheduler.py [--sizes N ...] [--legacy-max N] [--repeat N]
+
+import argparse
+import os
+import random
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from isa_assembler import rearrange
+
+REGS = ['zero', 'ra', 'sp', 's0', 's1', 'a0', 'a1', 'a2', 't0', 't1', 't2', 't3', 't4', 't5', 't6']
+
+
+## Tokenized straight-line block: loads, stores and R/I-type instructions, no labels or branches
+def make_block(n, seed=0):
+    rng = random.Random(seed)
+    block = []
+    for _ in range(n):
+        kind = rng.random()
+        if kind < 0.25:
+            block.append(['lw', rng.choice(REGS), rng.choice(REGS), str(4 * rng.randrange(64))])
+        elif kind < 0.35:
+            block.append(['sw', rng.choice(REGS), rng.choice(REGS), str(4 * rng.randrange(64))])
+        elif kind < 0.5:
+            block.append(['addi', rng.choice(REGS), rng.choice(REGS), str(rng.randrange(-64, 64))])
+        else:
+            block.append([rng.choice(['add', 'sub', 'or', 'and']), rng.choice(REGS), rng.choice(REGS), rng.choice(REGS)])
+    return block
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1_000, 10_000, 100_000])
+    parser.add_argument('--legacy-max', type=int, default=1_000, help="largest block given to reorder_instructions()")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'block':>8} | {'reorder_instructions':>20} | {'schedule_instructions':>21}")
+    for n in args.sizes:
+        block = make_block(n)
+        legacy = '-'
+        if n <= args.legacy_max:
+            seconds = min(timeit.repeat(lambda: rearrange.reorder_instructions(list(block)), number=1, repeat=args.repeat))
+            legacy = f"{seconds:.4f} s"
+        seconds = min(timeit.repeat(lambda: rearrange.schedule_instructions(block), number=1, repeat=args.repeat))
+        print(f"{n:>8} | {legacy:>20} | {seconds:>19.4f} s")
+
+
+if __name__ == '__main__':
+    main()
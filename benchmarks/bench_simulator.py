@@ -0,0 +1,59 @@
+# Simulator benchmark: simulated instructions per second of a nested loop of ALU, load/store
+# and branch instructions, with and without stall counting.
+#
+# usage: python benchmarks/bench_simulator.py [--outer N] [--inner N] [--isa rv32im_isa.csv]
+
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from isa_assembler import convert, preprocess, rearrange, simulator
+
+SOURCE = '''
+    addi s0, zero, {outer}
+outer:
+    addi t0, zero, {inner}
+inner:
+    lw t1, 0(zero)
+    add t2, t1, t0
+    xor t3, t2, s0
+    sw t3, 4(zero)
+    addi t1, t1, 1
+    sw t1, 0(zero)
+    addi t0, t0, -1
+    bne t0, zero, inner
+    addi s0, s0, -1
+    bne s0, zero, outer
+'''
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--outer', type=int, default=500)
+    parser.add_argument('--inner', type=int, default=1000)
+    parser.add_argument('--isa', default=convert.ISA_FILENAME)
+    args = parser.parse_args()
+
+    isa = convert.get_isa(args.isa)
+    tokens = rearrange.tokenize(SOURCE.format(outer=args.outer, inner=args.inner).splitlines())
+    words = convert.encode_machine_code(preprocess.preprocess(tokens, isa), isa)
+
+    print(f"{'mode':<8} | {'instructions':>12} | {'time':>8} | {'MIPS':>6}")
+    for stalls in (False, True):
+        sim = simulator.Simulator(words, isa)
+        start = time.perf_counter()
+        result = sim.run(stalls=stalls)
+        elapsed = time.perf_counter() - start
+        assert result.halted and result.memory[0:4] == (args.outer * args.inner).to_bytes(4, 'little')
+        mode = 'stalls' if stalls else 'plain'
+        print(f"{mode:<8} | {result.steps:>12} | {elapsed:>6.3f} s | {result.steps / elapsed / 1e6:>6.2f}")
+        if stalls:
+            print(f"stalls: {result.stalls}")
+
+
+if __name__ == '__main__':
+    main()
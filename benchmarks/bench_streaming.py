@@ -0,0 +1,71 @@
+# Streaming vs. batch benchmark: time and peak RSS of *_out1.txt -> .bin for growing program sizes.
+#
+# usage: python benchmarks/bench_streaming.py [path/to/rv32im_isa.csv] [--sizes 10000 100000 ...]
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from isa_assembler import load_isa
+
+## Runs in a fresh interpreter so ru_maxrss only covers one mode
+RUNNER = '''
+import json, resource, sys, time
+from isa_assembler import Assembler
+asm = Assembler(isa_filename=sys.argv[1])
+asm.encoder_table
+start = time.perf_counter()
+asm.assemble_file(sys.argv[2], sys.argv[3], stream=sys.argv[4] == 'stream')
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed, "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}))
+'''
+
+
+## Writes `n` random, encodable lines in the *_out1.txt format
+def write_program(filename, isa, n, seed=0):
+    rng = random.Random(seed)
+    bounds = {'I': 2**11, 'S': 2**11, 'B': 2**12, 'J': 2**20}
+    names = [rec.name for rec in isa.values() if rec.format in ('R', 'I', 'S', 'B', 'J')]
+    with open(filename, 'w') as f:
+        for _ in range(n):
+            name = rng.choice(names)
+            fmt = isa[name].format
+            regs = [rng.randrange(32) for _ in range(3)]
+            if fmt == 'R':
+                f.write(f"{name} {regs[0]} {regs[1]} {regs[2]}\n")
+            elif fmt == 'J':
+                f.write(f"{name} {regs[0]} {rng.randrange(-bounds['J'], bounds['J'])}\n")
+            else:
+                f.write(f"{name} {regs[0]} {regs[1]} {rng.randrange(-bounds[fmt], bounds[fmt])}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('csv', nargs='?', default='rv32im_isa.csv')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    isa = load_isa(args.csv)
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    print(f"{'lines':>10} | {'mode':<6} | {'time':>9} | {'lines/s':>10} | {'peak RSS':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, 'bench_out1.txt')
+        out = os.path.join(tmp, 'bench_out2.bin')
+        for n in args.sizes:
+            write_program(src, isa, n)
+            for mode in ('batch', 'stream'):
+                result = subprocess.run([sys.executable, '-c', RUNNER, os.path.abspath(args.csv), src, out, mode],
+                                        env=env, check=True, capture_output=True, text=True)
+                stats = json.loads(result.stdout)
+                print(f"{n:>10} | {mode:<6} | {stats['seconds']:>7.3f} s | {n / stats['seconds']:>10.0f} | {stats['max_rss_kb'] / 1024:>7.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
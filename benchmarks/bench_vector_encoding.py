@@ -0,0 +1,60 @@
+# Scalar vs. NumPy encoder benchmark, from token lists and from *_out1.txt files, with the crossover size.
+#
+# usage: python benchmarks/bench_vector_encoding.py [path/to/rv32im_isa.csv] [--sizes 100 1000 ...]
+
+import argparse
+import os
+import sys
+import tempfile
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from isa_assembler import convert, load_isa, vector
+from bench_streaming import write_program
+
+
+def best(func, repeat):
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('csv', nargs='?', default='rv32im_isa.csv')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    isa = load_isa(args.csv)
+    table = convert.build_encoder_table(isa)
+    vector_table = vector.build_vector_table(isa)
+    crossover = {'lists': None, 'file': None}
+
+    print(f"{'lines':>9} | {'scalar lists':>12} | {'vector lists':>12} | {'scalar file':>12} | {'vector file':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, 'bench_out1.txt')
+        for n in args.sizes:
+            write_program(src, isa, n)
+            inst_asm = convert.read_processed(src)
+            scalar = convert.encode_machine_code(inst_asm, isa, table)
+            assert vector.encode_machine_code_vector(inst_asm, isa, vector_table).tolist() == list(scalar)
+
+            times = [
+                best(lambda: convert.encode_machine_code(inst_asm, isa, table), args.repeat),
+                best(lambda: vector.encode_machine_code_vector(inst_asm, isa, vector_table), args.repeat),
+                best(lambda: convert.encode_machine_code(convert.read_processed(src), isa, table), args.repeat),
+                best(lambda: vector.encode_processed_file_vector(src, isa, vector_table), args.repeat),
+            ]
+            print(f"{n:>9} | " + " | ".join(f"{t * 1e3:>9.2f} ms" for t in times))
+            if crossover['lists'] is None and times[1] < times[0]:
+                crossover['lists'] = n
+            if crossover['file'] is None and times[3] < times[2]:
+                crossover['file'] = n
+
+    for source, n in crossover.items():
+        print(f"vector path wins from {source}: " + (f">= {n} lines" if n else "not within the measured sizes"))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+# Seeded generator of synthetic RV32IM assembly programs for the benchmarks: basic blocks that start
+# with a label and end with a branch or jump, R/I/S/B/J instructions from the subset rearrange.py
+# knows, and a tunable chance that an operand reads a register written just before (load-use and
+# ALU chains the scheduler has to work around).
+#
+# usage: python benchmarks/synthetic.py N [-o program.asm] [--seed N] [--block-size N] [--dependency P]
+
+import argparse
+import random
+import sys
+
+REGS = ['t0', 't1', 't2', 't3', 't4', 't5', 't6', 's1', 's2', 's3', 's4', 'a0', 'a1', 'a2', 'a3', 'a4', 'a5']
+BASES = ['sp', 's0', 'gp']
+R_OPS = ['add', 'sub', 'and', 'or', 'xor', 'sll', 'srl', 'sra', 'mul']
+I_OPS = ['addi', 'andi', 'ori', 'xori']
+SHIFT_OPS = ['slli', 'srli']
+B_OPS = ['beq', 'bne', 'blt', 'bge']
+MIX = (('R', 0.45), ('I', 0.25), ('lw', 0.15), ('sw', 0.10), ('shift', 0.05))
+BRANCH_REACH = 1000  # bytes; conditional branches reach +-4 KiB
+JUMP_CHANCE = 0.2    # a block ends with jal instead of a conditional branch
+
+
+## Block sizes around `block_size` (1 to 2 * block_size - 1, branch included) adding up to n instructions
+def _block_sizes(rng, n, block_size):
+    sizes = []
+    while n > 0:
+        size = min(n, rng.randint(1, 2 * block_size - 1))
+        sizes.append(size)
+        n -= size
+    return sizes
+
+
+def iter_program(n, seed=0, block_size=8, dependency=0.5):
+    '''yields the lines of an assembly program with `n` instructions (plus labels):
+    basic blocks of about `block_size` instructions, each operand reading one of
+    the last three results with probability `dependency`'''
+    if block_size < 1 or not 0 <= dependency <= 1:
+        raise ValueError("block_size must be >= 1 and dependency between 0 and 1")
+    rng = random.Random(seed)
+    sizes = _block_sizes(rng, n, block_size)
+    starts = []
+    pc = 0
+    for size in sizes:
+        starts.append(pc)
+        pc += 4 * size
+    kinds, weights = zip(*MIX)
+    recent = list(REGS[:3])
+
+    def source():
+        return rng.choice(recent) if rng.random() < dependency else rng.choice(REGS)
+
+    def dest():
+        reg = rng.choice(REGS)
+        recent.pop(0)
+        recent.append(reg)
+        return reg
+
+    for block, size in enumerate(sizes):
+        yield f"L{block}:\n"
+        for _ in range(size - 1):
+            kind = rng.choices(kinds, weights)[0]
+            if kind == 'R':
+                rs1, rs2 = source(), source()
+                yield f"    {rng.choice(R_OPS)} {dest()}, {rs1}, {rs2}\n"
+            elif kind == 'I':
+                rs1 = source()
+                yield f"    {rng.choice(I_OPS)} {dest()}, {rs1}, {rng.randrange(-2048, 2048)}\n"
+            elif kind == 'shift':
+                rs1 = source()
+                yield f"    {rng.choice(SHIFT_OPS)} {dest()}, {rs1}, {rng.randrange(32)}\n"
+            elif kind == 'lw':
+                yield f"    lw {dest()}, {4 * rng.randrange(256)}({rng.choice(BASES)})\n"
+            else:
+                yield f"    sw {source()}, {4 * rng.randrange(256)}({rng.choice(BASES)})\n"
+        # targets stay within conditional branch range of the branch itself
+        here = starts[block] + 4 * (size - 1)
+        near = [t for t in (block + d for d in range(-8, 9)) if 0 <= t < len(sizes)
+                and abs(starts[t] - here) < BRANCH_REACH]
+        if not near or rng.random() < JUMP_CHANCE:
+            yield f"    jal ra, L{rng.choice(near) if near else block}\n"
+        else:
+            yield f"    {rng.choice(B_OPS)} {source()}, {source()}, L{rng.choice(near)}\n"
+
+
+def generate_program(n, seed=0, block_size=8, dependency=0.5):
+    '''the lines of iter_program() as a list'''
+    return list(iter_program(n, seed, block_size, dependency))
+
+
+def write_program(filename, n, seed=0, block_size=8, dependency=0.5):
+    '''writes iter_program() to `filename` without keeping its lines'''
+    with open(filename, 'w') as f:
+        f.writelines(iter_program(n, seed, block_size, dependency))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="writes a synthetic RV32IM assembly program")
+    parser.add_argument('instructions', type=int)
+    parser.add_argument('-o', '--output', help="output file (default: stdout)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--block-size', type=int, default=8, help="mean basic block size (default: 8)")
+    parser.add_argument('--dependency', type=float, default=0.5,
+                        help="chance that an operand reads one of the last three results (default: 0.5)")
+    args = parser.parse_args()
+
+    if args.output:
+        write_program(args.output, args.instructions, args.seed, args.block_size, args.dependency)
+    else:
+        sys.stdout.writelines(iter_program(args.instructions, args.seed, args.block_size, args.dependency))
+
+
+if __name__ == '__main__':
+    main()
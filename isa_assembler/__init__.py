@@ -0,0 +1,28 @@
+# ISA Assembler Design: preprocesses RISC-V assembly code into machine code.
+#
+# Importing the package does no I/O and loads no submodule; the names below are
+# imported on first access and the ISA table is loaded on first use.
+
+_LAZY = {
+    'Assembler': 'api',
+    'InstFormat': 'isa_table',
+    'InstRecord': 'isa_table',
+    'load_isa': 'isa_table',
+    'PipelineConfig': 'hazards',
+    'Program': 'ir',
+}
+
+__all__ = list(_LAZY)
+
+
+def __getattr__(name):
+    if name not in _LAZY:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from importlib import import_module
+    value = getattr(import_module(f".{_LAZY[name]}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
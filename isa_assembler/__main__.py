@@ -0,0 +1,258 @@
+# Command line entry point: python -m isa_assembler <command> ...
+
+import argparse
+import json
+import os
+import sys
+
+from . import convert, instrument, output, rearrange
+from .api import Assembler
+
+
+def cmd_assemble(args, assembler):
+    for filename in args.files:
+        out_filename = assembler.assemble_file(filename, args.output if len(args.files) == 1 else None,
+                                               stream=args.stream, chunk_size=args.chunk_size,
+                                               fmt=args.format, base_address=args.base_address,
+                                               vector=args.vector, jobs=args.jobs, ir=args.ir)
+        print("Saved machine code to: ", out_filename)
+
+def cmd_preprocess(args, assembler):
+    for filename in args.files:
+        out_filename = assembler.preprocess_file(filename, args.output if len(args.files) == 1 else None,
+                                                 schedule=args.schedule, jobs=args.jobs, ir=args.ir)
+        print("Saved pre-processed code to: ", out_filename)
+
+def cmd_disassemble(args, assembler):
+    for filename in args.files:
+        out_filename = assembler.disassemble_file(filename, args.output if len(args.files) == 1 else None,
+                                                  args.format, strict=not args.lenient)
+        print("Saved pre-processed code to: ", out_filename)
+
+def cmd_schedule(args, assembler):
+    out = open(args.output, 'w') if args.output else sys.stdout
+    try:
+        for line in assembler.schedule_file(args.file, args.jobs):
+            out.write(rearrange.format_instruction(line) + '\n')
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+def _pipeline_config(args):
+    from .hazards import PipelineConfig
+    return PipelineConfig(forwarding=not args.no_forwarding, load_use_penalty=args.load_use_penalty,
+                          branch_stage=args.branch_stage, branch_taken=not args.branches_not_taken)
+
+def _write_json(report, filename):
+    text = json.dumps(report, indent=2) + '\n'
+    if filename:
+        with open(filename, 'w') as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text)
+
+def cmd_hazards(args, assembler):
+    report = assembler.hazard_report(args.file, _pipeline_config(args))
+    _write_json(report, args.output)
+    stalls = report['after']['data_stalls'] + report['after']['control_stalls']
+    if args.max_stalls is not None and stalls > args.max_stalls:
+        sys.exit(f"{args.file}: {stalls} stall cycles after reordering (limit {args.max_stalls})")
+
+def cmd_simulate(args, assembler):
+    from . import simulator
+    results = {}
+    for filename in [args.file] + ([args.compare] if args.compare else []):
+        result = simulator.simulate_file(filename, args.format, assembler.isa, args.max_steps, args.stalls,
+                                         _pipeline_config(args), args.mem_size, args.base_address)
+        results[filename] = result
+    result = results[args.file]
+    report = {'steps': result.steps, 'halted': result.halted, 'pc': result.pc,
+              'regs': {f'x{i}': value for i, value in enumerate(result.regs)}}
+    if args.stalls:
+        report['stalls'] = result.stalls
+    if args.compare:
+        other = results[args.compare]
+        report['matches'] = other.regs == result.regs and other.memory == result.memory
+    _write_json(report, args.output)
+    if args.compare and not report['matches']:
+        sys.exit(f"{args.file} and {args.compare} end in different states")
+
+def cmd_build(args, assembler):
+    builder = assembler.incremental(schedule=not args.no_schedule)
+    out_filename = args.output or os.path.splitext(args.file)[0] + '_out' + output.SUFFIXES[args.format]
+
+    def produce():
+        if args.state:
+            builder.load(args.state)
+        builder.build_file(args.file, out_filename, args.format, args.base_address)
+        if args.state:
+            builder.save(args.state)
+
+    assembler.cached(args.file, out_filename, {'command': 'build', 'schedule': not args.no_schedule,
+                                               'format': args.format, 'base_address': args.base_address}, produce)
+    print("Saved machine code to: ", out_filename)
+    if args.stats and builder.stats:
+        _write_json(builder.stats, None)
+
+def cmd_serve(args, assembler):
+    from . import daemon
+    daemon.serve(args.socket, assembler.isa_filename, assembler.cache, args.threads)
+
+def cmd_batch(args, assembler):
+    from . import batch
+    try:
+        files = batch.expand_inputs(args.inputs, args.manifest)
+    except (OSError, ValueError) as error:
+        sys.exit(str(error))
+    if not files:
+        sys.exit("No input files (give patterns or --manifest)")
+
+    def progress(result):
+        if result['ok']:
+            rate = result['instructions'] / result['seconds'] if result['seconds'] else 0
+            print(f"ok    {result['file']}: {result['instructions']} instructions in {result['seconds']:.3f} s "
+                  f"({rate:,.0f}/s) -> {result['outputs'][1]}")
+        else:
+            print(f"FAIL  {result['file']}: {result['error']}", file=sys.stderr)
+
+    results, totals = batch.run_batch(files, args.out_dir, args.root, args.jobs, not args.no_schedule, args.format,
+                                      args.base_address, assembler.isa_filename, progress)
+    print(f"{totals['succeeded']}/{totals['files']} files, {totals['instructions']} instructions in {totals['seconds']:.3f} s "
+          f"({totals['files_per_second']} files/s, {totals['instructions_per_second']:,} instructions/s)")
+    if args.report:
+        _write_json({'totals': totals, 'files': results}, None if args.report == '-' else args.report)
+    if totals['failed']:
+        sys.exit(1)
+
+def cmd_selftest(args, assembler):
+    rearrange.run_tests(args.file)
+
+
+def _add_pipeline_args(p):
+    p.add_argument('--no-forwarding', action='store_true', help="operands are read in ID after write-back")
+    p.add_argument('--load-use-penalty', type=int, default=1, help="stalls after a load with forwarding (default: %(default)s)")
+    p.add_argument('--branch-stage', choices=('ID', 'EX', 'MEM'), default='EX', help="stage that resolves branches (default: %(default)s)")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m isa_assembler',
+                                     description="RISC-V assembler: scheduling (part 3), label resolution (part 1) and machine code conversion (part 2)")
+    parser.add_argument('--isa', default=convert.ISA_FILENAME, help="ISA csv file (default: %(default)s)")
+    parser.add_argument('--cache', metavar='DIR', nargs='?', const='',
+                        help="reuse outputs of identical inputs from an on-disk cache (default DIR: $ISA_ASSEMBLER_CACHE or ~/.cache/isa_assembler)")
+    parser.add_argument('--cache-max-bytes', type=int, default=512 * 2**20,
+                        help="evict least recently used outputs beyond this size (default: %(default)s)")
+    parser.add_argument('--profile', metavar='FILE', help="record time, calls and items per stage plus scheduler events into FILE")
+    parser.add_argument('--profile-format', choices=('json', 'chrome'), default='json',
+                        help="json summary or Chrome trace (chrome://tracing, Perfetto) (default: %(default)s)")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('assemble', help="convert pre-processed *_out1.txt files to machine code")
+    p.add_argument('files', nargs='+')
+    p.add_argument('-o', '--output', help="output file (only with a single input; default: *_out2.bin, .img, .hex, .mem or .elf)")
+    p.add_argument('-f', '--format', choices=output.FORMATS, default='text', help="output format (default: %(default)s)")
+    p.add_argument('--base-address', type=lambda val: int(val, 0), default=0,
+                   help="address of the first instruction for ihex/readmemh/elf (default: 0)")
+    p.add_argument('-j', '--jobs', type=int, default=1, help="encode each file on this many processes (default: %(default)s)")
+    p.add_argument('--vector', action='store_true', help="parse and encode with NumPy (needs numpy)")
+    p.add_argument('--stream', action='store_true', help="process the input in chunks with constant memory")
+    p.add_argument('--chunk-size', type=int, default=convert.CHUNK_SIZE, help="lines per chunk with --stream (default: %(default)s)")
+    p.add_argument('--ir', action='store_true', help="read and encode through the compact array representation (isa_assembler.ir)")
+    p.set_defaults(func=cmd_assemble)
+
+    p = sub.add_parser('disassemble', help="convert machine code (text *_out2.bin or raw *_out2.img) back to pre-processed code")
+    p.add_argument('files', nargs='+')
+    p.add_argument('-o', '--output', help="output file (only with a single input; default: *_dis.txt)")
+    p.add_argument('-f', '--format', choices=('auto', 'text', 'raw'), default='auto', help="input format (default: by suffix or content)")
+    p.add_argument('--lenient', action='store_true', help="write unknown words as `.word N` instead of failing")
+    p.set_defaults(func=cmd_disassemble)
+
+    p = sub.add_parser('preprocess', help="resolve labels and registers of assembly files into *_out1.txt files")
+    p.add_argument('files', nargs='+')
+    p.add_argument('-o', '--output', help="output file (only with a single input; default: *_out1.txt)")
+    p.add_argument('--schedule', action='store_true', help="reorder to avoid data hazards first")
+    p.add_argument('-j', '--jobs', type=int, default=1, help="schedule each file on this many processes (default: %(default)s)")
+    p.add_argument('--ir', action='store_true', help="run every stage on the compact array representation (isa_assembler.ir; with -j 1)")
+    p.set_defaults(func=cmd_preprocess)
+
+    p = sub.add_parser('schedule', help="reorder an assembly file to avoid data hazards")
+    p.add_argument('file')
+    p.add_argument('-o', '--output', help="output file (default: stdout)")
+    p.add_argument('-j', '--jobs', type=int, default=1, help="schedule on this many processes (default: %(default)s)")
+    p.set_defaults(func=cmd_schedule)
+
+    p = sub.add_parser('hazards', help="count pipeline stalls before and after reordering (JSON)")
+    p.add_argument('file')
+    p.add_argument('-o', '--output', help="output file (default: stdout)")
+    _add_pipeline_args(p)
+    p.add_argument('--branches-not-taken', action='store_true', help="do not count branches as taken")
+    p.add_argument('--max-stalls', type=int, help="exit with an error if the reordered code stalls more than this")
+    p.set_defaults(func=cmd_hazards)
+
+    p = sub.add_parser('simulate', help="run a machine code file (text *_out2.bin or raw *_out2.img) and print the final registers (JSON)")
+    p.add_argument('file')
+    p.add_argument('-o', '--output', help="output file (default: stdout)")
+    p.add_argument('-f', '--format', choices=('auto', 'text', 'raw'), default='auto', help="input format (default: by suffix or content)")
+    p.add_argument('--max-steps', type=int, default=10_000_000, help="stop after this many instructions (default: %(default)s)")
+    p.add_argument('--mem-size', type=int, default=1 << 16, help="bytes of data memory (default: %(default)s)")
+    p.add_argument('--base-address', type=lambda val: int(val, 0), default=0, help="address of the first instruction (default: 0)")
+    p.add_argument('--stalls', action='store_true', help="also count pipeline stall cycles")
+    _add_pipeline_args(p)
+    p.set_defaults(branches_not_taken=False)
+    p.add_argument('--compare', metavar='FILE', help="also run FILE and fail unless registers and memory end up the same")
+    p.set_defaults(func=cmd_simulate)
+
+    p = sub.add_parser('build', help="assemble a source file straight to machine code, reusing unchanged subsets saved in --state")
+    p.add_argument('file')
+    p.add_argument('-o', '--output', help="output file (default: *_out2.bin, .img, .hex, .mem or .elf)")
+    p.add_argument('-f', '--format', choices=output.FORMATS, default='text', help="output format (default: %(default)s)")
+    p.add_argument('--base-address', type=lambda val: int(val, 0), default=0,
+                   help="address of the first instruction for ihex/readmemh/elf (default: 0)")
+    p.add_argument('--no-schedule', action='store_true', help="do not reorder to avoid data hazards")
+    p.add_argument('--state', metavar='FILE', help="incremental state: loaded if present and valid, rewritten after the build")
+    p.add_argument('--stats', action='store_true', help="print cache hits and the estimated time saved (JSON)")
+    p.set_defaults(func=cmd_build)
+
+    p = sub.add_parser('serve', help="keep the assembler loaded and serve requests on a Unix socket (see isa_assembler.client)")
+    p.add_argument('--socket', help="socket path (default: $ISA_ASSEMBLER_SOCKET or isa_assembler-<uid>.sock in $XDG_RUNTIME_DIR or /tmp)")
+    p.add_argument('--threads', type=int, default=4, help="requests worked on at once (default: %(default)s)")
+    p.set_defaults(func=cmd_serve)
+
+    p = sub.add_parser('batch', help="assemble many source files on a process pool into a mirrored output tree")
+    p.add_argument('inputs', nargs='*', help="source files or glob patterns (quote them; ** recurses)")
+    p.add_argument('--manifest', metavar='FILE', help="file listing one source file or pattern per line (relative to FILE)")
+    p.add_argument('-o', '--out-dir', help="write outputs under DIR, mirroring the inputs' directories (default: next to each input)")
+    p.add_argument('--root', help="directory the mirrored tree starts from (default: deepest directory holding every input)")
+    p.add_argument('-j', '--jobs', type=int, help="worker processes (default: one per CPU)")
+    p.add_argument('-f', '--format', choices=output.FORMATS, default='text', help="output format (default: %(default)s)")
+    p.add_argument('--base-address', type=lambda val: int(val, 0), default=0,
+                   help="address of the first instruction for ihex/readmemh/elf (default: 0)")
+    p.add_argument('--no-schedule', action='store_true', help="do not reorder to avoid data hazards")
+    p.add_argument('--report', metavar='FILE', help="write per-file results and totals to FILE (JSON, - for stdout)")
+    p.set_defaults(func=cmd_batch)
+
+    p = sub.add_parser('selftest', help="run the t1_test..t6_test harnesses")
+    p.add_argument('file', nargs='?', default='example.asm')
+    p.set_defaults(func=cmd_selftest)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    cache = None
+    if args.cache is not None:
+        from .cache import ArtifactCache
+        cache = ArtifactCache(args.cache or None, args.cache_max_bytes)
+    if not args.profile:
+        args.func(args, Assembler(isa_filename=args.isa, cache=cache))
+        return
+    instrument.enable(trace=args.profile_format == 'chrome')
+    try:
+        args.func(args, Assembler(isa_filename=args.isa, cache=cache))
+    finally:
+        instrument.disable()
+        instrument.save(args.profile, args.profile_format)
+
+
+if __name__ == '__main__':
+    main()
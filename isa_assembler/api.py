@@ -0,0 +1,191 @@
+# Assembler object tying the rearrange (part 3), preprocess (part 1) and convert (part 2) stages together behind one API.
+
+import os
+
+from . import convert, mapped, output, preprocess, rearrange
+
+
+class Assembler:
+    '''assembles RISC-V code with one ISA table.
+    The table is loaded from `isa_filename` the first time it is needed, unless
+    one is injected with `isa` (a {name: InstRecord} dict, see isa_table.load_isa).
+    With a `cache` (cache.ArtifactCache), the *_file() methods copy their output
+    from the cache when the same input was processed with the same options before.'''
+
+    def __init__(self, isa=None, isa_filename=None, cache=None):
+        self._isa = isa
+        self.isa_filename = isa_filename or convert.ISA_FILENAME
+        self._encoder_table = None
+        self._vector_table = None
+        self._decode_index = None
+        self.cache = cache
+
+    @property
+    def isa(self):
+        '''the ISA table, loaded on first access'''
+        if self._isa is None:
+            self._isa = convert.get_isa(self.isa_filename)
+        return self._isa
+
+    @property
+    def encoder_table(self):
+        '''the per-mnemonic encoder table built from `isa`, built on first access'''
+        if self._encoder_table is None:
+            self._encoder_table = convert.build_encoder_table(self.isa)
+        return self._encoder_table
+
+    @property
+    def vector_table(self):
+        '''the column tables of the NumPy encoder (see vector.build_vector_table), built on first access'''
+        if self._vector_table is None:
+            from . import vector
+            self._vector_table = vector.build_vector_table(self.isa)
+        return self._vector_table
+
+    @property
+    def decode_index(self):
+        '''the disassembler's index built from `isa` (see decode.build_decode_index), built on first access'''
+        if self._decode_index is None:
+            from . import decode
+            self._decode_index = decode.build_decode_index(decode.build_decode_table(self.isa))
+        return self._decode_index
+
+    def cached(self, filename, out_filename, options, produce):
+        '''writes `out_filename` from the cache entry for the contents of `filename` and
+        `options`, or calls produce() to write it and stores the result in the cache'''
+        if self.cache is None:
+            produce()
+            return
+        key = self.cache.file_key(filename, self.isa, options)
+        if not self.cache.fetch(key, {'output': out_filename}):
+            produce()
+            self.cache.store(key, {'output': out_filename})
+
+    ## Part 3: scheduling
+    def schedule(self, lines):
+        '''tokenizes assembly source lines and reorders them to avoid data hazards'''
+        return rearrange.reorder_program(rearrange.tokenize(lines))
+
+    def schedule_file(self, filename, jobs=1):
+        '''schedule() on the lines of `filename`. With jobs > 1 the subsets are
+        scheduled on that many processes (see parallel.schedule_program_parallel).'''
+        instructions = rearrange.tokenize_file(filename)
+        if jobs > 1:
+            from . import parallel
+            return parallel.schedule_program_parallel(instructions, jobs)
+        return rearrange.reorder_program(instructions)
+
+    def hazard_report(self, filename, config=None):
+        '''stall counts of `filename` on a 5-stage pipeline (see hazards.PipelineConfig)
+        before and after schedule_file(), as a JSON-serializable dict'''
+        from . import hazards
+        return hazards.hazard_report(rearrange.tokenize_file(filename), config)
+
+    ## Part 1: label resolution
+    def preprocess(self, instructions):
+        '''resolves the labels and register names of tokenized instructions'''
+        return preprocess.preprocess(instructions, self.isa)
+
+    def preprocess_file(self, filename, out_filename=None, schedule=False, jobs=1, ir=False):
+        '''tokenizes an assembly file, optionally reorders it (schedule=True, on
+        `jobs` processes), resolves its labels and saves it as pre-processed assembly code.
+        With ir=True (and jobs=1) the file is tokenized into an ir.Program and every
+        stage runs on its columns, which keeps memory low for very large programs.
+        Returns the name of the written file (by default `*_out1.txt`).'''
+        if out_filename is None:
+            out_filename = os.path.splitext(filename)[0] + '_out1.txt'
+
+        def produce():
+            if ir and jobs == 1:
+                self._preprocess_program(filename, out_filename, schedule)
+                return
+            instructions = self.schedule_file(filename, jobs) if schedule else rearrange.tokenize_file(filename)
+            preprocess.save_processed(self.preprocess(instructions), out_filename)
+
+        # both paths write the same bytes, so `ir` is not part of the key
+        self.cached(filename, out_filename, {'command': 'preprocess', 'schedule': schedule}, produce)
+        return out_filename
+
+    def _preprocess_program(self, filename, out_filename, schedule):
+        from . import ir as program_ir
+        with open(filename, 'r') as f, mapped.collector_paused():
+            program = program_ir.Program.from_lists(rearrange.iter_tokens(f), self.isa)
+        if schedule:
+            program = program_ir.schedule_program(program)
+        program_ir.save_processed_program(program_ir.preprocess_program(program), out_filename)
+
+    def incremental(self, schedule=True):
+        '''an IncrementalAssembler that shares this ISA and encoder table: assembly
+        source -> machine code, reusing unchanged subsets between builds'''
+        from .incremental import IncrementalAssembler
+        return IncrementalAssembler(self.isa, self.encoder_table, schedule)
+
+    ## Part 2: encoding
+    def encode(self, inst_asm, vector=False):
+        '''converts pre-processed instructions to machine code words (array('I')).
+        vector=True uses the NumPy encoder, which reports every bad row at once.'''
+        if vector:
+            from . import vector as vector_encoder
+            return vector_encoder.to_array(vector_encoder.encode_machine_code_vector(inst_asm, self.isa, self.vector_table))
+        return convert.encode_machine_code(inst_asm, self.isa, self.encoder_table)
+
+    def machine_code(self, inst_asm):
+        '''converts pre-processed instructions to machine code strings'''
+        return convert.get_machine_code(inst_asm, self.isa, self.encoder_table)
+
+    def assemble_file(self, filename, out_filename=None, stream=False, chunk_size=convert.CHUNK_SIZE,
+                      fmt='text', base_address=0, vector=False, jobs=1, ir=False):
+        '''encodes a pre-processed `*_out1.txt` file and saves the machine code in
+        the output format `fmt` (see output.FORMATS).
+        With stream=True the file is processed chunk_size lines at a time, so
+        memory use stays constant (see convert.stream_machine_code).
+        With vector=True the file is parsed and encoded with NumPy
+        (see vector.encode_processed_file_vector).
+        With jobs > 1 the file is split into shards encoded on that many
+        processes (see parallel.encode_file_parallel).
+        With ir=True the file is read into an ir.Program and encoded from its columns.
+        Returns the name of the written file (by default `*_out2.bin` for text).'''
+        if out_filename is None:
+            out_filename = filename[:-5] + output.SUFFIXES[fmt]
+        # every mode writes the same bytes, so only the output options are part of the key
+        self.cached(filename, out_filename, {'command': 'assemble', 'format': fmt, 'base_address': base_address},
+                    lambda: self._assemble_file(filename, out_filename, stream, chunk_size, fmt, base_address,
+                                                vector, jobs, ir))
+        return out_filename
+
+    def _assemble_file(self, filename, out_filename, stream, chunk_size, fmt, base_address, vector, jobs, ir):
+        if jobs > 1:
+            from . import parallel
+            parallel.encode_file_parallel(filename, out_filename, jobs, fmt, base_address, self.isa)
+        elif vector:
+            from . import vector as vector_encoder
+            words = vector_encoder.encode_processed_file_vector(filename, self.isa, self.vector_table)
+            convert.save_bin(vector_encoder.to_array(words), out_filename, fmt, base_address)
+        elif stream:
+            convert.stream_machine_code(filename, out_filename, chunk_size, self.isa, self.encoder_table,
+                                        fmt, base_address)
+        elif ir:
+            from . import ir as program_ir
+            program = program_ir.read_processed_program(filename, self.isa)
+            convert.save_bin(program_ir.encode_program(program, self.encoder_table), out_filename, fmt, base_address)
+        elif fmt == 'text':
+            convert.save_bin(self.machine_code(convert.read_processed(filename, self.isa)), out_filename)
+        else:
+            convert.save_bin(self.encode(convert.read_processed(filename, self.isa)), out_filename, fmt, base_address)
+
+    ## Disassembly
+    def disassemble(self, words, strict=True):
+        '''converts machine code words back to pre-processed instructions
+        (the format of convert.read_processed, see decode.disassemble_words)'''
+        from . import decode
+        return decode.disassemble_words(words, self.isa, self.decode_index, strict)
+
+    def disassemble_file(self, filename, out_filename=None, fmt='auto', strict=True):
+        '''disassembles a text `*_out2.bin` file or a raw image (fmt: auto, text or raw)
+        and saves it as pre-processed assembly code, which assemble_file() turns back
+        into the same machine code. Returns the name of the written file (by default `*_dis.txt`).'''
+        from . import decode
+        if out_filename is None:
+            out_filename = os.path.splitext(filename)[0] + '_dis.txt'
+        preprocess.save_processed(self.disassemble(decode.read_program(filename, fmt), strict), out_filename)
+        return out_filename
@@ -0,0 +1,162 @@
+# Batch assembly of many source files: the full flow (tokenize -> reorder_program -> preprocess ->
+# save_processed -> read_processed -> get_machine_code -> save_bin) for every file, on a process
+# pool whose workers load the ISA and encoder tables once. Outputs go to a directory tree that
+# mirrors the inputs under a common root. A failing file is reported and the batch goes on.
+
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from . import convert, output, preprocess, rearrange
+
+_worker = None  # (isa, encoder table) of this process
+
+
+## Inputs
+def expand_inputs(patterns=(), manifest=None):
+    '''file names matching the glob `patterns` (`**` recurses) and the lines of the `manifest`
+    file (paths or globs relative to the manifest, `#` comments), without duplicates, in order.
+    Raises ValueError for a pattern that matches nothing.'''
+    entries = [(pattern, '') for pattern in patterns]
+    if manifest is not None:
+        base = os.path.dirname(os.path.abspath(manifest))
+        with open(manifest, 'r') as f:
+            for line in f:
+                line = line.split('#', 1)[0].strip()
+                if line:
+                    entries.append((line, base))
+    files = []
+    seen = set()
+    for pattern, base in entries:
+        path = os.path.join(base, pattern)
+        matches = sorted(glob.glob(path, recursive=True)) if glob.has_magic(path) else [path]
+        matches = [match for match in matches if os.path.isfile(match) or not glob.has_magic(path)]
+        if not matches:
+            raise ValueError(f"No input files match: {pattern}")
+        for match in matches:
+            key = os.path.abspath(match)
+            if key not in seen:
+                seen.add(key)
+                files.append(match)
+    return files
+
+
+def output_names(filename, out_dir=None, root=None, fmt='text'):
+    '''(`*_out1.txt`, machine code file) of an input: next to it, or with out_dir at the
+    same place relative to out_dir as the input is relative to root'''
+    stem = os.path.splitext(filename)[0]
+    if out_dir is not None:
+        relative = os.path.relpath(os.path.abspath(stem), os.path.abspath(root or os.getcwd()))
+        if relative.split(os.sep)[0] == os.pardir:
+            raise ValueError(f"{filename} is not under the root directory {root}")
+        stem = os.path.join(out_dir, relative)
+    return stem + '_out1.txt', stem + '_out' + output.SUFFIXES[fmt]
+
+
+def common_root(files):
+    '''the deepest directory that holds every file'''
+    if not files:
+        return os.getcwd()
+    return os.path.commonpath([os.path.dirname(os.path.abspath(filename)) for filename in files])
+
+
+## Workers
+def _init_worker(isa_filename):
+    global _worker
+    isa = convert.get_isa(isa_filename)
+    _worker = (isa, convert.build_encoder_table(isa))
+
+
+def assemble_one(job):
+    '''runs the full flow on one file; returns {'file', 'ok', 'instructions', 'seconds',
+    'outputs'} or {'file', 'ok': False, 'error', 'seconds'} (errors are not raised)'''
+    filename, out1, out2, schedule, fmt, base_address = job
+    isa, table = _worker
+    start = time.perf_counter()
+    try:
+        os.makedirs(os.path.dirname(out1) or '.', exist_ok=True)
+        os.makedirs(os.path.dirname(out2) or '.', exist_ok=True)
+        instructions = rearrange.tokenize_file(filename)
+        if schedule:
+            instructions = rearrange.reorder_program(instructions)
+        preprocess.save_processed(preprocess.preprocess(instructions, isa), out1)
+        inst_asm = convert.read_processed(out1, isa)
+        if fmt == 'text':
+            convert.save_bin(convert.get_machine_code(inst_asm, isa, table), out2)
+        else:
+            convert.save_bin(convert.encode_machine_code(inst_asm, isa, table), out2, fmt, base_address)
+    except Exception as error:  # reported per file, the batch goes on
+        return {'file': filename, 'ok': False, 'error': f"{type(error).__name__}: {error}",
+                'seconds': time.perf_counter() - start}
+    return {'file': filename, 'ok': True, 'instructions': len(inst_asm), 'seconds': time.perf_counter() - start,
+            'outputs': [out1, out2]}
+
+
+def run_batch(files, out_dir=None, root=None, jobs=None, schedule=True, fmt='text', base_address=0,
+              isa_filename=None, progress=None):
+    '''assemble_one() on every file on `jobs` processes (default: all cores; 1 runs in this
+    process). Outputs mirror the inputs under `root` (default: common_root(files)) in out_dir,
+    or go next to the inputs; inputs that would write the same outputs (a.asm and a.s) all
+    fail. progress(result) is called as each file finishes, in input order.
+    Returns (results in input order, totals).'''
+    isa_filename = isa_filename or convert.ISA_FILENAME
+    if fmt not in output.FORMATS:
+        raise ValueError(f"Invalid output format: {fmt} (must be one of {', '.join(output.FORMATS)})")
+    root = root or common_root(files)
+    jobs = jobs or os.cpu_count() or 1
+    results = []
+    start = time.perf_counter()
+
+    def finish(result):
+        results.append(result)
+        if progress is not None:
+            progress(result)
+
+    work = []
+    for filename in files:
+        try:
+            work.append((filename,) + output_names(filename, out_dir, root, fmt) + (schedule, fmt, base_address))
+        except ValueError as error:
+            work.append(error)
+    # inputs that share a stem (a.asm and a.s) would write the same outputs: none of them is assembled
+    writers = {}
+    for job in work:
+        if isinstance(job, tuple):
+            for name in job[1:3]:
+                writers.setdefault(os.path.normcase(os.path.abspath(name)), []).append(job[0])
+    for i, job in enumerate(work):
+        if isinstance(job, tuple):
+            others = [other for name in job[1:3] for other in writers[os.path.normcase(os.path.abspath(name))]
+                      if other != job[0]]
+            if others:
+                work[i] = ValueError(f"{job[0]} and {', '.join(sorted(set(others)))} have the same output files")
+
+    if jobs == 1 or len(files) <= 1:
+        _init_worker(isa_filename)
+        for filename, job in zip(files, work):
+            finish(assemble_one(job) if isinstance(job, tuple) else
+                   {'file': filename, 'ok': False, 'error': f"ValueError: {job}", 'seconds': 0.0})
+    else:
+        with ProcessPoolExecutor(min(jobs, len(files)), initializer=_init_worker, initargs=(isa_filename,)) as pool:
+            futures = [pool.submit(assemble_one, job) if isinstance(job, tuple) else job for job in work]
+            for filename, future in zip(files, futures):
+                if isinstance(future, ValueError):
+                    finish({'file': filename, 'ok': False, 'error': f"ValueError: {future}", 'seconds': 0.0})
+                    continue
+                try:
+                    finish(future.result())
+                except BrokenProcessPool as error:  # a worker died (e.g. out of memory)
+                    finish({'file': filename, 'ok': False, 'error': f"BrokenProcessPool: {error}", 'seconds': 0.0})
+    return results, summarize(results, time.perf_counter() - start)
+
+
+def summarize(results, seconds):
+    '''aggregate counts and throughput of run_batch() results over `seconds` of wall time'''
+    done = [result for result in results if result['ok']]
+    instructions = sum(result['instructions'] for result in done)
+    return {'files': len(results), 'succeeded': len(done), 'failed': len(results) - len(done),
+            'instructions': instructions, 'seconds': round(seconds, 6),
+            'files_per_second': round(len(results) / seconds, 2) if seconds else None,
+            'instructions_per_second': round(instructions / seconds) if seconds else None}
@@ -0,0 +1,186 @@
+# Persistent, content-addressed cache of assembler outputs (pre-processed `*_out1.txt` files and
+# machine code), shared by every process and job that points at the same directory.
+#
+# An entry is a directory named after the sha256 of everything its files depend on: the input
+# bytes, the ISA table, the assembler source code and the options. Entries are written to a
+# temporary directory and renamed into place, so readers only ever see complete entries and of
+# two processes storing the same entry, the first rename wins. A hit refreshes the entry's mtime;
+# when the cache grows past `max_bytes` the least recently used entries are renamed away and
+# then deleted, so a reader never sees a half-deleted entry (it just gets a miss).
+#
+# Each process keeps a running total of the cache size: the directory is scanned on the first
+# store and then only when the total passes max_bytes, and eviction goes down to LOW_WATER of
+# it so the next scan is a good number of stores away. Entries stored by other processes are
+# only seen at the next scan, so with several writers the cache can briefly exceed max_bytes.
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+from .isa_table import fingerprint
+
+## Bump when the key or the entry layout changes
+CACHE_FORMAT = 1
+DEFAULT_MAX_BYTES = 512 * 2**20
+READ_BYTES = 2**20  # block size for hashing inputs
+LOW_WATER = 0.9     # eviction brings the cache down to this fraction of max_bytes
+
+_code_version = None
+
+
+def default_directory():
+    '''$ISA_ASSEMBLER_CACHE, or isa_assembler under $XDG_CACHE_HOME (default ~/.cache)'''
+    if os.environ.get('ISA_ASSEMBLER_CACHE'):
+        return os.environ['ISA_ASSEMBLER_CACHE']
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'isa_assembler')
+
+
+def code_version():
+    '''hash of the package's own source files: any change to the assembler invalidates the cache'''
+    global _code_version
+    if _code_version is None:
+        digest = hashlib.sha256()
+        package = os.path.dirname(os.path.abspath(__file__))
+        for name in sorted(os.listdir(package)):
+            if name.endswith('.py'):
+                with open(os.path.join(package, name), 'rb') as f:
+                    digest.update(name.encode() + b'\0' + f.read() + b'\0')
+        _code_version = digest.hexdigest()
+    return _code_version
+
+
+class ArtifactCache:
+    '''content-addressed store of output files under `directory` (default: default_directory()),
+    kept below about `max_bytes` by evicting the least recently used entries'''
+
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory or default_directory()
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._size = None  # running total of the cache size, None until the first scan
+
+    def _digest(self, isa, options):
+        digest = hashlib.sha256()
+        digest.update(json.dumps([CACHE_FORMAT, code_version(), fingerprint(isa).hex(), options],
+                                 sort_keys=True).encode())
+        digest.update(b'\0')
+        return digest
+
+    def key(self, data, isa, options):
+        '''the entry key for input bytes `data` processed with the ISA table `isa`
+        ({name: InstRecord}) and the JSON-serializable `options`'''
+        digest = self._digest(isa, options)
+        digest.update(data)
+        return digest.hexdigest()
+
+    def file_key(self, filename, isa, options):
+        '''key() of the contents of `filename`, read in blocks'''
+        digest = self._digest(isa, options)
+        with open(filename, 'rb') as f:
+            for block in iter(lambda: f.read(READ_BYTES), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, 'objects', key[:2], key)
+
+    def _tmp(self):
+        tmp = os.path.join(self.directory, 'tmp')
+        os.makedirs(tmp, exist_ok=True)
+        return tmp
+
+    def fetch(self, key, artifacts):
+        '''copies the files of entry `key` to their destinations ({name: path}).
+        Returns False on a miss, including an entry evicted while it was being read.'''
+        entry = self._path(key)
+        try:
+            for name, dest in artifacts.items():
+                shutil.copyfile(os.path.join(entry, name), dest)
+            os.utime(entry)
+        except FileNotFoundError:
+            self.misses += 1
+            return False
+        self.hits += 1
+        return True
+
+    def store(self, key, artifacts):
+        '''adds entry `key` holding copies of the files {name: path}; once the running
+        size total passes max_bytes, evicts down to LOW_WATER of it. Returns False if the
+        entry already existed.'''
+        entry = self._path(key)
+        if os.path.isdir(entry):
+            return False
+        staging = tempfile.mkdtemp(dir=self._tmp())
+        try:
+            added = 0
+            for name, src in artifacts.items():
+                shutil.copyfile(src, os.path.join(staging, name))
+                added += os.path.getsize(os.path.join(staging, name))
+            os.makedirs(os.path.dirname(entry), exist_ok=True)
+            try:
+                os.rename(staging, entry)
+            except OSError:
+                # another process stored the same entry first
+                return False
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+        if self._size is None:
+            self._size = self.size()
+        else:
+            self._size += added
+        if self._size > self.max_bytes:
+            self.evict(int(self.max_bytes * LOW_WATER))
+        return True
+
+    def entries(self):
+        '''[(last use, bytes, key)] of every entry'''
+        found = []
+        objects = os.path.join(self.directory, 'objects')
+        try:
+            shards = [shard.path for shard in os.scandir(objects) if shard.is_dir()]
+        except FileNotFoundError:
+            return found
+        for shard in shards:
+            try:
+                names = [entry.path for entry in os.scandir(shard)]
+            except FileNotFoundError:
+                continue
+            for path in names:
+                try:
+                    size = sum(item.stat().st_size for item in os.scandir(path))
+                    found.append((os.stat(path).st_mtime, size, os.path.basename(path)))
+                except FileNotFoundError:
+                    continue  # evicted meanwhile
+        return found
+
+    def size(self):
+        '''total bytes of the files in the cache'''
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self, max_bytes=None):
+        '''removes least recently used entries until the cache holds at most
+        max_bytes (default: self.max_bytes); returns the number of bytes removed'''
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, key in entries:
+            if total - removed <= limit:
+                break
+            doomed = os.path.join(self._tmp(), f"evict-{key}-{os.getpid()}")
+            try:
+                os.rename(self._path(key), doomed)
+            except OSError:
+                continue  # evicted or refreshed by another process
+            shutil.rmtree(doomed, ignore_errors=True)
+            removed += size
+        self._size = total - removed
+        return removed
+
+    def clear(self):
+        '''removes every entry'''
+        return self.evict(0)
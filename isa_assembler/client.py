@@ -0,0 +1,143 @@
+# Thin client of the assembler daemon (daemon.py): sends one request per file over the daemon's
+# Unix socket and prints where the output went. Imports nothing but the standard library, so
+# each run costs a Python start-up and a socket round trip instead of loading the assembler.
+#
+# usage: python -m isa_assembler.client [--socket PATH] <command> [options] files...
+
+import argparse
+import json
+import os
+import socket
+import sys
+import tempfile
+
+## Same as daemon.default_socket(), without importing the daemon
+def default_socket():
+    if os.environ.get('ISA_ASSEMBLER_SOCKET'):
+        return os.environ['ISA_ASSEMBLER_SOCKET']
+    directory = os.environ.get('XDG_RUNTIME_DIR') or tempfile.gettempdir()
+    return os.path.join(directory, f'isa_assembler-{os.getuid()}.sock')
+
+
+class DaemonError(Exception):
+    '''a request the daemon answered with an error'''
+
+
+class Client:
+    '''a connection to the daemon on `socket_path` (default: default_socket());
+    request() sends a command and waits for its response'''
+
+    def __init__(self, socket_path=None, timeout=None):
+        self.socket_path = socket_path or default_socket()
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.settimeout(timeout)
+        self._socket.connect(self.socket_path)
+        self._file = self._socket.makefile('rb')
+        self._next_id = 0
+
+    def close(self):
+        self._file.close()
+        self._socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def send(self, command, **args):
+        '''sends a request without waiting; returns its id'''
+        self._next_id += 1
+        message = {'id': self._next_id, 'command': command, 'args': args}
+        self._socket.sendall(json.dumps(message).encode() + b'\n')
+        return self._next_id
+
+    def receive(self):
+        '''the next response (responses come back in the order requests finish)'''
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError("the daemon closed the connection")
+        return json.loads(line)
+
+    def request(self, command, **args):
+        '''sends one command and returns its result; raises DaemonError if it failed'''
+        request_id = self.send(command, **args)
+        response = self.receive()
+        if response.get('id') != request_id:
+            raise ConnectionError(f"unexpected response id {response.get('id')} (expected {request_id})")
+        if not response['ok']:
+            raise DaemonError(response['error'])
+        return response['result']
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m isa_assembler.client',
+                                     description="send requests to a running assembler daemon (python -m isa_assembler serve)")
+    parser.add_argument('--socket', help="daemon socket (default: $ISA_ASSEMBLER_SOCKET or isa_assembler-<uid>.sock)")
+    parser.add_argument('--isa', help="ISA csv file (default: the daemon's)")
+    parser.add_argument('--stats', action='store_true', help="print each response's timing (JSON) to stderr")
+    sub = parser.add_subparsers(dest='command', required=True)
+    for command, help_text in (('preprocess', "resolve labels and registers into *_out1.txt files"),
+                               ('assemble', "convert *_out1.txt files to machine code"),
+                               ('disassemble', "convert machine code back to pre-processed code"),
+                               ('build', "assemble source files straight to machine code, reusing unchanged subsets"),
+                               ('schedule', "reorder assembly files to avoid data hazards")):
+        p = sub.add_parser(command, help=help_text)
+        p.add_argument('files', nargs='+')
+        p.add_argument('-o', '--output', help="output file (only with a single input)")
+        if command in ('assemble', 'build'):
+            p.add_argument('-f', '--format', default='text', help="output format (default: %(default)s)")
+            p.add_argument('--base-address', type=lambda val: int(val, 0), default=0)
+        if command == 'disassemble':
+            p.add_argument('-f', '--format', default='auto', help="input format (default: %(default)s)")
+        if command == 'preprocess':
+            p.add_argument('--schedule', action='store_true', help="reorder to avoid data hazards first")
+        if command == 'build':
+            p.add_argument('--no-schedule', action='store_true', help="do not reorder to avoid data hazards")
+            p.add_argument('--state', help="incremental state file kept by the daemon")
+    sub.add_parser('stats', help="print the daemon's request counts and times (JSON)")
+    sub.add_parser('ping', help="check that the daemon is running")
+    sub.add_parser('shutdown', help="stop the daemon")
+    args = parser.parse_args(argv)
+
+    try:
+        client = Client(args.socket)
+    except OSError as error:
+        sys.exit(f"cannot connect to the assembler daemon: {error}")
+    with client:
+        if args.command in ('stats', 'ping', 'shutdown'):
+            result = client.request(args.command)
+            print(json.dumps(result, indent=2) if args.command == 'stats' else result)
+            return
+        failed = False
+        for filename in args.files:
+            request = {'file': os.path.abspath(filename)}
+            if args.isa:
+                request['isa'] = os.path.abspath(args.isa)
+            if args.output and len(args.files) == 1:
+                request['output'] = os.path.abspath(args.output)
+            for option in ('format', 'base_address', 'schedule'):
+                if getattr(args, option, None) is not None:
+                    request[option] = getattr(args, option)
+            if args.command == 'build':
+                request['schedule'] = not args.no_schedule
+                if args.state:
+                    request['state'] = os.path.abspath(args.state)
+            client.send(args.command, **request)
+            response = client.receive()
+            if args.stats:
+                print(json.dumps({'file': filename, **response.get('stats', {})}), file=sys.stderr)
+            if not response['ok']:
+                print(f"{filename}: {response['error']}", file=sys.stderr)
+                failed = True
+            elif args.command == 'schedule' and 'output' not in request:
+                sys.stdout.write(response['result'])
+            else:
+                result = response['result']
+                print("Saved to: ", result['output'] if isinstance(result, dict) else result)
+        if failed:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
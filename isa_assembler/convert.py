@@ -0,0 +1,421 @@
+# ISA Assembler Design (Part 2) to utilize the **pre-processed assembly code** obtained in part 1 and convert it to **machine code**.
+
+# %%
+import re
+from array import array
+from itertools import islice
+
+from . import instrument, mapped
+from .isa_table import load_isa
+from .output import write_words
+
+## Operand positions that hold immediates, by format (every other operand is a register)
+IMM_POSITIONS = {'R': (), 'I': (3,), 'S': (3,), 'B': (3,), 'J': (2,), 'U': (2,)}
+OPERAND_COUNTS = {'R': 3, 'I': 3, 'S': 3, 'B': 3, 'J': 2, 'U': 2}
+
+def _parse_operand(arg, is_register):
+    '''converts a decimal operand to int, plus 0x../0b.. for immediates;
+    anything else is returned unchanged'''
+    if arg.isascii() and '_' not in arg:
+        try:
+            return int(arg)
+        except ValueError:
+            pass
+        if not is_register:
+            prefix = (arg[1:] if arg[:1] in '+-' else arg)[:2].lower()
+            if prefix in ('0x', '0b'):
+                try:
+                    return int(arg, 16 if prefix == '0x' else 2)
+                except ValueError:
+                    pass
+    return arg
+
+## Function to split a line of pre-processed assembly code into its arguments
+def parse_processed_line(line, isa=None):
+    '''splits a line into arguments: the instruction name stays a string and
+    operands are converted to int. Registers must be decimal; immediates may
+    also be written in hex (0x..) or binary (0b..). Operands that are not
+    integers (e.g. labels) are kept as strings.'''
+    args = line.split()
+    if len(args) > 1:
+        # fast path: all operands are plain decimal integers
+        if line.isascii() and '_' not in line:
+            try:
+                args[1:] = map(int, args[1:])
+                return args
+            except ValueError:
+                pass
+        if isa is None:
+            isa = get_default_isa()
+        rec = isa.get(args[0])
+        # unknown instructions: no position is known to be a register
+        imm = IMM_POSITIONS.get(rec.format) if rec is not None else None
+        for i in range(1, len(args)):
+            args[i] = _parse_operand(args[i], imm is not None and i not in imm)
+    return args
+
+## Function to read .txt file with pre-processed assembly code
+@instrument.timed('parse')
+def read_processed(filename, isa=None):
+    '''read each line from a file (memory-mapped, one chunk at a time)'''
+    known = isa if isa is not None else _default_isa
+    names = {} if known is None else {name.encode(): (name, OPERAND_COUNTS[rec.format])
+                                      for name, rec in known.items() if rec.format in OPERAND_COUNTS}
+    asm_inst = list()
+    with mapped.map_file(filename) as data, mapped.collector_paused():
+        for chunk in mapped.iter_chunks(data):
+            asm_inst += _read_processed_chunk(chunk, names, isa)
+    return asm_inst
+
+## Bytes that parse_processed_line() treats specially (non-ASCII, `_`, \r and other control characters)
+_UNUSUAL_BYTES = re.compile(rb'[^\t\n\x20-\x7e]|_')
+
+def _read_processed_chunk(chunk, names, isa):
+    '''parse_processed_line() of every line of a chunk of bytes. Chunks where every line is a
+    known instruction with its number of decimal operands are split in one call and walked
+    token by token; any other chunk is parsed line by line.'''
+    if names and not _UNUSUAL_BYTES.search(chunk):
+        asm_inst = []
+        append = asm_inst.append
+        tokens = iter(chunk.split())
+        try:
+            for token in tokens:
+                # a line with a missing or extra operand shifts a mnemonic into int() or a number into names[]
+                name, count = names[token]
+                if count == 3:
+                    append([name, int(next(tokens)), int(next(tokens)), int(next(tokens))])
+                else:
+                    append([name, int(next(tokens)), int(next(tokens))])
+        except (KeyError, ValueError, StopIteration):
+            pass
+        else:
+            # blank lines are [] in read_processed(), so they must fall back too
+            if len(asm_inst) == chunk.count(b'\n') + (not chunk.endswith(b'\n')):
+                return asm_inst
+    return [parse_processed_line(line, isa) for line in mapped.text_lines(chunk)]
+
+## Function to print the instructions
+def print_asm_inst(inst_asm):
+    '''prints list of instructions'''
+    print("Assembly Instructions:")
+    if len(inst_asm) == 0:
+        print(None)
+    else:
+        for line in inst_asm:
+            print(line)
+
+## Read csv file containing the format for each type of instruction
+@instrument.timed('isa')
+def get_isa(filename):
+        '''returns {name: InstRecord}, loaded from the binary cache next to the csv when it is up to date'''
+        return load_isa(filename)
+
+## The default ISA table is only loaded the first time an instruction is looked up
+ISA_FILENAME = 'rv32im_isa.csv'
+_default_isa = None
+
+def get_default_isa():
+    '''returns the ISA table for ISA_FILENAME, loading it on first use'''
+    global _default_isa
+    if _default_isa is None:
+        _default_isa = get_isa(ISA_FILENAME)
+    return _default_isa
+
+## Gets the encoding for the respective instruction
+def get_inst_format(inst_name, isa=None):
+    '''gets the instruction's format based on its name'''
+    if isa is None:
+        isa = get_default_isa()
+    try:
+        val = isa[inst_name].format
+    except:
+        raise KeyError(f"Invalid instruction: {inst_name}")
+    if val is None:
+        raise ValueError(f"Instruction '{inst_name}' does not have a format")
+    return val
+
+def get_inst_opcode(inst_name, isa=None):
+    '''gets the instruction's opcode based on its name'''
+    if isa is None:
+        isa = get_default_isa()
+    try:
+        val = isa[inst_name].opcode
+    except:
+        raise KeyError(f"Invalid instruction: {inst_name}")
+    if val is None:
+        raise ValueError(f"Instruction '{inst_name}' does not have an opcode")
+    return format(val, '07b')
+
+def get_inst_funct3(inst_name, isa=None):
+    '''gets the instruction's funct3 based on its name'''
+    if isa is None:
+        isa = get_default_isa()
+    try:
+        val = isa[inst_name].funct3
+    except:
+        raise KeyError(f"Invalid instruction: {inst_name}")
+    if val is None:
+        raise ValueError(f"Instruction '{inst_name}' does not have 'funct3'")
+    return format(val, '03b')
+
+def get_inst_funct7(inst_name, isa=None):
+    '''gets the instruction's funct7 based on its name'''
+    if isa is None:
+        isa = get_default_isa()
+    try:
+        val = isa[inst_name].funct7
+    except:
+        raise KeyError(f"Invalid instruction: {inst_name}")
+    if val is None:
+        raise ValueError(f"Instruction '{inst_name}' does not have 'funct7'")
+    return format(val, '07b')
+
+
+
+## Convert int to bin (signed 2's C or unsigned)
+def get_2c_binary(integer:int, bits=32, is_signed=True):
+        '''converts integert to binary size bits.
+        If is_signed=True, then converts to 2's Complement binary;
+        Otherwise, converts to unsigned binary'''
+        limit = 2**(bits)
+        if is_signed:
+            if (int(integer) < -limit/2) or (int(integer) >= limit/2):
+                raise ValueError(f"Value outside of range: {integer}.\nMust be between [{-limit/2}, {limit/2}).")
+        else:
+            if (int(integer) < 0) or (int(integer) >= limit):
+                raise ValueError(f"Value outside of range: {integer}.\nMust be between [0, {limit}).")
+        # if no issues:
+        return format(int(integer) & (limit-1), f"0{bits}b")
+
+# %% [markdown]
+# function that converts the above instructions from `inst_asm` into machine code.
+# 
+# _**Note:** python indexing is <u>backwards</u> compared to how we conventionally index in hardware design. This is important to know when implementing the `imm` (immediate) field._
+# 
+# _**Note:** since immediate values can be <u>negative</u>, we must account for this when converting integers._
+
+# %%
+def get_line_machine_code(line, isa=None):
+    '''converts a single assembly instruction to its machine code string'''
+    inst_name = line[0]
+    match (get_inst_format(inst_name, isa)):
+
+        # R-type
+        case 'R':
+            # get fields
+            opcode = get_inst_opcode(inst_name, isa)
+            funct7 = get_inst_funct7(inst_name, isa)
+            funct3 = get_inst_funct3(inst_name, isa)
+            rd = get_2c_binary(line[1], 5, is_signed=False)
+            rs1 = get_2c_binary(line[2], 5, is_signed=False)
+            rs2 = get_2c_binary(line[3], 5, is_signed=False)
+            # assemble instruction
+            return str(funct7) + str(rs2) + str(rs1) + str(funct3) + str(rd) + str(opcode)
+
+        case 'I':
+            # get fields
+            opcode = get_inst_opcode(inst_name, isa)
+            funct3 = get_inst_funct3(inst_name, isa)
+            rd = get_2c_binary(line[1], 5, is_signed=False)
+            rs1 = get_2c_binary(line[2], 5, is_signed=False)
+            imm = get_2c_binary(line[3], 12, is_signed=True)
+            # assemble instruction
+            return str(imm) + str(rs1) + str(funct3) + str(rd) + str(opcode)
+
+        case 'S':
+            # get fields
+            opcode = get_inst_opcode(inst_name, isa)
+            funct3 = get_inst_funct3(inst_name, isa)
+            imm = get_2c_binary(line[3], 12)
+            rs1 = get_2c_binary(line[1], 5, is_signed=False)
+            rs2 = get_2c_binary(line[2], 5, is_signed=False)
+            # assemble instruction
+            return str(imm[0:7]) + str(rs2) + str(rs1) + str(funct3) + str(imm[7:12]) + str(opcode)
+
+        case 'B':
+            # get fields
+            opcode = get_inst_opcode(inst_name, isa)
+            funct3 = get_inst_funct3(inst_name, isa)
+            imm = get_2c_binary(line[3], 13)
+            rs1 = get_2c_binary(line[1], 5, is_signed=False)
+            rs2 = get_2c_binary(line[2], 5, is_signed=False)
+            # assemble instruction
+            return str(imm[0:7]) + str(rs2) + str(rs1) + str(funct3) + str(imm[7:12]) + str(opcode)
+
+        case 'J':
+            # get fields
+            opcode = get_inst_opcode(inst_name, isa)
+            imm = get_2c_binary(line[2], 21)
+            rd = get_2c_binary(line[1], 5, is_signed=False)
+            # assemble instruction
+            return str(imm[0:20]) + str(rd) + str(opcode)
+
+        case _:  # Other (default)
+            return "0" * 32  # assemble instruction: NOP
+
+# %% [markdown]
+# The encoder below packs the same fields with shifts and masks straight into 32-bit integers.
+# 
+# _**Note:** the `B` and `J` layouts follow `get_line_machine_code()` above (`imm[12:6]`/`imm[5:1]` and `imm[20:1]`), **not** the scrambled layouts of the RISC-V spec._
+
+# %%
+## Precomputed [lo, hi) bounds for each field checked by the encoder
+REG_BOUNDS = (0, 2**5)
+IMM_BOUNDS = {'I': (-2**11, 2**11), 'S': (-2**11, 2**11), 'B': (-2**12, 2**12), 'J': (-2**20, 2**20)}
+
+## Builds the per-mnemonic encoder table
+@instrument.timed('isa')
+def build_encoder_table(isa=None):
+    '''maps each instruction name to (format, base word), where the base word
+    already holds the opcode, funct3 and funct7 bits used by that format.
+    Instructions that cannot be encoded are left out of the table.'''
+    if isa is None:
+        isa = get_default_isa()
+    table = dict()
+    for inst_name, rec in isa.items():
+        fmt = rec.format
+        if fmt is None or rec.opcode is None:
+            continue
+        base = rec.opcode
+        if fmt in ('R', 'I', 'S', 'B'):
+            if rec.funct3 is None:
+                continue
+            base |= rec.funct3 << 12
+        if fmt == 'R':
+            if rec.funct7 is None:
+                continue
+            base |= rec.funct7 << 25
+        if fmt not in ('R', 'I', 'S', 'B', 'J'):
+            base = 0  # NOP, same as the default case of get_line_machine_code()
+        table[inst_name] = (fmt.value, base)
+    return table
+
+_default_encoder_table = None
+
+def get_default_encoder_table():
+    '''returns the encoder table for the default ISA, building it on first use'''
+    global _default_encoder_table
+    if _default_encoder_table is None:
+        _default_encoder_table = build_encoder_table(get_default_isa())
+    return _default_encoder_table
+
+@instrument.timed('encode')
+def encode_machine_code(inst_asm, isa=None, table=None):
+    '''converts the assembly code to machine code words stored in an array('I').
+    `table` must have been built from `isa` (both default to the lazily loaded ISA).
+    Lines that the table cannot encode directly (unknown instructions, non-integer
+    or out-of-range fields) go through get_line_machine_code(), so they produce
+    the same result or raise the same error as before.'''
+    if table is None:
+        table = get_default_encoder_table() if isa is None else build_encoder_table(isa)
+    inst_words = array('I')
+    append = inst_words.append
+    reg_lo, reg_hi = REG_BOUNDS
+    i_lo, i_hi = IMM_BOUNDS['I']
+    s_lo, s_hi = IMM_BOUNDS['S']
+    b_lo, b_hi = IMM_BOUNDS['B']
+    j_lo, j_hi = IMM_BOUNDS['J']
+
+    for line in inst_asm:
+        entry = table.get(line[0])
+        try:
+            fmt, base = entry
+            if fmt == 'R':
+                rd, rs1, rs2 = line[1], line[2], line[3]
+                if reg_lo <= rd < reg_hi and reg_lo <= rs1 < reg_hi and reg_lo <= rs2 < reg_hi:
+                    append(base | rd << 7 | rs1 << 15 | rs2 << 20)
+                    continue
+            elif fmt == 'I':
+                rd, rs1, imm = line[1], line[2], line[3]
+                if reg_lo <= rd < reg_hi and reg_lo <= rs1 < reg_hi and i_lo <= imm < i_hi:
+                    append(base | rd << 7 | rs1 << 15 | (imm & 0xFFF) << 20)
+                    continue
+            elif fmt == 'S':
+                rs1, rs2, imm = line[1], line[2], line[3]
+                if reg_lo <= rs1 < reg_hi and reg_lo <= rs2 < reg_hi and s_lo <= imm < s_hi:
+                    append(base | (imm & 0x1F) << 7 | rs1 << 15 | rs2 << 20 | (imm >> 5 & 0x7F) << 25)
+                    continue
+            elif fmt == 'B':
+                rs1, rs2, imm = line[1], line[2], line[3]
+                if reg_lo <= rs1 < reg_hi and reg_lo <= rs2 < reg_hi and b_lo <= imm < b_hi:
+                    append(base | (imm >> 1 & 0x1F) << 7 | rs1 << 15 | rs2 << 20 | (imm >> 6 & 0x7F) << 25)
+                    continue
+            elif fmt == 'J':
+                rd, imm = line[1], line[2]
+                if reg_lo <= rd < reg_hi and j_lo <= imm < j_hi:
+                    append(base | rd << 7 | (imm >> 1 & 0xFFFFF) << 12)
+                    continue
+            else:
+                append(base)
+                continue
+        except (TypeError, IndexError):
+            pass
+        # slow path: reproduces the result (or the error) of the string encoder
+        append(int(get_line_machine_code(line, isa), 2))
+
+    return inst_words
+
+@instrument.timed('encode')
+def get_machine_code(inst_asm, isa=None, table=None):
+    '''converts the assembly code to machine code'''
+    return [format(word, '032b') for word in encode_machine_code(inst_asm, isa, table)]
+
+
+# %% [markdown]
+# function to save the processed assembly code to a `.bin` file, or to one of the image formats of `output.py` (`raw`, `ihex`, `readmemh`, `elf`)
+
+# %%
+@instrument.timed('io', items_arg=0)
+def save_bin(inst_bin, filename, fmt='text', base_address=0):
+
+    '''save each machine code to a file.
+    `inst_bin` holds either machine code strings (get_machine_code) or words
+    (encode_machine_code); `fmt` is one of output.FORMATS.'''
+    if fmt == 'text' and not isinstance(inst_bin, array):
+        with open(filename, 'w') as bin_file:
+            # Write each binary string to a new line in the file
+            bin_file.write(''.join([binary_string + '\n' for binary_string in inst_bin]))
+        return
+    words = inst_bin if isinstance(inst_bin, array) else array('I', [int(binary_string, 2) for binary_string in inst_bin])
+    write_words([words], filename, fmt, base_address)
+
+# %% [markdown]
+# Streaming mode: reading, tokenizing, encoding and writing are chained generators that pass `chunk_size` lines at a time, so memory use does not depend on the size of the program.
+# 
+# _**Note:** an error part-way through leaves the lines written so far in the output file._
+
+# %%
+CHUNK_SIZE = 8192  # lines per chunk
+
+def iter_processed_chunks(filename, chunk_size=CHUNK_SIZE):
+    '''yields the lines of a pre-processed file as lists of at most chunk_size raw lines'''
+    with open(filename, 'r') as f:
+        while True:
+            chunk = list(islice(f, chunk_size))
+            if not chunk:
+                return
+            yield chunk
+
+def iter_tokenized(chunks, isa=None):
+    '''tokenizes each chunk of raw lines like read_processed()'''
+    for chunk in chunks:
+        yield [parse_processed_line(line, isa) for line in chunk]
+
+def iter_machine_code(chunks, isa=None, table=None):
+    '''encodes each chunk of tokenized lines into an array('I') of machine code words'''
+    if table is None:
+        table = get_default_encoder_table() if isa is None else build_encoder_table(isa)
+    for chunk in chunks:
+        yield encode_machine_code(chunk, isa, table)
+
+def save_bin_stream(word_chunks, filename, fmt='text', base_address=0):
+    '''writes chunks of machine code words like save_bin(), one write per chunk.
+    Returns the number of instructions written.'''
+    return write_words(word_chunks, filename, fmt, base_address)
+
+@instrument.timed('encode')
+def stream_machine_code(filename, out_filename, chunk_size=CHUNK_SIZE, isa=None, table=None, fmt='text', base_address=0):
+    '''read_processed() -> get_machine_code() -> save_bin() with bounded memory.
+    Returns the number of instructions written.'''
+    chunks = iter_tokenized(iter_processed_chunks(filename, chunk_size), isa)
+    return save_bin_stream(iter_machine_code(chunks, isa, table), out_filename, fmt, base_address)
@@ -0,0 +1,264 @@
+# Resident assembler service: keeps the ISA tables, encoder tables, incremental build state
+# and the artifact cache of every ISA it has seen in memory, and serves requests over a local
+# Unix socket, so a build that assembles thousands of small files pays the start-up cost once.
+#
+# Protocol: one JSON object per line in each direction. A request is
+#   {"id": any, "command": "preprocess" | "assemble" | "schedule" | "disassemble" | "build"
+#              | "stats" | "ping" | "shutdown", "args": {...}}
+# and its response is {"id", "ok": true, "result", "stats": {"seconds", "queued"}} or
+# {"id", "ok": false, "error"}. File names must be absolute (client.py resolves them).
+# Requests of one connection run concurrently and may be answered out of order; the work
+# itself runs on a thread pool (the stages are pure Python, so threads overlap file I/O and
+# waiting, not computation). Incremental builds of the same state file, or without one of
+# the same source file, are serialized.
+
+import asyncio
+import json
+import os
+import stat
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from . import convert, rearrange
+from .api import Assembler
+
+COMMANDS = ('preprocess', 'assemble', 'schedule', 'disassemble', 'build', 'stats', 'ping', 'shutdown')
+MAX_LINE = 2**24  # bytes of the longest request
+MAX_BUILDERS = 256  # incremental builders kept for builds without a state file (one per source file)
+
+
+def default_socket():
+    '''$ISA_ASSEMBLER_SOCKET, or isa_assembler-<uid>.sock in $XDG_RUNTIME_DIR (default: the temp directory)'''
+    if os.environ.get('ISA_ASSEMBLER_SOCKET'):
+        return os.environ['ISA_ASSEMBLER_SOCKET']
+    directory = os.environ.get('XDG_RUNTIME_DIR') or tempfile.gettempdir()
+    return os.path.join(directory, f'isa_assembler-{os.getuid()}.sock')
+
+
+class AssemblerDaemon:
+    '''serves assembler requests on the Unix socket `socket_path` (default: default_socket()).
+    `isa_filename` is the ISA of requests that do not name one; `cache` is an ArtifactCache
+    shared by every request; `threads` bounds the requests worked on at once.'''
+
+    def __init__(self, socket_path=None, isa_filename=None, cache=None, threads=4):
+        self.socket_path = socket_path or default_socket()
+        self.isa_filename = os.path.abspath(isa_filename or convert.ISA_FILENAME)
+        self.cache = cache
+        self.executor = ThreadPoolExecutor(threads)
+        self._assemblers = {}  # ISA file name -> (mtime and size of the file, Assembler)
+        self._builders = {}    # (Assembler, schedule, state file) -> (lock, IncrementalAssembler)
+        self._file_builders = OrderedDict()  # (Assembler, schedule, source file) -> same, least recently used first
+        self._lock = threading.Lock()
+        self._stop = None
+        self._connections = {}  # handler task -> its StreamReader
+        self.started = time.time()
+        self.stats = {}        # command -> {'requests', 'errors', 'seconds', 'max_seconds'}
+
+    ## Warm state
+    def assembler(self, isa_filename=None):
+        '''the Assembler of an ISA file, created (and its tables built) on first use
+        and again whenever the file changes'''
+        isa_filename = os.path.abspath(isa_filename) if isa_filename else self.isa_filename
+        info = os.stat(isa_filename)
+        stamp = (info.st_mtime_ns, info.st_size)
+        with self._lock:
+            entry = self._assemblers.get(isa_filename)
+            if entry is None or entry[0] != stamp:
+                entry = self._assemblers[isa_filename] = (stamp, Assembler(isa_filename=isa_filename, cache=self.cache))
+        assembler = entry[1]
+        assembler.encoder_table  # loads the tables now rather than in the middle of a command
+        return assembler
+
+    def builder(self, assembler, schedule, state, filename):
+        '''(lock, IncrementalAssembler) kept for an ISA, scheduling mode and state file or,
+        without a state file, for the source file, so builds of different files do not
+        wait for each other or replace each other's reusable subsets. At most MAX_BUILDERS
+        of the latter are kept.'''
+        with self._lock:
+            if state:
+                key = (assembler, schedule, state)
+                entry = self._builders.get(key)
+                if entry is None:
+                    builder = assembler.incremental(schedule)
+                    builder.load(state)
+                    entry = self._builders[key] = (threading.Lock(), builder)
+                return entry
+            key = (assembler, schedule, filename)
+            entry = self._file_builders.get(key)
+            if entry is None:
+                entry = self._file_builders[key] = (threading.Lock(), assembler.incremental(schedule))
+                if len(self._file_builders) > MAX_BUILDERS:
+                    self._file_builders.popitem(last=False)
+            else:
+                self._file_builders.move_to_end(key)
+            return entry
+
+    ## Commands (run on the thread pool)
+    def execute(self, command, args):
+        '''runs one command; returns its JSON-serializable result'''
+        if command == 'ping':
+            return 'pong'
+        if command == 'stats':
+            return self.report()
+        assembler = self.assembler(args.get('isa'))
+        filename = args['file']
+        if not os.path.isabs(filename):
+            raise ValueError(f"File names must be absolute: {filename}")
+        output = args.get('output')
+        if command == 'preprocess':
+            return assembler.preprocess_file(filename, output, schedule=args.get('schedule', False))
+        if command == 'assemble':
+            return assembler.assemble_file(filename, output, fmt=args.get('format', 'text'),
+                                           base_address=args.get('base_address', 0))
+        if command == 'disassemble':
+            return assembler.disassemble_file(filename, output, args.get('format', 'auto'))
+        if command == 'schedule':
+            lines = [rearrange.format_instruction(line) + '\n' for line in assembler.schedule_file(filename)]
+            if output is None:
+                return ''.join(lines)
+            with open(output, 'w') as f:
+                f.write(''.join(lines))
+            return output
+        if command == 'build':
+            return self._build(assembler, filename, output, args)
+        raise ValueError(f"Unknown command: {command}")
+
+    def _build(self, assembler, filename, output, args):
+        fmt = args.get('format', 'text')
+        schedule = args.get('schedule', True)
+        state = args.get('state')
+        lock, builder = self.builder(assembler, schedule, state, filename)
+        with lock:
+            output = builder.build_file(filename, output, fmt, args.get('base_address', 0))
+            if state:
+                builder.save(state)
+            return {'output': output, 'stats': builder.stats}
+
+    def report(self):
+        '''uptime, loaded ISAs and per-command request counts and times'''
+        return {'uptime': round(time.time() - self.started, 3), 'pid': os.getpid(),
+                'isa_files': sorted(self._assemblers), 'builders': len(self._builders) + len(self._file_builders),
+                'cache': None if self.cache is None else {'hits': self.cache.hits, 'misses': self.cache.misses},
+                'commands': self.stats}
+
+    def _record(self, command, seconds, ok):
+        entry = self.stats.setdefault(command, {'requests': 0, 'errors': 0, 'seconds': 0.0, 'max_seconds': 0.0})
+        entry['requests'] += 1
+        entry['errors'] += not ok
+        entry['seconds'] = round(entry['seconds'] + seconds, 6)
+        entry['max_seconds'] = round(max(entry['max_seconds'], seconds), 6)
+
+    ## Connections
+    async def _respond(self, request, writer, write_lock):
+        received = time.perf_counter()
+        response = {'id': request.get('id') if isinstance(request, dict) else None}
+        command = request.get('command') if isinstance(request, dict) else None
+        try:
+            if command not in COMMANDS:
+                raise ValueError(f"Unknown command: {command} (must be one of {', '.join(COMMANDS)})")
+            if command == 'shutdown':
+                result, started = 'stopping', received
+            else:
+                args = request.get('args') or {}
+
+                def run():
+                    return time.perf_counter(), self.execute(command, args)
+
+                started, result = await asyncio.get_running_loop().run_in_executor(self.executor, run)
+            seconds = time.perf_counter() - started
+            response.update(ok=True, result=result,
+                            stats={'seconds': round(seconds, 6), 'queued': round(started - received, 6)})
+        except Exception as error:  # every failure goes back to the client
+            seconds = time.perf_counter() - received
+            response.update(ok=False, error=f"{type(error).__name__}: {error}")
+        if command in COMMANDS:
+            self._record(command, seconds, response['ok'])
+        async with write_lock:
+            writer.write(json.dumps(response).encode() + b'\n')
+            await writer.drain()
+        if command == 'shutdown':
+            self._stop.set()
+
+    async def _handle(self, reader, writer):
+        self._connections[asyncio.current_task()] = reader
+        write_lock = asyncio.Lock()
+        tasks = set()
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ValueError, ConnectionError):  # request longer than MAX_LINE, or reset
+                    break
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    request = {'command': None}
+                task = asyncio.ensure_future(self._respond(request, writer, write_lock))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            del self._connections[asyncio.current_task()]
+            writer.close()
+
+    async def serve(self):
+        '''accepts connections until a shutdown request'''
+        self._stop = asyncio.Event()
+        _remove_stale_socket(self.socket_path)
+        umask = os.umask(0o077)  # only this user may connect
+        try:
+            server = await asyncio.start_unix_server(self._handle, self.socket_path, limit=MAX_LINE)
+        finally:
+            os.umask(umask)
+        try:
+            async with server:
+                await self._stop.wait()
+                # let open connections finish the requests they sent, then end them
+                for reader in self._connections.values():
+                    reader.feed_eof()
+                await asyncio.gather(*self._connections, return_exceptions=True)
+        finally:
+            self.executor.shutdown(wait=True)
+            try:
+                os.unlink(self.socket_path)
+            except FileNotFoundError:
+                pass
+
+    def run(self):
+        '''serve() until shutdown'''
+        asyncio.run(self.serve())
+
+
+def _remove_stale_socket(path):
+    '''removes a socket file left by a daemon that is gone; fails if one is still running
+    or if `path` is not a socket'''
+    import socket
+    try:
+        mode = os.lstat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise RuntimeError(f"{path} exists and is not a socket")
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except (ConnectionRefusedError, FileNotFoundError):
+        os.unlink(path)
+        return
+    finally:
+        probe.close()
+    raise RuntimeError(f"An assembler daemon is already listening on {path}")
+
+
+def serve(socket_path=None, isa_filename=None, cache=None, threads=4):
+    '''runs an AssemblerDaemon in the foreground until a shutdown request'''
+    daemon = AssemblerDaemon(socket_path, isa_filename, cache, threads)
+    print(f"Listening on {daemon.socket_path}", file=sys.stderr, flush=True)
+    daemon.run()
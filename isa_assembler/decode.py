@@ -0,0 +1,148 @@
+# Decoder for machine code words: the inverse of the ISA table, keyed on (opcode, funct3, funct7).
+#
+# Field layouts are those of convert.encode_machine_code(), including the repo's B and J
+# immediates (imm[12:6] in bits 31..25 and imm[5:1] in bits 11..7; imm[20:1] in bits 31..12).
+#
+# Bulk disassembly (disassemble_words) expands the table into a single index keyed on the
+# opcode, funct3 and funct7 bits of a word (word & KEY_MASK), so every word costs one dict
+# lookup plus its field extraction, and emits the token lists of convert.read_processed().
+
+import sys
+from array import array
+
+from . import convert, instrument
+
+FORMATS = ('R', 'I', 'S', 'B', 'J')
+## opcode, funct3 and funct7 bits
+KEY_MASK = 0xFE00707F
+
+
+def build_decode_table(isa=None):
+    '''maps (opcode, funct3, funct7) to (instruction name, format) for every instruction
+    the encoder can produce; fields a format does not fix are None'''
+    if isa is None:
+        isa = convert.get_default_isa()
+    table = {}
+    for inst_name, rec in isa.items():
+        fmt = rec.format
+        if fmt not in FORMATS or rec.opcode is None:
+            continue
+        funct3 = rec.funct3 if fmt != 'J' else None
+        funct7 = rec.funct7 if fmt in ('R', 'I') else None
+        if (fmt != 'J' and funct3 is None) or (fmt == 'R' and funct7 is None):
+            continue
+        table.setdefault((rec.opcode, funct3, funct7), (inst_name, fmt.value))
+    return table
+
+
+def _signed(value, bits):
+    return value - ((value >> (bits - 1) & 1) << bits)
+
+
+def decode_word(word, table):
+    '''returns (name, format, rd, rs1, rs2, imm) for a machine code word, or None when
+    no instruction of `table` matches. Fields the format does not have are 0.'''
+    opcode = word & 0x7F
+    funct3 = word >> 12 & 0x7
+    entry = (table.get((opcode, funct3, word >> 25))
+             or table.get((opcode, funct3, None))
+             or table.get((opcode, None, None)))
+    if entry is None:
+        return None
+    name, fmt = entry
+    rd = word >> 7 & 0x1F
+    rs1 = word >> 15 & 0x1F
+    rs2 = word >> 20 & 0x1F
+    if fmt == 'R':
+        return name, fmt, rd, rs1, rs2, 0
+    if fmt == 'I':
+        return name, fmt, rd, rs1, 0, _signed(word >> 20, 12)
+    if fmt == 'S':
+        return name, fmt, 0, rs1, rs2, _signed((word >> 25) << 5 | rd, 12)
+    if fmt == 'B':
+        return name, fmt, 0, rs1, rs2, _signed((word >> 25) << 6 | rd << 1, 13)
+    return name, fmt, rd, 0, 0, _signed((word >> 12) << 1, 21)
+
+
+def build_decode_index(table):
+    '''expands a decode table into {word & KEY_MASK: (name, format)}, with the
+    same precedence as decode_word(): exact funct7, then any funct7, then any funct3'''
+    index = {}
+    # least specific first, so more specific entries overwrite them
+    for (opcode, funct3, funct7), entry in sorted(table.items(), key=lambda item: (item[0][1] is not None,
+                                                                                    item[0][2] is not None)):
+        for f3 in range(8) if funct3 is None else (funct3,):
+            for f7 in range(128) if funct7 is None else (funct7,):
+                index[opcode | f3 << 12 | f7 << 25] = entry
+    return index
+
+
+@instrument.timed('decode', items_arg=0)
+def disassemble_words(words, isa=None, index=None, strict=True):
+    '''converts machine code words to instructions in the format of convert.read_processed():
+    [name, rd, rs1, rs2] (R), [name, rd, rs1, imm] (I), [name, rs1, rs2, imm] (S and B)
+    and [name, rd, imm] (J), with signed immediates. `index` must have been built from
+    `isa` (see build_decode_index). Words that match no instruction, including the zero
+    word written for instructions the encoder has no layout for, raise ValueError; with
+    strict=False they become ['.word', word].'''
+    if index is None:
+        index = build_decode_index(build_decode_table(isa))
+    get = index.get
+    inst_asm = []
+    append = inst_asm.append
+    for word in words:
+        entry = get(word & KEY_MASK)
+        if entry is None:
+            if strict:
+                raise ValueError(f"Unknown machine code at word {len(inst_asm)}: {word:#010x}")
+            append(['.word', word])
+            continue
+        name, fmt = entry
+        if fmt == 'R':
+            append([name, word >> 7 & 0x1F, word >> 15 & 0x1F, word >> 20 & 0x1F])
+        elif fmt == 'I':
+            imm = word >> 20
+            append([name, word >> 7 & 0x1F, word >> 15 & 0x1F, imm - 0x1000 if imm & 0x800 else imm])
+        elif fmt == 'S':
+            imm = (word >> 25) << 5 | word >> 7 & 0x1F
+            append([name, word >> 15 & 0x1F, word >> 20 & 0x1F, imm - 0x1000 if imm & 0x800 else imm])
+        elif fmt == 'B':
+            imm = (word >> 25) << 6 | (word >> 7 & 0x1F) << 1
+            append([name, word >> 15 & 0x1F, word >> 20 & 0x1F, imm - 0x2000 if imm & 0x1000 else imm])
+        else:
+            imm = (word >> 12) << 1
+            append([name, word >> 7 & 0x1F, imm - 0x200000 if imm & 0x100000 else imm])
+    return inst_asm
+
+
+## Machine code files
+@instrument.timed('parse')
+def read_program(filename, fmt='auto'):
+    '''reads machine code words from a text .bin file (one 32-bit binary string per
+    line, as save_bin() writes) or a raw little-endian image. fmt='auto' goes by the
+    file suffix (.bin or .img) and otherwise by the content.'''
+    with open(filename, 'rb') as f:
+        data = f.read()
+    if fmt == 'auto':
+        if filename.endswith('.img'):
+            fmt = 'raw'
+        elif filename.endswith('.bin') or not data.translate(None, b'01\r\n'):
+            fmt = 'text'
+        else:
+            fmt = 'raw'
+    if fmt == 'text':
+        return array('I', [int(line, 2) for line in data.split() if line])
+    if fmt == 'raw':
+        if len(data) % 4:
+            raise ValueError(f"{filename}: raw image size is not a multiple of 4 bytes")
+        words = array('I')
+        words.frombytes(data)
+        if sys.byteorder != 'little':
+            words.byteswap()
+        return words
+    raise ValueError(f"Invalid program format: {fmt} (must be auto, text or raw)")
+
+
+def disassemble_file(filename, fmt='auto', isa=None, index=None, strict=True):
+    '''read_program() -> disassemble_words()'''
+    return disassemble_words(read_program(filename, fmt), isa, index, strict)
@@ -0,0 +1,180 @@
+# Pipeline hazard model: counts the stall cycles of tokenized assembly (see rearrange.tokenize) on a
+# classic in-order 5-stage pipeline (IF ID EX MEM WB), before and after reordering.
+#
+# Data hazards: with forwarding, a value can be used by the stage after the one that produces it
+# (EX for ALU results, EX + load_use_penalty for loads); without forwarding it is read in ID, in the
+# cycle the producer writes it back. Control hazards: branches are predicted not taken and resolved
+# in `branch_stage`, so every taken branch flushes the instructions fetched after it; jumps are
+# resolved in ID. Registers come from rearrange.get_reg_masks().
+
+from collections import namedtuple
+
+from . import preprocess, rearrange
+
+STAGES = ('IF', 'ID', 'EX', 'MEM', 'WB')
+IF, ID, EX, MEM, WB = range(1, 6)
+LOADS = ('lw', 'lh', 'lb', 'lhu', 'lbu')
+
+
+class PipelineConfig(namedtuple('PipelineConfig', 'forwarding load_use_penalty branch_stage branch_taken',
+                                defaults=(True, 1, 'EX', True))):
+    '''forwarding: EX/MEM results are bypassed to the stages that need them;
+    load_use_penalty: stalls between a load and a dependent instruction right after it (with forwarding);
+    branch_stage: stage ('ID', 'EX' or 'MEM') where conditional branches and jalr are resolved;
+    branch_taken: count every conditional branch as taken (the worst case).'''
+    __slots__ = ()
+
+    def stage(self):
+        try:
+            return STAGES.index(self.branch_stage) + 1
+        except ValueError:
+            raise ValueError(f"Invalid branch stage: {self.branch_stage} (must be ID, EX or MEM)")
+
+
+def _bits(mask):
+    '''register numbers of the bits set in `mask`'''
+    return tuple(reg for reg in range(mask.bit_length()) if mask >> reg & 1)
+
+
+def _instruction(line):
+    '''(label or None, instruction tokens) of a tokenized line'''
+    return preprocess.split_label(line)
+
+
+def _control(instruction):
+    '''returns 'jump' (resolved in ID), 'branch' (conditional), 'jalr' or None'''
+    name = instruction[0]
+    if name in ('j', 'jal'):
+        return 'jump'
+    if name == 'jalr':
+        return 'jalr'
+    if rearrange.get_instruction_type(name) == 'B':
+        return 'branch'
+    return None
+
+
+class PipelineTimer:
+    '''issues instructions one at a time on the pipeline `config` and tracks
+    when each register value becomes available'''
+
+    def __init__(self, config=None):
+        self.config = config if config is not None else PipelineConfig()
+        self.branch_stage = self.config.stage()
+        self.ready = {}     # register number -> first cycle an operand stage can use it, counted like ID cycles
+        self.last = 1       # ID cycle of the previous instruction
+        self.flush = 0      # control stall cycles owed after the previous instruction
+        self.count = 0
+
+    def timing(self, uses, defs, load=False, kind=None):
+        '''precomputes what issue_timed() needs to know about an instruction reading the
+        registers in `uses` and writing those in `defs` (bitmasks, -1 for unknown);
+        kind is 'jump', 'jalr', 'branch' or None'''
+        config = self.config
+        if not config.forwarding or kind == 'jump':
+            use_stage = ID
+        else:
+            use_stage = min(EX, self.branch_stage) if kind else EX
+        if not config.forwarding:
+            result = WB - ID
+        elif load:
+            result = EX - ID + 1 + config.load_use_penalty
+        else:
+            result = EX - ID + 1
+        if kind == 'jump':
+            flush = (ID - IF, ID - IF)
+        elif kind == 'jalr':
+            flush = (self.branch_stage - IF, self.branch_stage - IF)
+        elif kind == 'branch':
+            flush = (self.branch_stage - IF, 0)
+        else:
+            flush = (0, 0)
+        return (None if uses == -1 else _bits(uses), () if defs == -1 else _bits(defs),
+                use_stage - ID, result) + flush
+
+    def issue_timed(self, timing, taken=True):
+        '''issues one instruction described by timing(); returns the (data, control)
+        stall cycles before it'''
+        uses, defs, use_offset, result, flush_taken, flush_not_taken = timing
+        ready = self.ready
+        earliest = self.last + 1 + self.flush
+        needed = earliest
+        for reg in (ready if uses is None else uses):
+            cycle = ready.get(reg, 0) - use_offset
+            if cycle > needed:
+                needed = cycle
+        stalls = (needed - earliest, self.flush)
+        self.last = needed
+        self.count += 1
+        for reg in defs:
+            ready[reg] = needed + result
+        self.flush = flush_taken if taken else flush_not_taken
+        return stalls
+
+    def issue(self, uses, defs, load=False, kind=None, taken=True):
+        '''issues one instruction (see timing()) and whether a branch is taken.
+        Returns the (data, control) stall cycles before it.'''
+        return self.issue_timed(self.timing(uses, defs, load, kind), taken)
+
+    @property
+    def cycles(self):
+        '''cycles until the last issued instruction leaves WB'''
+        return self.last + WB - ID if self.count else 0
+
+
+def issue_stalls(instructions, config=None):
+    '''issues `instructions` in order; returns (data, control, cycles): the data and
+    control stall cycles before each line (0 for a line holding only a label) and the total cycles'''
+    timer = PipelineTimer(config)
+    data, control = [], []
+    for line in instructions:
+        instruction = _instruction(line)[1]
+        if not instruction:
+            data.append(0)
+            control.append(0)
+            continue
+        uses, defs = (0, 0) if instruction[0] == 'j' else rearrange.get_reg_masks(instruction)
+        stalls = timer.issue(uses, defs, instruction[0] in LOADS, _control(instruction), timer.config.branch_taken)
+        data.append(stalls[0])
+        control.append(stalls[1])
+    return data, control, timer.cycles
+
+
+def count_stalls(instructions, config=None):
+    '''returns the stall summary of tokenized instructions on the pipeline `config`:
+    {'instructions', 'cycles', 'data_stalls', 'control_stalls', 'cpi', 'subsets'},
+    where 'subsets' has an entry for each subset of splitAssemblyIntoSubsets()
+    that holds instructions, named after the label above it'''
+    data, control, cycles = issue_stalls(instructions, config)
+    subsets = []
+    label = None
+    pos = 0
+    for subset in rearrange.splitAssemblyIntoSubsets(list(instructions)):
+        end = pos + len(subset)
+        if len(subset) == 1 and subset[0][0].endswith(':'):
+            label, instruction = _instruction(subset[0])
+            if instruction:  # `X: lw ...` is a subset of its own
+                subsets.append({'label': label, 'instructions': 1,
+                                'data_stalls': data[pos], 'control_stalls': control[pos]})
+        elif subset:
+            subsets.append({'label': label, 'instructions': len(subset),
+                            'data_stalls': sum(data[pos:end]), 'control_stalls': sum(control[pos:end])})
+        pos = end
+    count = sum(entry['instructions'] for entry in subsets)
+    return {'instructions': count, 'cycles': cycles,
+            'data_stalls': sum(data), 'control_stalls': sum(control),
+            'cpi': round(cycles / count, 4) if count else None,
+            'subsets': subsets}
+
+
+def hazard_report(instructions, config=None, reorder=None):
+    '''stall summaries of `instructions` as given ('before') and after `reorder`
+    (default: rearrange.reorder_program), as a JSON-serializable dict'''
+    if config is None:
+        config = PipelineConfig()
+    if reorder is None:
+        reorder = rearrange.reorder_program
+    before = count_stalls(instructions, config)
+    after = count_stalls(reorder([list(line) for line in instructions]), config)
+    return {'config': config._asdict(), 'before': before, 'after': after,
+            'saved_stalls': (before['data_stalls'] + before['control_stalls']
+                             - after['data_stalls'] - after['control_stalls'])}
@@ -0,0 +1,174 @@
+# Incremental reassembly: assembly source -> machine code words, reusing the work done for every
+# subset (basic block, see rearrange.splitAssemblyIntoSubsets) that did not change since the last build.
+#
+# Two caches, both keyed by the content hash of the tokenized subset:
+# - blocks: the scheduled subset with its labels and label references, so only new or edited
+#   subsets are scheduled again;
+# - words: the encoded subset, additionally keyed by the PC-relative offsets of its label
+#   references, so a subset is re-encoded when it changed or when one of its branch/jump targets
+#   moved relative to it, and reused when only its absolute position changed.
+# The output is the same as reorder_program() -> preprocess() -> encode_machine_code() on the
+# whole program. Entries not used by the latest build are dropped.
+
+import hashlib
+import marshal
+import os
+import sys
+import time
+from array import array
+from collections import namedtuple
+
+from . import convert, output, preprocess, rearrange
+from .isa_table import fingerprint
+
+## Bump when the layout of the saved state changes
+STATE_VERSION = 1
+
+## A cached subset: scheduled tokens, number of instructions, (label, instruction offset) pairs,
+## (instruction offset, label) pairs of operands that may be labels, and seconds spent scheduling it
+Block = namedtuple('Block', 'instructions count labels refs seconds')
+
+
+def block_key(subset):
+    '''content hash of a tokenized subset'''
+    text = '\n'.join([' '.join(line) for line in subset])
+    return hashlib.blake2b(text.encode(), digest_size=16).digest()
+
+
+def _make_block(subset, schedule, isa):
+    start = time.perf_counter()
+    instructions = subset if not schedule or len(subset) <= 2 else rearrange.schedule_instructions(subset)
+    labels, refs = [], []
+    count = 0
+    for line in instructions:
+        label, args = preprocess.split_label(line)
+        if label is not None:
+            labels.append((label, count))
+        if args:
+            name = args[0]
+            if name in preprocess.PSEUDO and name not in isa:
+                name = preprocess.PSEUDO[name][0]
+            rec = isa.get(name)
+            # the label operand of B and J instructions is the last one
+            if (rec is not None and rec.format in preprocess.LABEL_FORMATS and len(args) > 1
+                    and isinstance(convert._parse_operand(args[-1], False), str)):
+                refs.append((count, args[-1]))
+            count += 1
+    return Block(instructions, count, tuple(labels), tuple(refs), time.perf_counter() - start)
+
+
+class IncrementalAssembler:
+    '''assembles assembly source, keeping the scheduled and encoded subsets of the
+    last build for the next one. schedule=False skips reordering.
+    After each build(), `stats` holds the block counts, cache hits and the estimated time saved.'''
+
+    def __init__(self, isa=None, table=None, schedule=True):
+        self.isa = isa if isa is not None else convert.get_default_isa()
+        self.table = table if table is not None else convert.build_encoder_table(self.isa)
+        self.schedule = schedule
+        self._blocks = {}  # block key -> Block
+        self._words = {}   # (block key, label offsets) -> (encoded words as bytes, seconds)
+        self.stats = None
+
+    def build(self, lines):
+        '''assembles the lines of an assembly program; returns array('I') of machine code'''
+        start = time.perf_counter()
+        subsets = rearrange.splitAssemblyIntoSubsets(rearrange.tokenize(lines))
+        old_blocks, old_words = self._blocks, self._words
+        blocks, words_cache = {}, {}
+        block_hits = word_hits = 0
+        saved = 0.0
+
+        # schedule: only subsets that are not cached
+        keyed = []
+        for subset in subsets:
+            key = block_key(subset)
+            block = blocks.get(key) or old_blocks.get(key)
+            if block is None:
+                block = _make_block(subset, self.schedule, self.isa)
+            else:
+                block_hits += 1
+                saved += block.seconds
+            blocks[key] = block
+            keyed.append((key, block))
+
+        # symbol table from the cached label positions
+        symbols = {}
+        pcs = []
+        pc = 0
+        for key, block in keyed:
+            pcs.append(pc)
+            for label, offset in block.labels:
+                if label in symbols:
+                    raise ValueError(f"Duplicate label: {label}")
+                symbols[label] = pc + offset * preprocess.INST_BYTES
+            pc += block.count * preprocess.INST_BYTES
+
+        # encode: subsets that changed or whose label targets moved relative to them
+        words = array('I')
+        for (key, block), pc in zip(keyed, pcs):
+            offsets = tuple(symbols[label] - pc - offset * preprocess.INST_BYTES if label in symbols else None
+                            for offset, label in block.refs)
+            word_key = (key, offsets)
+            cached = words_cache.get(word_key) or old_words.get(word_key)
+            if cached is None:
+                begin = time.perf_counter()
+                inst_asm = []
+                for line in block.instructions:
+                    _, args = preprocess.split_label(line)
+                    if args:
+                        inst_asm.append(preprocess.resolve_line(args, pc + len(inst_asm) * preprocess.INST_BYTES,
+                                                                symbols, self.isa))
+                encoded = convert.encode_machine_code(inst_asm, self.isa, self.table).tobytes()
+                cached = (encoded, time.perf_counter() - begin)
+            else:
+                word_hits += 1
+                saved += cached[1]
+            words_cache[word_key] = cached
+            words.frombytes(cached[0])
+
+        self._blocks, self._words = blocks, words_cache
+        total = len(keyed)
+        self.stats = {'blocks': total, 'schedule_hits': block_hits, 'encode_hits': word_hits,
+                      'hit_rate': round((block_hits + word_hits) / (2 * total), 4) if total else None,
+                      'seconds': round(time.perf_counter() - start, 6), 'saved_seconds': round(saved, 6)}
+        return words
+
+    def build_file(self, filename, out_filename=None, fmt='text', base_address=0):
+        '''build() on `filename`, saved in the output format `fmt` (see output.FORMATS).
+        Returns the name of the written file (by default `*_out2.bin` for text).'''
+        if out_filename is None:
+            out_filename = os.path.splitext(filename)[0] + '_out' + output.SUFFIXES[fmt]
+        with open(filename, 'r') as f:
+            words = self.build(f)
+        convert.save_bin(words, out_filename, fmt, base_address)
+        return out_filename
+
+    ## State kept between runs
+    def _fingerprint(self):
+        return (STATE_VERSION, marshal.version, sys.byteorder, fingerprint(self.isa), self.schedule)
+
+    def save(self, filename):
+        '''writes the caches of the last build to `filename` (atomically)'''
+        state = (self._fingerprint(),
+                 [(key, [list(map(list, block.instructions)), block.count, block.labels, block.refs, block.seconds])
+                  for key, block in self._blocks.items()],
+                 list(self._words.items()))
+        tmp = f"{filename}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(marshal.dumps(state))
+        os.replace(tmp, filename)
+
+    def load(self, filename):
+        '''restores the caches written by save(); returns False (and keeps the
+        caches empty) when the file is missing, unreadable or from another ISA or version'''
+        try:
+            with open(filename, 'rb') as f:
+                saved, blocks, words = marshal.loads(f.read())
+        except (OSError, EOFError, ValueError, TypeError):
+            return False
+        if saved != self._fingerprint():
+            return False
+        self._blocks = {key: Block(*fields) for key, fields in blocks}
+        self._words = dict(words)
+        return True
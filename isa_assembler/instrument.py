@@ -0,0 +1,138 @@
+# Instrumentation: wall time, call and item counts per pipeline stage (parse, isa, schedule,
+# preprocess, encode, io) and scheduler event counts, exported as JSON or as a Chrome trace
+# (chrome://tracing or https://ui.perfetto.dev).
+#
+# Disabled by default. Stages are whole calls of the stage functions (one call per file or chunk),
+# never single instructions, so a disabled stage costs one flag test per call and an enabled one two
+# clock reads; scheduler events are counted in local variables and added once per subset.
+# Only the calling process is recorded (not the workers of parallel.py).
+
+import json
+import os
+import threading
+import time
+from functools import wraps
+
+enabled = False
+tracing = False
+_stages = {}     # stage -> [calls, seconds, items], outermost calls only
+_functions = {}  # (stage, function name) -> [calls, seconds, items]
+_events = {}     # event -> count
+_depth = {}      # stage -> calls of that stage in progress
+_trace = []      # (stage, function name, start, seconds, items) with tracing
+_epoch = time.perf_counter()
+
+
+def enable(trace=False):
+    '''starts recording; trace=True also keeps every call for chrome_trace()'''
+    global enabled, tracing
+    enabled = True
+    tracing = trace
+
+
+def disable():
+    '''stops recording; what was recorded is kept until reset()'''
+    global enabled, tracing
+    enabled = False
+    tracing = False
+
+
+def reset():
+    '''forgets everything recorded so far'''
+    _stages.clear()
+    _functions.clear()
+    _events.clear()
+    _depth.clear()
+    _trace.clear()
+
+
+def count(event, n=1):
+    '''adds `n` to the counter of `event`; callers test `enabled` first'''
+    _events[event] = _events.get(event, 0) + n
+
+
+def _add(table, key, seconds, items):
+    entry = table.get(key)
+    if entry is None:
+        table[key] = [1, seconds, items or 0]
+    else:
+        entry[0] += 1
+        entry[1] += seconds
+        entry[2] += items or 0
+
+
+def timed(stage, items_arg=None):
+    '''decorator recording each call of a function as part of `stage`.
+    Items are len() of positional argument `items_arg`, or of the result by default
+    (or the result itself when it is an int, e.g. a count of instructions written).
+    Nested calls of the same stage count once in the stage total.'''
+    def decorate(function):
+        name = function.__name__
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return function(*args, **kwargs)
+            depth = _depth.get(stage, 0)
+            _depth[stage] = depth + 1
+            start = time.perf_counter()
+            try:
+                result = function(*args, **kwargs)
+            finally:
+                seconds = time.perf_counter() - start
+                _depth[stage] = depth
+            sized = args[items_arg] if items_arg is not None else result
+            if hasattr(sized, '__len__'):
+                items = len(sized)
+            else:
+                items = sized if type(sized) is int else None
+            _add(_functions, (stage, name), seconds, items)
+            if not depth:
+                _add(_stages, stage, seconds, items)
+            if tracing:
+                _trace.append((stage, name, start, seconds, items))
+            return result
+        return wrapper
+    return decorate
+
+
+def _summary(entry):
+    calls, seconds, items = entry
+    summary = {'calls': calls, 'seconds': round(seconds, 6), 'items': items}
+    if items and seconds:
+        summary['items_per_second'] = round(items / seconds)
+    return summary
+
+
+def report():
+    '''what has been recorded, as a JSON-serializable dict:
+    {'stages': {stage: {'calls', 'seconds', 'items', 'items_per_second', 'functions': {...}}}, 'events': {...}}'''
+    stages = {}
+    for stage, entry in _stages.items():
+        stages[stage] = _summary(entry)
+        stages[stage]['functions'] = {name: _summary(entry) for (owner, name), entry in _functions.items()
+                                      if owner == stage}
+    return {'stages': stages, 'events': dict(sorted(_events.items()))}
+
+
+def chrome_trace():
+    '''the calls recorded with tracing as a Chrome trace event dict; event counts
+    are added as counters at the end'''
+    pid, tid = os.getpid(), threading.get_ident()
+    events = [{'name': name, 'cat': stage, 'ph': 'X', 'pid': pid, 'tid': tid,
+               'ts': round((start - _epoch) * 1e6, 3), 'dur': round(seconds * 1e6, 3),
+               'args': {} if items is None else {'items': items}}
+              for stage, name, start, seconds, items in _trace]
+    end = max((event['ts'] + event['dur'] for event in events), default=0)
+    events += [{'name': event, 'ph': 'C', 'pid': pid, 'tid': tid, 'ts': end, 'args': {'count': n}}
+               for event, n in sorted(_events.items())]
+    return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+
+def save(filename, fmt='json'):
+    '''writes report() (fmt='json') or chrome_trace() (fmt='chrome') to `filename`'''
+    if fmt not in ('json', 'chrome'):
+        raise ValueError(f"Invalid profile format: {fmt} (must be json or chrome)")
+    with open(filename, 'w') as f:
+        json.dump(report() if fmt == 'json' else chrome_trace(), f, indent=2 if fmt == 'json' else None)
+        f.write('\n')
@@ -0,0 +1,474 @@
+# Compact program representation: a struct-of-arrays alternative to the lists of token lists
+# that rearrange.tokenize(), preprocess.preprocess() and convert.read_processed() return.
+#
+# A Program holds one row per token line in parallel array columns (mnemonic id, rd, rs1,
+# rs2, immediate, label defined on the row, label operand, source line) plus interned
+# mnemonic and label tables, so a row costs about 21 bytes instead of a list, its token
+# strings and its ints. Registers are stored as numbers and immediates as ints, in the
+# operand positions of convert.IMM_POSITIONS. Rows that do not fit the columns (pseudo-
+# instructions, unknown mnemonics, wrong operand counts, out-of-range values, blank lines)
+# keep their token list in `irregular`, so every program round-trips through to_lists().
+#
+# The stages that consume a Program (schedule_program, preprocess_program, encode_program,
+# save_processed_program, read_processed_program) work on the columns and give the same
+# results as their list counterparts; only irregular rows (and rows with a label or label
+# operand, when scheduled with another engine or written) go through token lists.
+# Assembler.preprocess_file(ir=True) and assemble_file(ir=True) (--ir) run on them.
+
+from array import array
+
+from . import convert, mapped, preprocess, rearrange
+
+NO_OP = 0xFFFF  # mnemonic id of rows that only define a label, or hold no instruction
+NONE = -1       # absent register, label or label operand
+IRREGULAR = -2  # label operand column of rows kept as token lists
+IMM_TYPECODE = 'i'
+IMM_RANGE = (-2**31, 2**31)
+
+## Operand positions of the registers of each format, by role
+ROLES = {'R': ('rd', 'rs1', 'rs2'), 'I': ('rd', 'rs1', None), 'S': ('rs1', 'rs2', None),
+         'B': ('rs1', 'rs2', None), 'J': ('rd', None), 'U': ('rd', None)}
+
+
+def _register(arg):
+    '''register number of a token (number or name), or None'''
+    if isinstance(arg, int):
+        value = arg
+    else:
+        try:
+            value = preprocess._reg_value(arg)
+        except (ValueError, IndexError):
+            return None
+    return value if convert.REG_BOUNDS[0] <= value < convert.REG_BOUNDS[1] else None
+
+
+class Program:
+    '''rows of an assembly program in array columns, for the ISA table `isa`
+    ({name: InstRecord}, default: convert.get_default_isa())'''
+
+    def __init__(self, isa=None):
+        self.isa = isa if isa is not None else convert.get_default_isa()
+        self.names = []       # mnemonic id -> name
+        self._name_ids = {}
+        self.labels = []      # label id -> label
+        self._label_ids = {}
+        self.op = array('H')
+        self.rd = array('b')
+        self.rs1 = array('b')
+        self.rs2 = array('b')
+        self.imm = array(IMM_TYPECODE)
+        self.label = array('i')   # label defined on the row (`loop:`)
+        self.target = array('i')  # label operand of a B or J row (replaces imm), or IRREGULAR
+        self.line = array('I')    # source line number
+        self.irregular = {}       # row -> token list
+
+    @classmethod
+    def from_lists(cls, instructions, isa=None, first_line=1):
+        '''a Program of token lists: tokenized source (see rearrange.tokenize) or
+        pre-processed instructions (see convert.read_processed)'''
+        program = cls(isa)
+        for number, tokens in enumerate(instructions, first_line):
+            program.append(tokens, number)
+        return program
+
+    def __len__(self):
+        return len(self.op)
+
+    def nbytes(self):
+        '''bytes held by the columns (the interned tables and irregular rows not included)'''
+        return sum(column.itemsize * len(column) for column in
+                   (self.op, self.rd, self.rs1, self.rs2, self.imm, self.label, self.target, self.line))
+
+    def name_id(self, name):
+        try:
+            return self._name_ids[name]
+        except KeyError:
+            self._name_ids[name] = len(self.names)
+            self.names.append(name)
+            return len(self.names) - 1
+
+    def label_id(self, label):
+        try:
+            return self._label_ids[label]
+        except KeyError:
+            self._label_ids[label] = len(self.labels)
+            self.labels.append(label)
+            return len(self.labels) - 1
+
+    def _append_row(self, op, rd, rs1, rs2, imm, label, target, line):
+        self.op.append(op)
+        self.rd.append(rd)
+        self.rs1.append(rs1)
+        self.rs2.append(rs2)
+        self.imm.append(imm)
+        self.label.append(label)
+        self.target.append(target)
+        self.line.append(line)
+
+    def append(self, tokens, line=0):
+        '''adds one token line; tokens may be strings or (pre-processed) ints'''
+        label, args = preprocess.split_label(tokens)
+        label = NONE if label is None else self.label_id(label)
+        if not args:
+            target = NONE
+            if label == NONE:
+                self.irregular[len(self.op)] = list(tokens)
+                target = IRREGULAR
+            self._append_row(NO_OP, NONE, NONE, NONE, 0, label, target, line)
+            return
+        fields = self._fields(args)
+        if fields is None:
+            self.irregular[len(self.op)] = list(tokens)
+            self._append_row(self.name_id(args[0]), NONE, NONE, NONE, 0, label, IRREGULAR, line)
+            return
+        rd, rs1, rs2, imm, target = fields
+        self._append_row(self.name_id(args[0]), rd, rs1, rs2, imm, label, target, line)
+
+    def _fields(self, args):
+        '''(rd, rs1, rs2, imm, target) of an instruction, or None if it does not fit the columns.
+        Operands are either all strings (source) or ints apart from a label (pre-processed).'''
+        rec = self.isa.get(args[0])
+        if rec is None or rec.format not in ROLES or len(args) != convert.OPERAND_COUNTS[rec.format] + 1:
+            return None
+        source = isinstance(args[1], str)
+        regs = {'rd': NONE, 'rs1': NONE, 'rs2': NONE}
+        imm, target = 0, NONE
+        for role, arg in zip(ROLES[rec.format], args[1:]):
+            if role is not None:
+                if isinstance(arg, str) != source:
+                    return None
+                value = _register(arg)
+                if value is None:
+                    return None
+                regs[role] = value
+                continue
+            value = convert._parse_operand(arg, False) if isinstance(arg, str) else arg
+            if isinstance(value, str):
+                if rec.format not in preprocess.LABEL_FORMATS:
+                    return None
+                target = self.label_id(value)
+            elif source == isinstance(arg, str) and IMM_RANGE[0] <= value < IMM_RANGE[1]:
+                imm = value
+            else:
+                return None
+        return regs['rd'], regs['rs1'], regs['rs2'], imm, target
+
+    def row(self, i, source=False):
+        '''token list of row i: registers and immediates as ints, or as source tokens
+        (x0..x31 and decimal strings) with source=True'''
+        if i in self.irregular:
+            return list(self.irregular[i])
+        tokens = [] if self.label[i] == NONE else [self.labels[self.label[i]] + ':']
+        op = self.op[i]
+        if op == NO_OP:
+            return tokens
+        name = self.names[op]
+        tokens.append(name)
+        values = {'rd': self.rd[i], 'rs1': self.rs1[i], 'rs2': self.rs2[i]}
+        for role in ROLES[self.isa[name].format]:
+            if role is not None:
+                tokens.append(f'x{values[role]}' if source else values[role])
+            elif self.target[i] != NONE:
+                tokens.append(self.labels[self.target[i]])
+            else:
+                tokens.append(str(self.imm[i]) if source else self.imm[i])
+        return tokens
+
+    def to_lists(self, source=False):
+        '''the token lists of every row (see row())'''
+        return [self.row(i, source) for i in range(len(self.op))]
+
+    def take(self, rows):
+        '''a Program of the given rows, in that order, sharing the interned tables'''
+        program = Program(self.isa)
+        program.names, program._name_ids = self.names, self._name_ids
+        program.labels, program._label_ids = self.labels, self._label_ids
+        for name in ('op', 'rd', 'rs1', 'rs2', 'imm', 'label', 'target', 'line'):
+            column = getattr(self, name)
+            setattr(program, name, array(column.typecode, [column[i] for i in rows]))
+        program.irregular = {new: self.irregular[old] for new, old in enumerate(rows) if old in self.irregular}
+        return program
+
+
+## Reading
+def read_processed_program(filename, isa=None):
+    '''convert.read_processed() straight into a Program, without building token lists
+    for the rows that fit the columns'''
+    program = Program(isa)
+    names = {}
+    for name, rec in program.isa.items():
+        if rec.format in ROLES:
+            names[name.encode()] = (program.name_id(name), str(rec.format.value))
+    number = 1
+    with mapped.map_file(filename) as data:
+        for chunk in mapped.iter_chunks(data):
+            rows = _read_chunk(program, chunk, names, number)
+            if rows is None:
+                rows = 0
+                for line in mapped.text_lines(chunk):
+                    program.append(convert.parse_processed_line(line, program.isa), number + rows)
+                    rows += 1
+            number += rows
+    return program
+
+
+def _read_chunk(program, chunk, names, number):
+    '''appends the rows of a chunk whose lines are all known instructions with decimal
+    operands in range (see convert._read_processed_chunk); returns their number, or None
+    (with nothing appended) for any other chunk'''
+    if convert._UNUSUAL_BYTES.search(chunk):
+        return None
+    start = len(program)
+    reg_lo, reg_hi = convert.REG_BOUNDS
+    imm_lo, imm_hi = IMM_RANGE
+    add_op, add_rd, add_rs1, add_rs2, add_imm = (program.op.append, program.rd.append, program.rs1.append,
+                                                 program.rs2.append, program.imm.append)
+    tokens = iter(chunk.split())
+    try:
+        for token in tokens:
+            op, fmt = names[token]
+            a = int(next(tokens))
+            b = int(next(tokens))
+            if fmt == 'J' or fmt == 'U':
+                rd, rs1, rs2, imm = a, NONE, NONE, b
+            else:
+                c = int(next(tokens))
+                if fmt == 'R':
+                    rd, rs1, rs2, imm = a, b, c, 0
+                elif fmt == 'I':
+                    rd, rs1, rs2, imm = a, b, NONE, c
+                else:
+                    rd, rs1, rs2, imm = NONE, a, b, c
+            if not (reg_lo <= a < reg_hi and (rs1 == NONE or reg_lo <= rs1 < reg_hi)
+                    and (rs2 == NONE or reg_lo <= rs2 < reg_hi) and imm_lo <= imm < imm_hi):
+                raise ValueError
+            add_op(op)
+            add_rd(rd)
+            add_rs1(rs1)
+            add_rs2(rs2)
+            add_imm(imm)
+    except (KeyError, ValueError, StopIteration):
+        pass
+    else:
+        rows = len(program) - start
+        if rows == chunk.count(b'\n') + (not chunk.endswith(b'\n')):
+            program.label.extend(array('i', [NONE]) * rows)
+            program.target.extend(array('i', [NONE]) * rows)
+            program.line.extend(range(number, number + rows))
+            return rows
+    for name in ('op', 'rd', 'rs1', 'rs2', 'imm'):
+        del getattr(program, name)[start:]
+    return None
+
+
+## Scheduling
+def _subset_ranges(program):
+    '''(start, end) row ranges of rearrange.splitAssemblyIntoSubsets()'''
+    ranges = []
+    start = 0
+    for i in range(len(program)):
+        tokens = program.irregular.get(i)
+        if tokens is not None:
+            first = tokens[0] if tokens else ''
+            name = first
+        else:
+            first = None if program.label[i] == NONE else ':'
+            name = program.names[program.op[i]] if program.op[i] != NO_OP else ''
+        if first is not None and first.endswith(':'):
+            if start < i:
+                ranges.append((start, i))
+            ranges.append((i, i + 1))
+            start = i + 1
+        elif name[:1] in ('b', 'j'):
+            ranges.append((start, i + 1))
+            start = i + 1
+    if start < len(program):
+        ranges.append((start, len(program)))
+    return ranges
+
+
+# operand positions (1-based) rearrange.get_operands() reads for each instruction type: (rd, uses)
+_OPERAND_POSITIONS = {'R': (1, (2, 3)), 'I': (1, (2,)), 'S': (None, (1, 2)), 'B': (None, (1, 2)),
+                      'J': (1, ()), 'N': (None, ())}
+
+
+def _mask_plan(program, op):
+    '''how rearrange.get_reg_masks() sees rows of mnemonic id `op`: None for (-1, -1),
+    else (rd, uses), each operand being the role it has in the row (see ROLES) or
+    None for the immediate or label'''
+    name = program.names[op]
+    positions = _OPERAND_POSITIONS.get(rearrange.get_instruction_type(name))
+    if positions is None:
+        return None
+    roles = ROLES[program.isa[name].format]
+    rd, uses = positions
+    if max(uses + (rd or 0,), default=0) > len(roles):
+        return None  # get_operands() would raise IndexError
+    return (rd and (roles[rd - 1],)), tuple(roles[pos - 1] for pos in uses)
+
+
+def _row_masks(program, i, plan):
+    '''rearrange.get_reg_masks() of a regular row, from its columns'''
+    if plan is None:
+        return -1, -1
+    rd, uses = plan
+    masks = []
+    for roles in (uses, rd or ()):
+        mask = 0
+        for role in roles:
+            if role is not None:
+                mask |= (1 << getattr(program, role)[i]) & ~1
+            else:
+                target = program.target[i]
+                mask |= rearrange.get_reg_bit(program.labels[target] if target != NONE else str(program.imm[i]))
+        masks.append(mask)
+    return masks[0], masks[1]
+
+
+def schedule_program(program, engine=None):
+    '''rearrange.reorder_program() on a Program: returns a new Program whose rows are in
+    scheduled order. The default scheduler runs on the columns (rearrange.schedule_order);
+    another `engine` gets each subset as source token lists and must return the lists
+    it was given.'''
+    if engine is not None and engine is not rearrange.schedule_instructions:
+        return _schedule_lists(program, engine)
+    plans = {}
+    order = []
+    for start, end in _subset_ranges(program):
+        if end - start <= 2:
+            order.extend(range(start, end))
+            continue
+        masks, names = [], []
+        for i in range(start, end):
+            tokens = program.irregular.get(i)
+            if tokens is not None:
+                masks.append(rearrange.get_reg_masks(tokens))
+                names.append(tokens[0] if tokens else '')
+                continue
+            op = program.op[i]
+            if op not in plans:
+                plans[op] = _mask_plan(program, op)
+            masks.append(_row_masks(program, i, plans[op]))
+            names.append(program.names[op])
+        order.extend(start + i for i in rearrange.schedule_order(masks, names))
+    return program.take(order)
+
+
+def _schedule_lists(program, engine):
+    order = []
+    for start, end in _subset_ranges(program):
+        if end - start <= 2:
+            order.extend(range(start, end))
+            continue
+        subset = [program.row(i, source=True) for i in range(start, end)]
+        rows = {id(tokens): start + i for i, tokens in enumerate(subset)}
+        order.extend(rows[id(tokens)] for tokens in engine(subset))
+    return program.take(order)
+
+
+## Label resolution
+def preprocess_program(program):
+    '''preprocess.preprocess() on a Program: returns a Program of pre-processed rows
+    (labels resolved to PC-relative offsets, label-only rows dropped)'''
+    symbols = {}
+    pc = 0
+    for i in range(len(program)):
+        label = program.label[i]
+        if label != NONE:
+            name = program.labels[label]
+            if name in symbols:
+                raise ValueError(f"Duplicate label: {name}")
+            symbols[name] = pc
+        if program.op[i] != NO_OP:
+            pc += preprocess.INST_BYTES
+
+    result = Program(program.isa)
+    result.names, result._name_ids = program.names, program._name_ids
+    rows = [i for i in range(len(program)) if program.op[i] != NO_OP]
+    for name in ('op', 'rd', 'rs1', 'rs2', 'imm', 'line'):
+        column = getattr(program, name)
+        setattr(result, name, array(column.typecode, [column[i] for i in rows]))
+    result.label = array('i', [NONE]) * len(rows)
+    result.target = array('i', [NONE]) * len(rows)
+    for new, old in enumerate(rows):
+        pc = new * preprocess.INST_BYTES
+        if old in program.irregular:
+            _, args = preprocess.split_label(program.irregular[old])
+            resolved = preprocess.resolve_line(args, pc, symbols, program.isa)
+            fields = result._fields(resolved)
+            if fields is None:
+                result.irregular[new] = resolved
+                result.target[new] = IRREGULAR
+            else:
+                result.op[new] = result.name_id(resolved[0])
+                result.rd[new], result.rs1[new], result.rs2[new], result.imm[new], _ = fields
+            continue
+        target = program.target[old]
+        if target != NONE:
+            # resolve_line() raises the same errors for undefined or out-of-range labels
+            _, args = preprocess.split_label(program.row(old, source=True))
+            result.imm[new] = preprocess.resolve_line(args, pc, symbols, program.isa)[-1]
+    return result
+
+
+## Encoding
+def encode_program(program, table=None):
+    '''convert.encode_machine_code() on a Program of pre-processed rows: returns array('I')'''
+    isa = program.isa
+    if table is None:
+        table = convert.build_encoder_table(isa)
+    # (format, base word, immediate bounds) of every mnemonic id
+    entries = []
+    for name in program.names:
+        fmt, base = table.get(name, (None, 0))
+        entries.append((fmt, base) + convert.IMM_BOUNDS.get(fmt, (0, 0)))
+    words = array('I')
+    append = words.append
+    for i, (op, rd, rs1, rs2, imm, target) in enumerate(zip(program.op, program.rd, program.rs1, program.rs2,
+                                                            program.imm, program.target)):
+        if target == NONE and op != NO_OP:
+            fmt, base, low, high = entries[op]
+            if fmt == 'R':
+                append(base | rd << 7 | rs1 << 15 | rs2 << 20)
+                continue
+            if low <= imm < high:
+                if fmt == 'I':
+                    append(base | rd << 7 | rs1 << 15 | (imm & 0xFFF) << 20)
+                    continue
+                if fmt == 'S':
+                    append(base | (imm & 0x1F) << 7 | rs1 << 15 | rs2 << 20 | (imm >> 5 & 0x7F) << 25)
+                    continue
+                if fmt == 'B':
+                    append(base | (imm >> 1 & 0x1F) << 7 | rs1 << 15 | rs2 << 20 | (imm >> 6 & 0x7F) << 25)
+                    continue
+                if fmt == 'J':
+                    append(base | rd << 7 | (imm >> 1 & 0xFFFFF) << 12)
+                    continue
+        # anything else gives the result (or raises the error) of the list encoder
+        words.extend(convert.encode_machine_code([program.row(i)], isa, table))
+    return words
+
+
+## Writing
+def save_processed_program(program, filename):
+    '''preprocess.save_processed() of a Program, formatted from the columns (rows with a
+    label, a label operand or irregular tokens go through row())'''
+    # line template of every mnemonic id, over (rd, rs1, rs2, imm)
+    fields = {'rd': '{0}', 'rs1': '{1}', 'rs2': '{2}', None: '{3}'}
+    templates = []
+    for name in program.names:
+        rec = program.isa.get(name)
+        roles = ROLES.get(rec.format) if rec is not None else None
+        templates.append(None if roles is None else ' '.join([name] + [fields[role] for role in roles]) + '\n')
+    with open(filename, 'w') as f:
+        for start in range(0, len(program), convert.CHUNK_SIZE):
+            end = min(start + convert.CHUNK_SIZE, len(program))
+            lines = []
+            for i, op, rd, rs1, rs2, imm, label, target in zip(
+                    range(start, end), program.op[start:end], program.rd[start:end], program.rs1[start:end],
+                    program.rs2[start:end], program.imm[start:end], program.label[start:end], program.target[start:end]):
+                if target == NONE and label == NONE and op != NO_OP:
+                    lines.append(templates[op].format(rd, rs1, rs2, imm))
+                else:
+                    lines.append(' '.join(map(str, program.row(i))) + '\n')
+            f.write(''.join(lines))
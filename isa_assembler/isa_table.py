@@ -0,0 +1,123 @@
+# Compiled ISA table: parses `rv32im_isa.csv` once into frozen records and keeps a binary cache next to the CSV.
+
+import enum
+import marshal
+import os
+from collections import namedtuple
+
+## Bump when the layout of the cached rows changes
+CACHE_VERSION = 1
+CACHE_SUFFIX = '.cache'
+
+
+class InstFormat(str, enum.Enum):
+    '''instruction formats; compares equal to the letter used in the csv'''
+    R = 'R'
+    I = 'I'
+    S = 'S'
+    B = 'B'
+    J = 'J'
+    U = 'U'
+    OTHER = 'other'  # anything else, assembled as a NOP
+
+
+## Lookup used instead of InstFormat(val), which is much slower per call
+_FORMATS = {fmt.value: fmt for fmt in InstFormat}
+_FORMATS['None'] = None
+
+
+class InstRecord(namedtuple('InstRecord', 'name format opcode funct3 funct7')):
+    '''a single row of the ISA table: format is an InstFormat, opcode/funct3/funct7
+    are ints (None where the csv says 'None'). Immutable and slotted.'''
+    __slots__ = ()
+
+
+## Convert a csv field to an int (fields are written in binary)
+def _parse_field(val):
+    return None if val == 'None' else int(val, 2)
+
+def _parse_format(val, formats=_FORMATS):
+    return formats.get(val, InstFormat.OTHER)
+
+
+## Parse the csv contents into plain tuples (the form stored in the cache)
+def _parse_rows(text):
+    '''returns a tuple of (name, format, opcode, funct3, funct7) rows'''
+    # only needed on a cache miss, so keep it off the import path
+    import csv
+    import io
+    data = csv.reader(io.StringIO(text, newline=''))
+    header = next(data)
+    col = {name: i for i, name in enumerate(header)}
+    rows = []
+    for row in data:
+        if not row:
+            continue
+        rows.append((row[0], row[col['format']],
+                     _parse_field(row[col['opcode']]),
+                     _parse_field(row[col['funct3']]),
+                     _parse_field(row[col['funct7']])))
+    return tuple(rows)
+
+def _build_table(rows):
+    return {name: InstRecord(name, _parse_format(fmt), opcode, funct3, funct7)
+            for name, fmt, opcode, funct3, funct7 in rows}
+
+
+def cache_path(filename):
+    '''path of the binary cache that belongs to the csv `filename`'''
+    return filename + CACHE_SUFFIX
+
+def _read_cache(path, digest):
+    '''returns the cached rows, or None if the cache is missing or stale'''
+    try:
+        with open(path, 'rb') as f:
+            version, magic, cached_digest, rows = marshal.loads(f.read())
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if version != CACHE_VERSION or magic != marshal.version or cached_digest != digest:
+        return None
+    return rows
+
+def _write_cache(path, digest, rows):
+    '''writes the cache atomically; a read-only directory just means no cache'''
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, 'wb') as f:
+            f.write(marshal.dumps((CACHE_VERSION, marshal.version, digest, rows)))
+        os.replace(tmp, path)
+    except OSError:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+
+
+def fingerprint(isa):
+    '''hash of the contents of an ISA table ({name: InstRecord}), for keying cached outputs'''
+    import hashlib
+    rows = sorted((rec.name, str(rec.format), rec.opcode, rec.funct3, rec.funct7) for rec in isa.values())
+    return hashlib.blake2b(marshal.dumps(rows), digest_size=16).digest()
+
+
+def compile_isa(filename):
+    '''parses the csv `filename` into {name: InstRecord} without touching the cache'''
+    with open(filename, newline='') as f:
+        return _build_table(_parse_rows(f.read()))
+
+def load_isa(filename, use_cache=True):
+    '''loads {name: InstRecord} for the csv `filename`.
+    The parsed rows are cached next to the csv and reused for as long as the
+    sha256 of the csv contents matches the one stored in the cache.'''
+    if not use_cache:
+        return compile_isa(filename)
+    import hashlib  # imported here so importing the package stays cheap
+    with open(filename, 'rb') as f:
+        raw = f.read()
+    digest = hashlib.sha256(raw).digest()
+    path = cache_path(filename)
+    rows = _read_cache(path, digest)
+    if rows is None:
+        rows = _parse_rows(raw.decode())
+        _write_cache(path, digest, rows)
+    return _build_table(rows)
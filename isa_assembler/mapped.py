@@ -0,0 +1,64 @@
+# Memory-mapped reading of large input files.
+#
+# A file is mapped once and processed in chunks of about CHUNK_BYTES that end on a line
+# boundary, so only one chunk at a time is copied out of the page cache and the resident
+# set does not grow with the file beyond the objects the caller keeps. Chunks are bytes,
+# so readers can tokenize them with bytes.split() and int() before decoding anything.
+#
+# Building millions of small lists makes the cyclic garbage collector rescan the
+# (acyclic) token lists over and over; readers pause it while they run.
+
+import gc
+import mmap
+from contextlib import contextmanager
+
+CHUNK_BYTES = 2**20
+
+
+@contextmanager
+def map_file(filename):
+    '''the contents of `filename` as a read-only mmap (b'' for an empty file)'''
+    with open(filename, 'rb') as f:
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file
+            yield b''
+            return
+        with mapped:
+            yield mapped
+
+
+def iter_chunks(data, chunk_bytes=CHUNK_BYTES):
+    '''yields consecutive bytes slices of about chunk_bytes from `data` (bytes or
+    mmap), each ending just after a newline except possibly the last'''
+    size = len(data)
+    pos = 0
+    while pos < size:
+        end = data.find(b'\n', min(pos + chunk_bytes, size) - 1)
+        end = size if end == -1 else end + 1
+        yield data[pos:end]
+        pos = end
+
+
+def text_lines(chunk):
+    '''the lines of a chunk as text-mode iteration splits them (\\n, \\r\\n or \\r),
+    without their line endings'''
+    text = chunk.decode()
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    lines = text.split('\n')
+    if lines[-1] == '':
+        lines.pop()
+    return lines
+
+
+@contextmanager
+def collector_paused():
+    '''disables the cyclic garbage collector for the duration of the block'''
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
@@ -0,0 +1,154 @@
+# Machine code writers: the save_bin() text format plus raw little-endian, Intel HEX, $readmemh and ELF32 images.
+#
+# Every writer takes an iterable of array('I') chunks, so the batch path (one chunk)
+# and the streaming path (many chunks) share the same code. Each chunk is written
+# with a single write() call.
+
+import struct
+import sys
+from array import array
+
+FORMATS = ('text', 'raw', 'ihex', 'readmemh', 'elf')
+
+## Output file suffix for each format (replaces the `1.txt` of a `*_out1.txt` input)
+SUFFIXES = {'text': '2.bin', 'raw': '2.img', 'ihex': '2.hex', 'readmemh': '2.mem', 'elf': '2.elf'}
+
+
+## Little-endian bytes of a chunk of words
+def _le_bytes(words):
+    if sys.byteorder == 'little':
+        return words.tobytes()
+    swapped = array('I', words)
+    swapped.byteswap()
+    return swapped.tobytes()
+
+
+# %%
+def _write_text(f, chunks, base_address):
+    count = 0
+    for words in chunks:
+        f.write(''.join([f'{word:032b}\n' for word in words]).encode('ascii'))
+        count += len(words)
+    return count
+
+def _write_raw(f, chunks, base_address):
+    count = 0
+    for words in chunks:
+        f.write(_le_bytes(words))
+        count += len(words)
+    return count
+
+def _write_readmemh(f, chunks, base_address):
+    '''one 32-bit word per line; a non-zero base address becomes an @ word address'''
+    if base_address:
+        f.write(f'@{base_address // 4:08x}\n'.encode('ascii'))
+    count = 0
+    for words in chunks:
+        f.write(''.join([f'{word:08x}\n' for word in words]).encode('ascii'))
+        count += len(words)
+    return count
+
+
+# %% [markdown]
+# Intel HEX: 16-byte data records (type 00), an extended linear address record (type 04) whenever the upper 16 address bits change, and an end-of-file record (type 01).
+
+# %%
+IHEX_RECORD_BYTES = 16
+
+def _ihex_record(address, rtype, data):
+    record = bytes((len(data), address >> 8 & 0xFF, address & 0xFF, rtype)) + data
+    return f':{record.hex().upper()}{-sum(record) & 0xFF:02X}\n'
+
+def _ihex_records(data, address, upper, final):
+    '''returns (records, bytes consumed, upper) for `data` placed at `address`.
+    Unless `final`, a short tail is left over so records do not depend on chunking.'''
+    records = []
+    pos = 0
+    while pos < len(data):
+        if address >> 16 != upper:
+            upper = address >> 16
+            records.append(_ihex_record(0, 0x04, upper.to_bytes(2, 'big')))
+        # data records never cross a 64 KiB boundary
+        size = min(IHEX_RECORD_BYTES, len(data) - pos, 0x10000 - (address & 0xFFFF))
+        if size < IHEX_RECORD_BYTES and pos + size == len(data) and not final:
+            break
+        records.append(_ihex_record(address & 0xFFFF, 0x00, data[pos:pos + size]))
+        pos += size
+        address += size
+    return records, pos, upper
+
+def _write_ihex(f, chunks, base_address):
+    address = base_address
+    upper = 0
+    pending = b''
+    count = 0
+    for words in chunks:
+        data = pending + _le_bytes(words)
+        records, used, upper = _ihex_records(data, address, upper, final=False)
+        f.write(''.join(records).encode('ascii'))
+        pending = data[used:]
+        address += used
+        count += len(words)
+    records, used, upper = _ihex_records(pending, address, upper, final=True)
+    records.append(_ihex_record(0, 0x01, b''))
+    f.write(''.join(records).encode('ascii'))
+    return count
+
+
+# %% [markdown]
+# Minimal ELF32 little-endian RISC-V executable: ELF header, one `PT_LOAD` (R+X) program header, the `.text` section and a `.shstrtab`. The entry point is the start of `.text` (`base_address`).
+#
+# _The headers depend on the size of `.text`, so they are written last over a zeroed placeholder._
+
+# %%
+EM_RISCV = 243
+ELF_HEADER = struct.Struct('<16sHHIIIIIHHHHHH')
+ELF_PHDR = struct.Struct('<IIIIIIII')
+ELF_SHDR = struct.Struct('<IIIIIIIIII')
+ELF_TEXT_OFFSET = ELF_HEADER.size + ELF_PHDR.size
+ELF_SHSTRTAB = b'\0.text\0.shstrtab\0'
+
+def elf_layout(count, base_address=0):
+    '''returns (header, trailer): the bytes that go before and after the
+    `count` little-endian words of .text in an ELF image'''
+    text_size = count * 4
+    shstrtab_offset = ELF_TEXT_OFFSET + text_size
+    shoff = shstrtab_offset + len(ELF_SHSTRTAB)
+    shoff += -shoff % 4
+
+    ident = b'\x7fELF' + bytes((1, 1, 1))  # ELFCLASS32, ELFDATA2LSB, EV_CURRENT
+    header = (ELF_HEADER.pack(ident, 2, EM_RISCV, 1, base_address, ELF_HEADER.size, shoff,
+                              0, ELF_HEADER.size, ELF_PHDR.size, 1, ELF_SHDR.size, 3, 2)
+              # PT_LOAD, PF_R | PF_X
+              + ELF_PHDR.pack(1, ELF_TEXT_OFFSET, base_address, base_address, text_size, text_size, 0x5, 4))
+    trailer = (ELF_SHSTRTAB + bytes(shoff - shstrtab_offset - len(ELF_SHSTRTAB))
+               + ELF_SHDR.pack(0, 0, 0, 0, 0, 0, 0, 0, 0, 0)
+               # .text: SHT_PROGBITS, SHF_ALLOC | SHF_EXECINSTR
+               + ELF_SHDR.pack(1, 1, 0x6, base_address, ELF_TEXT_OFFSET, text_size, 0, 0, 4, 0)
+               # .shstrtab: SHT_STRTAB
+               + ELF_SHDR.pack(7, 3, 0, 0, shstrtab_offset, len(ELF_SHSTRTAB), 0, 0, 1, 0))
+    return header, trailer
+
+def _write_elf(f, chunks, base_address):
+    f.write(bytes(ELF_TEXT_OFFSET))
+    count = _write_raw(f, chunks, base_address)
+    header, trailer = elf_layout(count, base_address)
+    f.write(trailer)
+    f.seek(0)
+    f.write(header)
+    return count
+
+
+_WRITERS = {'text': _write_text, 'raw': _write_raw, 'ihex': _write_ihex,
+            'readmemh': _write_readmemh, 'elf': _write_elf}
+
+def write_words(chunks, filename, fmt='text', base_address=0):
+    '''writes chunks of machine code words (array('I')) to `filename` in the
+    format `fmt` (one of FORMATS), placing the first word at `base_address`
+    where the format records addresses. Returns the number of words written.'''
+    try:
+        writer = _WRITERS[fmt]
+    except KeyError:
+        raise ValueError(f"Invalid output format: {fmt} (must be one of {', '.join(FORMATS)})")
+    with open(filename, 'wb') as f:
+        return writer(f, chunks, base_address)
@@ -0,0 +1,203 @@
+# Multi-core encoding of a single pre-processed (`*_out1.txt`) file, and multi-core scheduling of
+# the subsets of a tokenized program.
+#
+# The input is split into byte ranges that end on line boundaries. A first pass
+# counts the lines of every shard, which fixes where each shard's machine code
+# starts in the output; a second pass encodes the shards in a process pool and
+# every worker writes its bytes straight into the preallocated output file with
+# os.pwrite(), so no machine code goes back through the parent process.
+#
+# Scheduling: the subsets of rearrange.splitAssemblyIntoSubsets() are independent, so they are
+# packed in order into batches of about the same number of instructions and scheduled in a
+# process pool; the batches come back in order, so the result is the same as reorder_program().
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import accumulate
+
+from . import convert, instrument, rearrange
+from .output import _le_bytes, elf_layout, write_words
+
+## Output formats whose bytes per instruction are fixed, so shards can be written in place
+RECORD_BYTES = {'text': 33, 'raw': 4, 'readmemh': 9, 'elf': 4}
+SHARDS_PER_WORKER = 4
+BATCHES_PER_WORKER = 4
+## Subsets reorder_program() passes through unchanged (labels, one or two instructions) stay in the parent
+MIN_SCHEDULED = 3
+
+
+## Shard boundaries
+def shard_ranges(filename, shards):
+    '''splits the file into at most `shards` (start, end) byte ranges, each ending just after a newline'''
+    size = os.path.getsize(filename)
+    if size == 0:
+        return []
+    bounds = [0]
+    with open(filename, 'rb') as f:
+        for i in range(1, shards):
+            target = max(size * i // shards, bounds[-1])
+            f.seek(target)
+            f.readline()  # move to the start of the next line
+            pos = f.tell()
+            if pos >= size:
+                break
+            if pos > bounds[-1]:
+                bounds.append(pos)
+    bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _read_shard(filename, start, end):
+    '''bytes of a shard with text-mode line endings (\\r\\n and \\r become \\n)'''
+    with open(filename, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    if b'\r' in data:
+        data = data.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+    return data
+
+def _count_rows(data):
+    '''number of lines read_processed() would return for these bytes'''
+    return data.count(b'\n') + (1 if data and not data.endswith(b'\n') else 0)
+
+
+# %% [markdown]
+# Worker state: the ISA and encoder tables are set once per worker process by the pool initializer.
+
+# %%
+_worker_isa = None
+_worker_table = None
+
+def _init_worker(isa):
+    global _worker_isa, _worker_table
+    _worker_isa = isa
+    _worker_table = convert.build_encoder_table(isa)
+
+def _count_shard(job):
+    filename, start, end = job
+    return _count_rows(_read_shard(filename, start, end))
+
+def _render(words, fmt):
+    if fmt == 'text':
+        return ''.join([f'{word:032b}\n' for word in words]).encode('ascii')
+    if fmt == 'readmemh':
+        return ''.join([f'{word:08x}\n' for word in words]).encode('ascii')
+    if fmt in ('raw', 'elf'):
+        return _le_bytes(words)
+    raise ValueError(f"Invalid output format: {fmt}")
+
+def _encode_rows(filename, data, first_line):
+    '''tokenizes and encodes the lines of a shard; errors name the offending line'''
+    inst_asm = [convert.parse_processed_line(line, _worker_isa) for line in data.decode().split('\n')]
+    if data.endswith(b'\n'):
+        inst_asm.pop()
+    try:
+        return convert.encode_machine_code(inst_asm, _worker_isa, _worker_table)
+    except (KeyError, ValueError, IndexError, TypeError) as e:
+        for i, line in enumerate(inst_asm):
+            try:
+                convert.get_line_machine_code(line, _worker_isa)
+            except (KeyError, ValueError, IndexError, TypeError):
+                raise ValueError(f"{filename}:{first_line + i + 1}: {e}") from e
+        raise
+
+def _encode_shard(job):
+    '''encodes one shard and writes it at `out_offset`; returns the number of words'''
+    filename, start, end, first_line, out_filename, out_offset, fmt = job
+    words = _encode_rows(filename, _read_shard(filename, start, end), first_line)
+    if out_filename is None:
+        return words
+    fd = os.open(out_filename, os.O_WRONLY)
+    try:
+        os.pwrite(fd, _render(words, fmt), out_offset)
+    finally:
+        os.close(fd)
+    return len(words)
+
+
+# %%
+def encode_file_parallel(filename, out_filename, workers=None, fmt='text', base_address=0, isa=None, shards=None):
+    '''read_processed() -> get_machine_code() -> save_bin() for one file on `workers`
+    processes (default: all cores). The output is identical to the serial path.
+    Formats without a fixed record size (ihex) are encoded in parallel but
+    written by the parent. Returns the number of instructions written.'''
+    if isa is None:
+        isa = convert.get_default_isa()
+    workers = workers or os.cpu_count() or 1
+    ranges = shard_ranges(filename, shards or workers * SHARDS_PER_WORKER)
+
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(isa,)) as pool:
+        counts = list(pool.map(_count_shard, [(filename, start, end) for start, end in ranges]))
+        first_lines = list(accumulate(counts, initial=0))
+        total = first_lines.pop()
+
+        if fmt not in RECORD_BYTES:
+            jobs = [(filename, start, end, first, None, 0, fmt) for (start, end), first in zip(ranges, first_lines)]
+            return write_words(pool.map(_encode_shard, jobs), out_filename, fmt, base_address)
+
+        # preallocate the output and write the parts the parent owns
+        header, trailer = b'', b''
+        if fmt == 'elf':
+            header, trailer = elf_layout(total, base_address)
+        elif fmt == 'readmemh' and base_address:
+            header = f'@{base_address // 4:08x}\n'.encode('ascii')
+        record = RECORD_BYTES[fmt]
+        with open(out_filename, 'wb') as f:
+            f.write(header)
+            f.truncate(len(header) + total * record)
+            f.seek(len(header) + total * record)
+            f.write(trailer)
+
+        jobs = [(filename, start, end, first, out_filename, len(header) + first * record, fmt)
+                for (start, end), first in zip(ranges, first_lines)]
+        for _ in pool.map(_encode_shard, jobs):
+            pass
+    return total
+
+
+## Parallel scheduling
+def schedule_batches(sizes, batches):
+    '''splits the items with the given `sizes` into about `batches` runs of consecutive
+    items of similar total size; returns their [(start, end)] index ranges'''
+    target = max(sum(sizes) // max(batches, 1), 1)
+    ranges = []
+    first = weight = 0
+    for i, size in enumerate(sizes):
+        weight += size
+        if weight >= target:
+            ranges.append((first, i + 1))
+            first, weight = i + 1, 0
+    if first < len(sizes):
+        ranges.append((first, len(sizes)))
+    return ranges
+
+def _schedule_batch(job):
+    subsets, engine = job
+    return [engine(subset) for subset in subsets]
+
+@instrument.timed('schedule')
+def schedule_program_parallel(instructions, workers=None, engine=None, batches=None):
+    '''reorder_program() on `workers` processes (default: all cores): the subsets of
+    `instructions` with MIN_SCHEDULED or more instructions are scheduled by `engine`
+    (default: rearrange.schedule_instructions; must be a module-level function) in
+    size-balanced batches. The result is the same as the serial reorder_program();
+    with one worker or a single batch it runs serially.'''
+    engine = engine or rearrange.schedule_instructions
+    workers = workers or os.cpu_count() or 1
+    subsets = rearrange.splitAssemblyIntoSubsets(instructions)
+    scheduled = [i for i, subset in enumerate(subsets) if len(subset) >= MIN_SCHEDULED]
+    ranges = schedule_batches([len(subsets[i]) for i in scheduled], batches or workers * BATCHES_PER_WORKER)
+    jobs = [([subsets[i] for i in scheduled[start:end]], engine) for start, end in ranges]
+    if workers == 1 or len(jobs) <= 1:
+        results = map(_schedule_batch, jobs)
+    else:
+        with ProcessPoolExecutor(min(workers, len(jobs))) as pool:
+            results = list(pool.map(_schedule_batch, jobs))
+    positions = iter(scheduled)
+    for batch in results:
+        for subset in batch:
+            subsets[next(positions)] = subset
+    reordered = []
+    for subset in subsets:
+        reordered += subset
+    return reordered
@@ -0,0 +1,122 @@
+# %% [markdown]
+# ISA Assembler Design (Part 1) to turn the tokenized **assembly code** into the **pre-processed assembly code** (`*_out1.txt`) read by part 2.
+#
+# Labels are resolved in two linear passes: the first builds a symbol table of label → PC (every instruction is 4 bytes, labels take no space), the second converts register names to numbers and rewrites the label operands of B and J instructions into PC-relative offsets.
+
+# %%
+import os
+
+from . import instrument
+from .convert import (read_processed, print_asm_inst, get_isa, get_default_isa,
+                      get_inst_format, get_inst_opcode, get_inst_funct3, get_inst_funct7,
+                      get_2c_binary, IMM_POSITIONS, IMM_BOUNDS, _parse_operand)
+from .rearrange import get_reg_value, tokenize_file
+
+INST_BYTES = 4
+
+## Pseudo-instructions: name -> (instruction, operands inserted before the given ones)
+PSEUDO = {'j': ('jal', ['zero']), 'nop': ('addi', ['zero', 'zero', '0'])}
+
+## Formats whose immediate may be a label, resolved to an offset from the instruction's PC
+LABEL_FORMATS = ('B', 'J')
+
+## Register numbers already looked up by get_reg_value()
+_registers = {}
+
+def _reg_value(reg_name):
+    try:
+        return _registers[reg_name]
+    except KeyError:
+        value = _registers[reg_name] = get_reg_value(reg_name)
+        return value
+
+
+## Function to split a label off the front of a line of tokens
+def split_label(line):
+    '''returns (label or None, instruction tokens); `loop: add ...` has both'''
+    if line and line[0].endswith(':'):
+        return line[0][:-1], line[1:]
+    return None, line
+
+## Pass 1: symbol table
+def build_symbol_table(instructions):
+    '''returns {label: PC} for tokenized instructions (see rearrange.tokenize)'''
+    symbols = {}
+    pc = 0
+    for line in instructions:
+        label, args = split_label(line)
+        if label is not None:
+            if label in symbols:
+                raise ValueError(f"Duplicate label: {label}")
+            symbols[label] = pc
+        if args:
+            pc += INST_BYTES
+    return symbols
+
+## Pass 2: operands
+def resolve_line(args, pc, symbols, isa=None):
+    '''converts one tokenized instruction at `pc` into pre-processed form:
+    registers become numbers and B/J label operands become PC-relative offsets'''
+    if isa is None:
+        isa = get_default_isa()
+    name = args[0]
+    if name in PSEUDO and name not in isa:
+        name, extra = PSEUDO[name]
+        args = [name] + extra + args[1:]
+    rec = isa.get(name)
+    if rec is None:
+        raise KeyError(f"Invalid instruction: {name}")
+    imm = IMM_POSITIONS.get(rec.format, ())
+    line = [name]
+    for i in range(1, len(args)):
+        arg = args[i]
+        if i not in imm:
+            line.append(_reg_value(arg))
+            continue
+        value = _parse_operand(arg, False)
+        if isinstance(value, str) and rec.format in LABEL_FORMATS:
+            try:
+                value = symbols[value] - pc
+            except KeyError:
+                raise KeyError(f"Undefined label: {arg}") from None
+            low, high = IMM_BOUNDS[rec.format]
+            if not low <= value < high:
+                raise ValueError(f"Label '{arg}' out of range for {name} at PC {pc}: offset {value} "
+                                 f"must be between [{low}, {high}).")
+        line.append(value)
+    return line
+
+def resolve_labels(instructions, symbols, isa=None):
+    '''resolve_line() on every instruction; label lines produce no output'''
+    if isa is None:
+        isa = get_default_isa()
+    inst_asm = []
+    pc = 0
+    for line in instructions:
+        _, args = split_label(line)
+        if args:
+            inst_asm.append(resolve_line(args, pc, symbols, isa))
+            pc += INST_BYTES
+    return inst_asm
+
+@instrument.timed('preprocess')
+def preprocess(instructions, isa=None):
+    '''tokenized assembly (see rearrange.tokenize) -> pre-processed instructions
+    ready for get_machine_code()'''
+    return resolve_labels(instructions, build_symbol_table(instructions), isa)
+
+
+## Function to save the pre-processed assembly code
+@instrument.timed('io', items_arg=0)
+def save_processed(inst_asm, filename):
+    '''writes one instruction per line, in the format read by read_processed()'''
+    with open(filename, 'w') as f:
+        f.write(''.join([' '.join(map(str, line)) + '\n' for line in inst_asm]))
+
+def preprocess_file(filename, out_filename=None, isa=None):
+    '''tokenizes and pre-processes an assembly file; returns the name of the
+    written file (by default `*_out1.txt` next to the input)'''
+    if out_filename is None:
+        out_filename = os.path.splitext(filename)[0] + '_out1.txt'
+    save_processed(preprocess(tokenize_file(filename), isa), out_filename)
+    return out_filename
@@ -11,6 +11,8 @@
 import re
 import csv
 
+from . import instrument, mapped
+
 # Function to read the assembly code file #
 def read(filename):
     #read each line from a file
@@ -79,20 +81,64 @@ def remove_empty(instructions):
 
 def loadsave_arg_reorder(instructions):
     for i in range(len(instructions)):
-        if instructions[i][0] == 'lw':
-            tmp = instructions[i][3]
-            instructions[i][3] = instructions[i][2]
-            instructions[i][2] = tmp
-        elif instructions[i][0] == 'sw':
-            tmp = instructions[i][3]
-            instructions[i][3] = instructions[i][2]
-            instructions[i][2] = instructions[i][1]
-            instructions[i][1] = tmp
+        # the mnemonic follows the label of a `label: lw ...` line
+        m = 1 if instructions[i][0].endswith(':') and len(instructions[i]) > 1 else 0
+        if instructions[i][m] == 'lw':
+            tmp = instructions[i][m + 3]
+            instructions[i][m + 3] = instructions[i][m + 2]
+            instructions[i][m + 2] = tmp
+        elif instructions[i][m] == 'sw':
+            tmp = instructions[i][m + 3]
+            instructions[i][m + 3] = instructions[i][m + 2]
+            instructions[i][m + 2] = instructions[i][m + 1]
+            instructions[i][m + 1] = tmp
         else:
             continue
     return instructions
 
 
+# Single-pass lexer: remove_comments + split_arg + remove_empty + loadsave_arg_reorder fused
+TOKEN_PATTERN = re.compile('[a-zA-Z0-9_#:+-]+')
+
+def iter_tokens(lines):
+  # yields the token list of each non-empty line, exactly as the four passes above would
+  findall = TOKEN_PATTERN.findall
+  for line in lines:
+    comment = line.find('#')
+    # like re.sub('#.+', ...), a '#' needs at least one character after it to start a comment
+    if comment != -1 and comment < len(line) - 1:
+      line = line[:comment]
+    args = findall(line)
+    if not args:
+      continue
+    m = 1 if args[0].endswith(':') and len(args) > 1 else 0  # `label: lw ...`
+    if args[m] == 'lw':
+      args[m + 2], args[m + 3] = args[m + 3], args[m + 2]
+    elif args[m] == 'sw':
+      args[m + 1], args[m + 2], args[m + 3] = args[m + 3], args[m + 1], args[m + 2]
+    yield args
+
+
+def format_instruction(args):
+  # the assembly line of a token list, which iter_tokens() reads back as the same list
+  # (loads and stores are written as `lw rd, imm(base)` and `sw src, imm(base)` again)
+  if args[0].endswith(':') and len(args) > 1:
+    return args[0] + ' ' + format_instruction(args[1:])
+  if args[0] == 'lw' and len(args) == 4:
+    return f"lw {args[1]}, {args[3]}({args[2]})"
+  if args[0] == 'sw' and len(args) == 4:
+    return f"sw {args[2]}, {args[3]}({args[1]})"
+  return args[0] + (' ' + ', '.join(args[1:]) if len(args) > 1 else '')
+
+
+@instrument.timed('parse')
+def tokenize_file(filename):
+  # tokenizes a file while reading it, without keeping its lines
+  # (the token lists are acyclic, so the garbage collector is paused while they pile up)
+  with open(filename, 'r') as f, mapped.collector_paused():
+    return list(iter_tokens(f))
+
+
 # Gets the type for the respective instruction (removes need for external .csv)
 def get_instruction_type(opcode):
   return next((inst_type for inst_type, opcodes in {
@@ -381,14 +427,67 @@ def t5_test():
   correct = [['lw', 'x1', 'x0', '0'],['lw', 'x2', 'x0', '8'],['lw', 'x4', 'x0', '16'],['add', 'x3', 'x1', 'x2'],['add', 'x5', 'x1', 'x4'],['sw', 'x3', 'x0', '24'],['sw', 'x5', 'x0', '32']]
   print("\nCorrect answer:")
   print_instructions(correct, GREEN)
-  returned = reorder_instructions(instructions)
+  returned = reorder_instructions(list(instructions))
+  color = GREEN if returned == correct else RED
+  print("\nReturned answer:")
+  print_instructions(returned, color)
+  print(END)
+
+  #test schedule_instructions()
+  #the load from 16(x0) may read what `sw x3` stored (x3 is its base), so it stays below the store
+  print("Testing "+YELLOW+"schedule_instructions()"+END+" with the same instructions")
+  correct = [list(instruction) for instruction in instructions]
+  print("\nCorrect answer:")
+  print_instructions(correct, GREEN)
+  returned = schedule_instructions(instructions)
   color = GREEN if returned == correct else RED
   print("\nReturned answer:")
   print_instructions(returned, color)
   print(END)
 
 # %%
-def t6_test(filename):
+def t6_test(filename=None):
+  # the program behind `correct` (a file given instead must hold the same blocks)
+  source = [
+    'load_use1:',
+    '  lw t1, 12(t1)',
+    '  add t5, t1, t7',
+    '  sub t8, t6, t7',
+    '  or t9, t6, t7',
+    'load_use2:',
+    '  lw t1, 12(t1)',
+    '  add t5, t1, t7',
+    '  sub t1, t6, t7',
+    '  or t9, t6, t7',
+    'no_dep:',
+    '  lw t0, 12(t1)',
+    '  sub t2, t0, s1',
+    '  add t5, t6, t7',
+    '  or s5, s6, t6',
+    'alu_then_branch:',
+    '  sub s3, s3, t0',
+    '  sub t3, t4, t5',
+    '  add t0, t1, t2',
+    '  beq t0, t5, loop',
+    'load_then_branch:',
+    '  add t4, t6, t7',
+    '  sub t2, t3, s1',
+    '  lw t0, 0(t1)',
+    '  beq t0, t5, loop',
+    'fix_no_steal:',
+    '  lw t0, 12(t1)',
+    '  add t5, t0, t7',
+    '  sub t2, t4, t6',
+    '  or s5, t0, t6',
+    '  add s3, s5, s6',
+    'handshake:',
+    '  lw t0, 12(t1)',
+    '  add t5, t0, t7',
+    '  sub s5, t4, t6',
+    '  or s5, t7, t6',
+    '  add s3, s5, s6']
+  # fix_no_steal: reorder_instructions() stops at the first hazard it cannot fix and leaves the
+  # load-use stall before `add t5`; the scheduler fills that slot with `sub t2` instead
   correct =[
     ['load_use1:'],
     ['lw', 't1', 't1', '12'],
@@ -417,9 +516,9 @@ def t6_test(filename):
     ['beq', 't0', 't5', 'loop'],
     ['fix_no_steal:'],
     ['lw', 't0', 't1', '12'],
-    ['add', 't5', 't0', 't7'],
-    ['or', 's5', 't0', 't6'],
     ['sub', 't2', 't4', 't6'],
+    ['or', 's5', 't0', 't6'],
+    ['add', 't5', 't0', 't7'],
     ['add', 's3', 's5', 's6'],
     ['handshake:'],
     ['lw', 't0', 't1', '12'],
@@ -428,29 +527,20 @@ def t6_test(filename):
     ['add', 't5', 't0', 't7'],
     ['add', 's3', 's5', 's6']]
 
-  # catching up to where this would inject into Lab #03
-  instructions = read(filename)
-  instructions = remove_comments(instructions)
-  instructions = split_arg(instructions)
-  instructions = remove_empty(instructions)
-  instructions = loadsave_arg_reorder(instructions)
-
-  # split the instructions into subsets
-  subsets = splitAssemblyIntoSubsets(instructions)
-
-  # loop through the subsets and reorder the instructions to avoid data dependencies
-  reordered_instructions = []
-  for subset in subsets:
-    # for labels or single or a pair of instructions
-    if len(subset) <= 2:
-      reordered_instructions += subset
-    # subsets with more than two instructions
-    else:
-      reordered_instructions += reorder_instructions(subset)
+  instructions = tokenize(source) if filename is None else tokenize_file(filename)
+  reordered_instructions = reorder_program(instructions)
 
   for line in reordered_instructions:
     print(line[0], ', '.join(line[1:]))
 
+  matches = reordered_instructions == correct
+  color = GREEN if matches else RED
+  print("Returned answer: "+color+("matches" if matches else "differs from")+END+" the expected order")
+  for i, (line_a, line_b) in enumerate(zip(correct, reordered_instructions)):
+    if line_a != line_b:
+      print(RED+f"first difference at instruction {i}: {line_a} != {line_b}"+END)
+      break
+
   # print("Original\t\t\tReordered")
 
   # for i in range(len(instructions)):
@@ -467,22 +557,6 @@ def t6_test(filename):
 
 
 
-# %%
-#@title
-filename = "example.asm" #@param {type:"string"}
-# filename = "example.asm"
-
-# %%
-#@title Assembly Instructions loaded from `filename`
-# catching up to where this would inject into the workflow of Lab #03
-instructions = read(filename)
-instructions = remove_comments(instructions)
-instructions = split_arg(instructions)
-instructions = remove_empty(instructions)
-instructions = loadsave_arg_reorder(instructions)
-# print instructions after processing from Lab #03 is performed
-print_asm_inst(instructions)
-
 # %% [markdown]
 # The function `splitAssemblyIntoSubsets()` splits `instructions` into `subsets`, starting a new `subset` after instructions that **cannot** be reordered. These instructions include:
 # - Branch instructions: `beq`, `bne`, `blt`, `bge`
@@ -524,10 +598,7 @@ def splitAssemblyIntoSubsets(instructions):
   return subsets if subsets else instructions
 
 # %% [markdown]
-# test output
-
-# %%
-t1_test()
+# tested by `t1_test()`
 
 # %% [markdown]
 # The function `get_operands()` returns the `rd` and `rs` values of an instruction.
@@ -573,14 +644,67 @@ def get_rs(instruction):
 # check if rd of instructionA is in rs of instructionB
 def are_data_dependent(instruction_A,instruction_B):
   # your code here -------------------------------
-  return get_rd(instruction_A) in get_rs(instruction_B)
+  return bool(get_reg_masks(instruction_A)[1] & get_reg_masks(instruction_B)[0])
 
 
 # %% [markdown]
-# output of `get_operands()` and `are_data_dependent()`.
+# Each instruction is analysed once into a pair of register bitmasks `(uses, defs)`, where bit `n` stands for register `xn` (resolved with `get_reg_value()`, so `t0` and `x5` are the same register and `x1` never matches `x10`). A dependency test is then a single `&`. `x0` is left out: it always reads as 0 and writes to it are discarded.
+#
+# _Operands that are not register names get their own bit above bit 31, so they still only match themselves. There are `EXTRA_BITS` such bits; once they are used up, further names share the last one, which can only add dependencies, never lose one. Instructions of unknown type get `(-1, -1)`, which depends on every register._
 
 # %%
-t2_test()
+import itertools
+import threading
+
+MAX_REG_NAMES = 4096  # register names remembered by get_reg_bit() before it starts over
+EXTRA_BITS = 64       # bits above bit 31 for operands that are not register names
+
+_reg_bits = {}    # register name -> bit (recomputed after a clear, so it can be dropped at any time)
+_extra_bits = {}  # other operand -> bit (kept: the same name must always get the same bit)
+_next_extra = itertools.count()
+_extra_lock = threading.Lock()
+
+def get_reg_bit(reg_name):
+  bit = _reg_bits.get(reg_name)
+  if bit is not None:
+    return bit
+  try:
+    value = get_reg_value(reg_name)
+  except (ValueError, IndexError):
+    value = -1
+  if 0 <= value < 32:
+    if len(_reg_bits) >= MAX_REG_NAMES:
+      _reg_bits.clear()
+    bit = _reg_bits[reg_name] = (1 << value) & ~1
+    return bit
+  bit = _extra_bits.get(reg_name)
+  if bit is None:
+    with _extra_lock:  # the check and the allocation happen together, so no bit is handed out twice
+      bit = _extra_bits.get(reg_name)
+      if bit is None:
+        if len(_extra_bits) < EXTRA_BITS - 1:
+          bit = _extra_bits[reg_name] = 1 << (32 + next(_next_extra))
+        else:
+          bit = 1 << (32 + EXTRA_BITS - 1)  # shared by every later name, not remembered
+  return bit
+
+# returns the (uses, defs) register bitmasks of an instruction
+def get_reg_masks(instruction):
+  if get_instruction_type(instruction[0]) is None:
+    return -1, -1
+  try:
+    rd, rs = get_operands(instruction)
+  except IndexError:
+    return -1, -1
+  uses = 0
+  for reg in ([rs] if isinstance(rs, str) else rs):
+    if reg != " ":
+      uses |= get_reg_bit(reg)
+  return uses, (get_reg_bit(rd) if rd != " " else 0)
+
+
+# %% [markdown]
+# `get_operands()` and `are_data_dependent()` are tested by `t2_test()`.
 
 # %% [markdown]
 # The function `find_above_instruction_without_dependencies()` scans a `subset` upward (from bottom to top) until an `instruction` with no data dependencies is found. This alone will not be enough to sufficiently check the `subset` for suitable instructions to swap, because when a suitable instruction is not found searching bottom to top, the search must be repeated from top to bottom. <br><br>
@@ -593,30 +717,35 @@ t2_test()
 
 # %%
   # search instructions (upward from current index) for instruction with no data dependencies
-def find_above_instruction_without_dependencies(instructions, current_index):
+def find_above_instruction_without_dependencies(instructions, current_index, masks=None):
     # your code here -------------------------------
-    a_inst = instructions[current_index]   # Get instructions
+    if masks is None:
+      masks = [get_reg_masks(instruction) for instruction in instructions]
+    a_uses = masks[current_index][0]   # Get instructions
 
+    # registers used and defined by the intermediate instructions (index_t, current_index)
+    int_uses, int_defs = masks[current_index - 1]
     for index_t in reversed(range(0, current_index - 1)):   # Iterate the instructions
-      t_inst = instructions[index_t]
-      if t_inst[0][0] in {'b', 'j'}: # Check if the instruction is jomp or branch
+      t_uses, t_defs = masks[index_t]
+      if index_t + 1 < current_index - 1:
+        int_uses |= masks[index_t + 1][0]
+        int_defs |= masks[index_t + 1][1]
+      if instructions[index_t][0][0] in {'b', 'j'}: # Check if the instruction is jomp or branch
         continue # Continue if it is
 
-      if are_data_dependent(t_inst, a_inst):  # check if register destination is used in current instruction
+      if t_defs & a_uses:  # check if register destination is used in current instruction
         continue  # Continue if it exist
 
-      found_dependency = False
-      for int_index in range(index_t + 1, current_index):
-        intermediate_instruction = instructions[int_index]
-        if are_data_dependent(intermediate_instruction, t_inst) or are_data_dependent(t_inst, intermediate_instruction):
-          found_dependency = True # Dependency Found
-          break
+      # Dependency in either direction with any intermediate instruction
+      found_dependency = bool(int_defs & t_uses or t_defs & int_uses)
       # ----------------------------------------------
       # if no data dependency is found, test index is last index where instruction can be safely injected
       if not found_dependency:
         return index_t
 
     # if no safe index is found, return False
+    if instrument.enabled:
+      instrument.count('reorder.failed_searches_above')
     return False
 
 # %%
@@ -624,47 +753,43 @@ def find_above_instruction_without_dependencies(instructions, current_index):
 
 # %%
 # search instructions (downward from current index) for instruction with no data dependencies
-def find_below_instruction_without_dependencies(instructions, current_index):
-  # get the instruction at prev index
-  prev_instruction = instructions[current_index-1]
+def find_below_instruction_without_dependencies(instructions, current_index, masks=None):
+  if masks is None:
+    masks = [get_reg_masks(instruction) for instruction in instructions]
+  # get the register destination of the instruction at prev index
+  prev_defs = masks[current_index-1][1]
+
+  # registers used and defined by the instructions between current index (inclusive) and test index (exclusive)
+  int_uses, int_defs = 0, 0
 
   # iterate over previous instructions from current index up to beginning of instructions
   for test_index in range(current_index + 1, len(instructions)):
-    # get instruction to test if it has data dependencies
-    test_instruction = instructions[test_index]
+    int_uses |= masks[test_index - 1][0]
+    int_defs |= masks[test_index - 1][1]
+    test_uses, test_defs = masks[test_index]
 
     # check if test instruction is a branch or jump
-    if test_instruction[0][0] in {'b', 'j'}:
+    if instructions[test_index][0][0] in {'b', 'j'}:
       continue
 
     # check if register destination of previous instruction is used in register sources of test instruction
-    if are_data_dependent(prev_instruction, test_instruction):
+    if prev_defs & test_uses:
       continue  # data dependency exists, continue searching
 
-    # iterate over instructions between current instruction index (inclusive) and test index (exclusive) to check if there are data dependencies with test instruction
-    found_dependency = False
-    for intermediate_index in range(current_index, test_index):
-      intermediate_instruction = instructions[intermediate_index]
-      # if there are dependencies detected between instructions (in either direction), there is a dependency
-      if are_data_dependent(intermediate_instruction, test_instruction) or are_data_dependent(test_instruction, intermediate_instruction):
-        found_dependency = True
-        break
+    # if there are dependencies detected between the intermediate instructions and the test instruction (in either direction), there is a dependency
+    found_dependency = bool(int_defs & test_uses or test_defs & int_uses)
 
     # if no data dependency is found, test index is last index where instruction can be safely injected
     if not found_dependency:
       return test_index
 
   # if no safe index is found, return False
+  if instrument.enabled:
+    instrument.count('reorder.failed_searches_below')
   return False
 
 # %% [markdown]
-# output of `find_above_instruction_without_dependencies()`.
-
-# %%
-t3_test()
-
-# %% [markdown]
-# 
+# `find_above_instruction_without_dependencies()` is tested by `t3_test()`.
 
 # %%
 def move_instruction_above_index(instructions, target_index, source_index):
@@ -680,10 +805,7 @@ def move_instruction_above_index(instructions, target_index, source_index):
 # %% [markdown]
 # The above function moves the dependency-free `instruction` we found between the two instructions found to have a data dependency
 # 
-# test output of `move_instruction_above_index()`.
-
-# %%
-t4_test()
+# `move_instruction_above_index()` is tested by `t4_test()`.
 
 # %% [markdown]
 # The function `reorder_instructions()` reorders instructions in a `subset` to avoid data hazards and stalls.
@@ -714,56 +836,309 @@ t4_test()
 # 
 # _Recall that python treats `False` and `0` as equivalent values. e.g., `print(0==False)` returns `True`._
 
+# %% [markdown]
+# _The `subset` is kept in a doubly linked order over the original indices (`above`/`below`) instead of a list that is shifted on every move: moving an instruction only relinks it, the downward search stops at the truncation point (`stop`) instead of copying `instructions[:max_index]`, and the list is rebuilt once at the end. The two searches walk the links the same way `find_above_instruction_without_dependencies()` and `find_below_instruction_without_dependencies()` walk the indices._
+
 # %%
 def reorder_instructions(instructions):
-  # variable to store truncation point
-  max_index = len(instructions)
+  n = len(instructions)
+  # register masks of each instruction
+  masks = [get_reg_masks(instruction) for instruction in instructions]
+  is_jump = [instruction[0][0] in {'b', 'j'} for instruction in instructions]
+  # linked order: instruction above and below each one, -1 past either end
+  above = list(range(-1, n - 1))
+  below = list(range(1, n)) + [-1]
+  head = 0 if n else -1
+  # truncation point: the downward search stops before this instruction (-1: end of the subset)
+  stop = -1
+  # scheduler events for instrument.py
+  hazards = moves = failed_above = failed_below = 0
+
+  def search_above(current, previous):
+    uses = masks[current][0]
+    int_uses, int_defs = masks[previous]
+    test = above[previous]
+    while test != -1:
+      if below[test] != previous:
+        int_uses |= masks[below[test]][0]
+        int_defs |= masks[below[test]][1]
+      test_uses, test_defs = masks[test]
+      if not is_jump[test] and not test_defs & uses and not (int_defs & test_uses or test_defs & int_uses):
+        return test
+      test = above[test]
+    return -1
+
+  def search_below(current, previous):
+    prev_defs = masks[previous][1]
+    int_uses, int_defs = 0, 0
+    # the view ends just above `stop`, which may be the current instruction itself
+    test = below[current] if current != stop else stop
+    while test != stop and test != -1:
+      int_uses |= masks[above[test]][0]
+      int_defs |= masks[above[test]][1]
+      test_uses, test_defs = masks[test]
+      if not is_jump[test] and not prev_defs & test_uses and not (int_defs & test_uses or test_defs & int_uses):
+        return test
+      test = below[test]
+    return -1
+
+  def move_above(source, target):
+    nonlocal head
+    if above[source] == -1:
+      head = below[source]
+    else:
+      below[above[source]] = below[source]
+    if below[source] != -1:
+      above[below[source]] = above[source]
+    above[source], below[source] = above[target], target
+    if above[target] == -1:
+      head = source
+    else:
+      below[above[target]] = source
+    above[target] = source
 
-  for current_index in reversed(range(1, len(instructions))):
+  current = n - 1
+  while current > -1 and above[current] != -1:
 # your code here -------------------------------
-    current_instruction = instructions[current_index]
-    previous_instruction = instructions[current_index - 1]
-
-    if are_data_dependent(previous_instruction, current_instruction):
-      test_instruction_index = find_above_instruction_without_dependencies(instructions, current_index)
-
-      if test_instruction_index is False: # If not found
-        test_instruction_index = find_below_instruction_without_dependencies(instructions[:max_index], current_index)
-
-      if test_instruction_index is not False: # If one is found
-        instructions = move_instruction_above_index(instructions, current_index, test_instruction_index)
-        max_index = current_index - 1 # Update
+    previous = above[current]
+    if masks[previous][1] & masks[current][0]:
+      hazards += 1
+      test = search_above(current, previous)
+      from_below = test == -1
+
+      if from_below: # If not found
+        failed_above += 1
+        test = search_below(current, previous)
+
+      if test == -1:
+        failed_below += 1
+      else: # If one is found
+        moves += 1
+        move_above(test, current)
+        # an instruction moved up from below takes the current position
+        if from_below:
+          current = test
+        stop = above[current] # Update
 # ----------------------------------------------
-
+    current = above[current]
+
+  # materialize the order once
+  order = []
+  while head != -1:
+    order.append(instructions[head])
+    head = below[head]
+  instructions[:] = order
+  if instrument.enabled and hazards:
+    instrument.count('reorder.hazards', hazards)
+    instrument.count('reorder.moves', moves)
+    instrument.count('reorder.failed_searches_above', failed_above)
+    instrument.count('reorder.failed_searches_below', failed_below)
   return instructions
 
 # %% [markdown]
-#  output of `reorder_instructions()`.
+# `reorder_instructions()` is tested by `t5_test()`.
+
+# %% [markdown]
+# The function `schedule_instructions()` is a list scheduler that replaces the search in `reorder_instructions()`.
+#
+# It builds the dependency graph of a `subset` once (RAW, WAR and WAW edges between registers and memory) and then issues one instruction per cycle from a priority queue of ready instructions, preferring the longest remaining chain of dependencies. A loaded value can only be used `LOAD_LATENCY` cycles after the load, so independent instructions are moved into the load-use slot. A branch or jump at the end of the `subset` is the last node of the graph and stays last; it compares a register `BRANCH_LATENCY` cycles after the instruction writing it at the earliest, so the instructions it depends on are issued early enough for it to follow the others without a stall.
+#
+# _Unlike `reorder_instructions()`, which only tracks registers, memory accesses are assumed to alias: loads may pass each other but never a store, and stores keep their order._
 
 # %%
-t5_test()
+import heapq
+
+LOAD_LATENCY = 2  # cycles from a load until its value can be used (1 for every other instruction)
+BRANCH_LATENCY = 2  # cycles from any instruction until a branch or jump can compare its result
+MEMORY = 'memory'  # dependency graph key of data memory, next to the register bits
+
+def build_dependency_graph(instructions):
+  # returns (successors, indegree): successors[i] lists (j, latency) for every instruction j that must come after i
+  return build_mask_graph([get_reg_masks(instruction) for instruction in instructions],
+                          [instruction[0] for instruction in instructions])
+
+
+def build_mask_graph(masks, names):
+  # build_dependency_graph() from the (uses, defs) masks and the first tokens of the instructions
+  successors = [[] for _ in masks]
+  indegree = [0] * len(masks)
+  latency = [LOAD_LATENCY if name == 'lw' else 1 for name in names]
+
+  def add_edge(i, j, cycles):
+    successors[i].append((j, cycles))
+    indegree[j] += 1
+
+  last_def = {}  # register bit -> last instruction writing it
+  reads = {}     # register bit -> instructions reading it since it was last written
+  barrier = -1   # last instruction with unknown operands: nothing moves across it
+  for j, (uses, defs) in enumerate(masks):
+    if barrier >= 0:
+      add_edge(barrier, j, 1)
+    if uses == -1:
+      for i in range(barrier + 1, j):
+        add_edge(i, j, latency[i])
+      barrier = j
+      last_def.clear()
+      reads.clear()
+      continue
+    used = []
+    while uses:
+      reg = uses & -uses
+      uses ^= reg
+      used.append(reg)
+    defined = []
+    while defs:
+      reg = defs & -defs
+      defs ^= reg
+      defined.append(reg)
+    # memory is one more resource: a load reads it and a store writes it
+    if names[j] == 'lw':
+      used.append(MEMORY)
+    elif names[j] == 'sw':
+      defined.append(MEMORY)
+    for reg in used:
+      if reg in last_def:
+        i = last_def[reg]
+        add_edge(i, j, max(latency[i], BRANCH_LATENCY) if names[j][:1] in ('b', 'j') else latency[i])  # RAW
+      reads.setdefault(reg, []).append(j)
+    for reg in defined:
+      for i in reads.pop(reg, ()):
+        if i != j:
+          add_edge(i, j, 1)  # WAR
+      if reg in last_def:
+        add_edge(last_def[reg], j, 1)  # WAW
+      last_def[reg] = j
+  return successors, indegree
+
+
+def schedule_instructions(instructions):
+  order = schedule_order([get_reg_masks(instruction) for instruction in instructions],
+                         [instruction[0] for instruction in instructions])
+  return [instructions[i] for i in order]
+
+
+def schedule_order(masks, names):
+  # the positions of a subset in scheduled order, from the (uses, defs) masks and the
+  # first tokens of its instructions (so ir.schedule_program() needs no token lists)
+  # a branch or jump ending the subset is the last node of the graph and stays last
+  count = len(names)
+  end = count
+  if end and names[-1][:1] in ('b', 'j'):
+    end -= 1
+  successors, indegree = build_mask_graph(masks, names)
+
+  # priority: length of the longest chain of latencies to the end of the subset (the branch
+  # issues last anyway), and the last cycle at which an instruction the branch depends on
+  # can issue without delaying the branch past cycle `end` (count: it does not feed the branch)
+  height = [1] * count
+  deadline = [count] * end + [end] * (count - end)
+  for i in reversed(range(end)):
+    for j, cycles in successors[i]:
+      if j < end:
+        height[i] = max(height[i], cycles + height[j])
+      if deadline[j] < count:
+        deadline[i] = min(deadline[i], deadline[j] - cycles)
+
+  earliest = [0] * count
+  waiting = [(0, i) for i in range(end) if indegree[i] == 0]  # (first cycle its operands are ready, index)
+  ready = []                                                  # (-height, index), ties keep the original order
+  urgent = []                                                 # (deadline, index) of the ready ones feeding the branch
+  issued = [False] * end
+  order = []
+  cycle = 0
+  stalls = 0
+  while len(order) < end:
+    while ready and issued[ready[0][1]]:
+      heapq.heappop(ready)
+    while urgent and issued[urgent[0][1]]:
+      heapq.heappop(urgent)
+    if not ready and waiting[0][0] > cycle:
+      stalls += waiting[0][0] - cycle
+      cycle = waiting[0][0]  # stall until the next instruction is ready
+    while waiting and waiting[0][0] <= cycle:
+      i = heapq.heappop(waiting)[1]
+      heapq.heappush(ready, (-height[i], i))
+      if deadline[i] < count:
+        heapq.heappush(urgent, (deadline[i], i))
+    # an instruction the branch depends on goes first once it has no cycle left to wait
+    i = heapq.heappop(urgent if urgent and urgent[0][0] <= cycle else ready)[1]
+    issued[i] = True
+    order.append(i)
+    for j, cycles in successors[i]:
+      earliest[j] = max(earliest[j], cycle + cycles)
+      indegree[j] -= 1
+      if indegree[j] == 0 and j < end:
+        heapq.heappush(waiting, (earliest[j], j))
+    cycle += 1
+  if end < count:
+    stalls += max(earliest[end] - cycle, 0)
+  if instrument.enabled:
+    instrument.count('schedule.subsets')
+    if stalls:
+      instrument.count('schedule.stall_cycles', stalls)
+  return order + list(range(end, count))
 
 # %% [markdown]
-# 
+# `schedule_instructions()` is tested by `t5_test()` along with `reorder_instructions()`.
 
 # %% [markdown]
-# The function below loops through all `subsets` and runs `reorder_instructions()` from Task 5 on each `subset` until the entire original set of instructions loaded from `fiilename` has been processed.
-# 
+# The function below loops through all `subsets` and runs `schedule_instructions()` on each `subset` until the entire original set of instructions loaded from `fiilename` has been processed.
 # 
+#
 
 # %%
-#@title
-filename = "example.asm" #@param {type:"string"}
-# filename = "example.asm"
+@instrument.timed('parse')
+def tokenize(lines):
+  # catching up to where this would inject into Lab #03 (see iter_tokens())
+  return list(iter_tokens(lines))
 
-# %%
-t6_test(filename)
 
-# %%
-!pwd
-!ls
+@instrument.timed('schedule')
+def reorder_program(instructions):
+  # split the instructions into subsets
+  subsets = splitAssemblyIntoSubsets(instructions)
+
+  # loop through the subsets and reorder the instructions to avoid data dependencies
+  reordered_instructions = []
+  for subset in subsets:
+    # for labels or single or a pair of instructions
+    if len(subset) <= 2:
+      reordered_instructions += subset
+    # subsets with more than two instructions
+    else:
+      reordered_instructions += schedule_instructions(subset)
+  return reordered_instructions
+
+# %% [markdown]
+# `reorder_program()` on the instructions loaded from `filename` is tested by `t6_test()`.
 
 # %%
+# FOR TESTING: checks that the single-pass lexer matches the four separate passes
+def tokenize_test(filename):
+  instructions = read(filename)
+  correct = remove_comments(list(instructions))
+  correct = split_arg(correct)
+  correct = remove_empty(correct)
+  correct = loadsave_arg_reorder(correct)
 
+  print("Testing "+YELLOW+"tokenize()"+END+" with: "+PINK+filename+END)
+  returned = tokenize(instructions)
+  color = GREEN if returned == correct else RED
+  print("Returned answer: "+color+("matches" if returned == correct else "differs from")+END+" remove_comments()/split_arg()/remove_empty()/loadsave_arg_reorder()")
+  for i, (line_a, line_b) in enumerate(zip(correct, returned)):
+    if line_a != line_b:
+      print(RED+f"first difference at instruction {i}: {line_a} != {line_b}"+END)
+      break
+  print()
 
 
+# %%
+# FOR TESTING: runs every task test
+def run_tests(filename="example.asm"):
+  tokenize_test(filename)
+  t1_test()
+  t2_test()
+  t3_test()
+  t4_test()
+  t5_test()
+  t6_test()
@@ -0,0 +1,349 @@
+# RV32IM instruction-set simulator for the machine code written by save_bin().
+#
+# The program is decoded once into a list of closures, one per instruction, that update the
+# registers and return the index of the next instruction, so running it is a loop of
+# `pc = code[pc]()`. Instruction and data memory are separate: data memory is a bytearray
+# starting at address 0 and sp starts at its top. Writes to x0 go to a spare register.
+# Running off the end of the program, or a jal to itself, halts.
+#
+# Decoding follows the repo's B and J layouts (see decode.py); the all-zero word the
+# assembler emits for formats it cannot encode runs as a NOP.
+
+import struct
+from collections import namedtuple
+
+from .decode import build_decode_table, decode_word, read_program
+from .hazards import PipelineTimer, LOADS
+
+MASK = 0xFFFFFFFF
+SIGN = 0x80000000
+MEM_SIZE = 1 << 16
+MAX_STEPS = 10_000_000
+X0_SINK = 32  # register index that takes the writes to x0
+
+_WORD = struct.Struct('<I')
+_HALF = struct.Struct('<H')
+_SHALF = struct.Struct('<h')
+
+SimulationResult = namedtuple('SimulationResult', 'steps halted pc regs memory stalls')
+
+
+class SimulationError(ValueError):
+    '''an instruction could not be executed; `pc` is its address'''
+
+    def __init__(self, message, pc=None):
+        super().__init__(message)
+        self.pc = pc
+
+
+class _Halt(Exception):
+    pass
+
+
+## Signed value of a register
+def _s(value):
+    return value - ((value & SIGN) << 1)
+
+def _div(a, b):
+    if b == 0:
+        return MASK
+    a, b = _s(a), _s(b)
+    if a == -SIGN and b == -1:
+        return SIGN
+    q = abs(a) // abs(b)
+    return (q if (a < 0) == (b < 0) else -q) & MASK
+
+def _rem(a, b):
+    if b == 0:
+        return a
+    a, b = _s(a), _s(b)
+    if a == -SIGN and b == -1:
+        return 0
+    r = abs(a) % abs(b)
+    return (r if a >= 0 else -r) & MASK
+
+
+# %% [markdown]
+# Handler factories: `factory(r, m, rd, rs1, rs2, imm, nxt, target)` returns the closure of one instruction, where `r` is the register list, `m` the data memory, `nxt` the index of the next instruction and `target` the index a branch or jal goes to.
+
+# %%
+def _add(r, m, rd, rs1, rs2, imm, nxt, target):
+    def run():
+        r[rd] = (r[rs1] + r[rs2]) & MASK
+        return nxt
+    return run
+
+def _sub(r, m, rd, rs1, rs2, imm, nxt, target):
+    def run():
+        r[rd] = (r[rs1] - r[rs2]) & MASK
+        return nxt
+    return run
+
+def _addi(r, m, rd, rs1, rs2, imm, nxt, target):
+    def run():
+        r[rd] = (r[rs1] + imm) & MASK
+        return nxt
+    return run
+
+def _lw(r, m, rd, rs1, rs2, imm, nxt, target):
+    unpack = _WORD.unpack_from
+    def run():
+        r[rd] = unpack(m, (r[rs1] + imm) & MASK)[0]
+        return nxt
+    return run
+
+def _sw(r, m, rd, rs1, rs2, imm, nxt, target):
+    pack = _WORD.pack_into
+    def run():
+        pack(m, (r[rs1] + imm) & MASK, r[rs2])
+        return nxt
+    return run
+
+def _beq(r, m, rd, rs1, rs2, imm, nxt, target):
+    def run():
+        return target if r[rs1] == r[rs2] else nxt
+    return run
+
+def _bne(r, m, rd, rs1, rs2, imm, nxt, target):
+    def run():
+        return target if r[rs1] != r[rs2] else nxt
+    return run
+
+def _jal(r, m, rd, rs1, rs2, imm, nxt, target):
+    link = imm  # predecoded return address
+    def run():
+        r[rd] = link
+        return target
+    return run
+
+def _alu(f):
+    '''factory for R-type instructions computing f(rs1 value, rs2 value)'''
+    def factory(r, m, rd, rs1, rs2, imm, nxt, target):
+        def run():
+            r[rd] = f(r[rs1], r[rs2])
+            return nxt
+        return run
+    return factory
+
+def _alu_imm(f):
+    '''factory for I-type instructions computing f(rs1 value, imm)'''
+    def factory(r, m, rd, rs1, rs2, imm, nxt, target):
+        def run():
+            r[rd] = f(r[rs1], imm)
+            return nxt
+        return run
+    return factory
+
+def _load(f):
+    '''factory for loads reading f(memory, address)'''
+    def factory(r, m, rd, rs1, rs2, imm, nxt, target):
+        def run():
+            r[rd] = f(m, (r[rs1] + imm) & MASK)
+            return nxt
+        return run
+    return factory
+
+def _store(f):
+    '''factory for stores calling f(memory, address, rs2 value)'''
+    def factory(r, m, rd, rs1, rs2, imm, nxt, target):
+        def run():
+            f(m, (r[rs1] + imm) & MASK, r[rs2])
+            return nxt
+        return run
+    return factory
+
+def _branch(f):
+    '''factory for branches taken when f(rs1 value, rs2 value)'''
+    def factory(r, m, rd, rs1, rs2, imm, nxt, target):
+        def run():
+            return target if f(r[rs1], r[rs2]) else nxt
+        return run
+    return factory
+
+def _sh(m, address, value):
+    _HALF.pack_into(m, address, value & 0xFFFF)
+
+def _sb(m, address, value):
+    m[address] = value & 0xFF
+
+
+HANDLERS = {
+    'add': _add, 'sub': _sub,
+    'sll': _alu(lambda a, b: (a << (b & 31)) & MASK),
+    'slt': _alu(lambda a, b: int(_s(a) < _s(b))),
+    'sltu': _alu(lambda a, b: int(a < b)),
+    'xor': _alu(lambda a, b: a ^ b),
+    'srl': _alu(lambda a, b: a >> (b & 31)),
+    'sra': _alu(lambda a, b: (_s(a) >> (b & 31)) & MASK),
+    'or': _alu(lambda a, b: a | b),
+    'and': _alu(lambda a, b: a & b),
+    'mul': _alu(lambda a, b: (a * b) & MASK),
+    'mulh': _alu(lambda a, b: (_s(a) * _s(b) >> 32) & MASK),
+    'mulhsu': _alu(lambda a, b: (_s(a) * b >> 32) & MASK),
+    'mulhu': _alu(lambda a, b: (a * b) >> 32),
+    'div': _alu(_div),
+    'divu': _alu(lambda a, b: a // b if b else MASK),
+    'rem': _alu(_rem),
+    'remu': _alu(lambda a, b: a % b if b else a),
+
+    'addi': _addi,
+    'slti': _alu_imm(lambda a, imm: int(_s(a) < imm)),
+    'sltiu': _alu_imm(lambda a, imm: int(a < (imm & MASK))),
+    'xori': _alu_imm(lambda a, imm: (a ^ imm) & MASK),
+    'ori': _alu_imm(lambda a, imm: (a | imm) & MASK),
+    'andi': _alu_imm(lambda a, imm: a & imm & MASK),
+    'slli': _alu_imm(lambda a, imm: (a << (imm & 31)) & MASK),
+    'srli': _alu_imm(lambda a, imm: a >> (imm & 31)),
+    'srai': _alu_imm(lambda a, imm: (_s(a) >> (imm & 31)) & MASK),
+
+    'lw': _lw,
+    'lb': _load(lambda m, address: (m[address] ^ 0x80) - 0x80 & MASK),
+    'lh': _load(lambda m, address: _SHALF.unpack_from(m, address)[0] & MASK),
+    'lbu': _load(lambda m, address: m[address]),
+    'lhu': _load(lambda m, address: _HALF.unpack_from(m, address)[0]),
+    'sw': _sw, 'sh': _store(_sh), 'sb': _store(_sb),
+
+    'beq': _beq, 'bne': _bne,
+    'blt': _branch(lambda a, b: _s(a) < _s(b)),
+    'bge': _branch(lambda a, b: _s(a) >= _s(b)),
+    'bltu': _branch(lambda a, b: a < b),
+    'bgeu': _branch(lambda a, b: a >= b),
+    'jal': _jal,
+}
+
+
+def _nop(nxt):
+    def run():
+        return nxt
+    return run
+
+def _fault(message, pc):
+    def run():
+        raise SimulationError(message, pc)
+    return run
+
+def _halt():
+    raise _Halt
+
+def _jalr(r, rd, rs1, imm, link, base_address, count, pc):
+    def run():
+        offset = ((r[rs1] + imm) & ~1 & MASK) - base_address
+        r[rd] = link
+        if offset % 4 or not 0 <= offset <= 4 * count:
+            raise SimulationError(f"jalr target {offset + base_address:#x} is outside the program", pc)
+        return offset >> 2
+    return run
+
+
+def predecode(words, regs, memory, table, base_address=0):
+    '''returns (code, info): the closure of each instruction (followed by the halt
+    entry at index len(words) and the fault entries of bad branch targets) and the
+    (uses, defs, load, kind) register masks used for stall counting'''
+    count = len(words)
+    code, info, faults = [], [], []
+    for i, word in enumerate(words):
+        pc = base_address + 4 * i
+        decoded = decode_word(word, table) if word else None
+        if word == 0:
+            code.append(_nop(i + 1))
+            info.append((0, 0, False, None))
+            continue
+        if decoded is None or decoded[0] not in HANDLERS and decoded[0] != 'jalr':
+            name = decoded[0] if decoded else f"{word:#010x}"
+            code.append(_fault(f"Unsupported instruction {name} at {pc:#x}", pc))
+            info.append((0, 0, False, None))
+            continue
+        name, fmt, rd, rs1, rs2, imm = decoded
+        uses = (1 << rs1 | (1 << rs2 if fmt in ('R', 'S', 'B') else 0)) & ~1
+        defs = (1 << rd if fmt in ('R', 'I', 'J') else 0) & ~1
+        kind = 'jump' if name == 'jal' else 'jalr' if name == 'jalr' else 'branch' if fmt == 'B' else None
+        info.append((uses if fmt != 'J' else 0, defs, name in LOADS, kind))
+        if rd == 0:
+            rd = X0_SINK
+
+        target = None
+        if fmt in ('B', 'J'):
+            target = i + imm // 4
+            if target == i and fmt == 'J':
+                target = count  # jump to itself: halt
+            elif imm % 4 or not 0 <= target <= count:
+                faults.append(_fault(f"{name} at {pc:#x} jumps outside the program ({pc + imm:#x})", pc))
+                target = count + len(faults)
+        if name == 'jalr':
+            code.append(_jalr(regs, rd, rs1, imm, pc + 4, base_address, count, pc))
+        elif name == 'jal':
+            code.append(_jal(regs, memory, rd, rs1, rs2, (pc + 4) & MASK, i + 1, target))
+        else:
+            code.append(HANDLERS[name](regs, memory, rd, rs1, rs2, imm, i + 1, target))
+    code.append(_halt)
+    code.extend(faults)
+    return code, info
+
+
+class Simulator:
+    '''runs machine code words (see read_program) on RV32IM.
+    `regs` holds x0..x31 as unsigned 32-bit values and `memory` the data memory.'''
+
+    def __init__(self, words, isa=None, mem_size=MEM_SIZE, base_address=0):
+        self.base_address = base_address
+        self.count = len(words)
+        self._regs = [0] * (X0_SINK + 1)
+        self._regs[2] = mem_size  # sp
+        self.memory = bytearray(mem_size)
+        self.code, self.info = predecode(words, self._regs, self.memory, build_decode_table(isa), base_address)
+        self.index = 0  # index of the next instruction
+        self.steps = 0
+
+    @property
+    def regs(self):
+        return self._regs[:32]
+
+    @property
+    def pc(self):
+        return self.base_address + 4 * self.index
+
+    def run(self, max_steps=MAX_STEPS, stalls=False, config=None):
+        '''executes at most `max_steps` instructions; with stalls=True the executed
+        instructions are also issued on the pipeline `config` (see hazards.PipelineConfig).
+        Returns a SimulationResult; `halted` is False when max_steps ran out first.'''
+        code = self.code
+        pc = self.index
+        steps = 0
+        timer = None
+        try:
+            if stalls:
+                timer = PipelineTimer(config)
+                timings = [timer.timing(*entry) for entry in self.info]
+                issue = timer.issue_timed
+                data = control = 0
+                for steps in range(max_steps):
+                    i = pc
+                    pc = code[i]()
+                    stall = issue(timings[i], pc != i + 1)
+                    data += stall[0]
+                    control += stall[1]
+                else:
+                    steps = max_steps
+            else:
+                for steps in range(max_steps):
+                    pc = code[pc]()
+                else:
+                    steps = max_steps
+        except _Halt:
+            pass
+        except (IndexError, struct.error):
+            address = self.base_address + 4 * pc
+            raise SimulationError(f"Memory access out of range at {address:#x}", address) from None
+        finally:
+            self.index = pc
+            self.steps += steps
+        report = None
+        if timer is not None:
+            report = {'data_stalls': data, 'control_stalls': control, 'cycles': timer.cycles}
+        return SimulationResult(self.steps, pc >= self.count, self.pc, self.regs, self.memory, report)
+
+
+def simulate_file(filename, fmt='auto', isa=None, max_steps=MAX_STEPS, stalls=False, config=None,
+                  mem_size=MEM_SIZE, base_address=0):
+    '''read_program() -> Simulator.run()'''
+    return Simulator(read_program(filename, fmt), isa, mem_size, base_address).run(max_steps, stalls, config)
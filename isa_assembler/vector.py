@@ -0,0 +1,267 @@
+# Vectorized batch encoder: the encode_machine_code() layouts computed with NumPy over whole columns.
+#
+# NumPy is an optional dependency; it is only needed when this module is used.
+
+from array import array
+from itertools import chain, repeat
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the environment
+    np = None
+
+from .convert import get_default_isa, get_line_machine_code, parse_processed_line, read_processed
+
+## Format codes used in the fmt column (OTHER assembles as a NOP)
+FORMAT_CODES = {'R': 0, 'I': 1, 'S': 2, 'B': 3, 'J': 4}
+OTHER = 5
+## Number of operands each format reads (J reads rd, imm)
+OPERANDS = (3, 3, 3, 3, 2, 0)
+
+
+class EncodingError(ValueError):
+    '''raised with every offending row instead of stopping at the first one.
+    `errors` is a list of (row index, message) pairs in row order.'''
+
+    def __init__(self, errors):
+        self.errors = errors
+        shown = '\n'.join(f"row {row}: {message}" for row, message in errors[:10])
+        more = f"\n... and {len(errors) - 10} more" if len(errors) > 10 else ""
+        super().__init__(f"{len(errors)} instruction(s) could not be encoded:\n{shown}{more}")
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("the vectorized encoder needs NumPy (pip install numpy)")
+
+
+## Per-mnemonic columns of the table: name -> id, fmt[id], base[id]
+def build_vector_table(isa=None):
+    '''returns (index, fmt, base): index maps each encodable instruction name
+    to a row of the fmt (format code) and base (base word) arrays'''
+    _require_numpy()
+    from .convert import build_encoder_table
+    table = build_encoder_table(isa)
+    index = {name: i for i, name in enumerate(table)}
+    fmt = np.array([FORMAT_CODES.get(f, OTHER) for f, _ in table.values()], dtype=np.int8)
+    base = np.array([b for _, b in table.values()], dtype=np.int64)
+    return index, fmt, base
+
+
+## Parse the operands into integer columns
+def _columns(inst_asm, index):
+    '''returns (ids, ops, nops): instruction ids (-1 if unknown), the first three
+    operands as an (n, 3) int64 array (0 where missing) and the operand counts.
+    Rows with operands that do not convert to int64 get id -1 so the scalar
+    encoder handles (and reports) them.'''
+    n = len(inst_asm)
+    lens = np.fromiter(map(len, inst_asm), dtype=np.int64, count=n)
+    starts = np.cumsum(lens) - lens
+    tokens = np.fromiter(chain.from_iterable(inst_asm), dtype=object, count=int(lens.sum()))
+    ids = np.full(n, -1, dtype=np.int32)
+    has_name = lens > 0
+    ids[has_name] = np.fromiter(map(index.get, tokens[starts[has_name]].tolist(), repeat(-1)), dtype=np.int32)
+    ops = np.zeros((n, 3), dtype=np.int64)
+    for k in range(3):
+        has = lens > k + 1
+        col = tokens[starts[has] + k + 1]
+        try:
+            ops[has, k] = col.astype(np.int64)
+        except (ValueError, TypeError, OverflowError):
+            # slow path: convert value by value and mark the rows that fail
+            rows = np.flatnonzero(has)
+            for row, val in zip(rows.tolist(), col.tolist()):
+                try:
+                    ops[row, k] = val
+                except (ValueError, TypeError, OverflowError):
+                    ids[row] = -1
+    return ids, ops, lens - 1
+
+
+def _in_range(col, lo, hi):
+    return (col >= lo) & (col < hi)
+
+
+## Pack the columns: returns the words and which rows were packed
+def _pack(ids, ops, nops, fmt_of, base_of):
+    n = len(ids)
+    words = np.zeros(n, dtype=np.int64)
+    known = ids >= 0
+    fmt = np.where(known, fmt_of[np.where(known, ids, 0)], -1)
+    base = np.where(known, base_of[np.where(known, ids, 0)], 0)
+    # too few operands: leave it to the scalar encoder to raise
+    fmt[(fmt >= 0) & (nops < np.array(OPERANDS, dtype=np.int32)[np.maximum(fmt, 0)])] = -1
+
+    o1, o2, o3 = ops[:, 0], ops[:, 1], ops[:, 2]
+    reg1, reg2, reg3 = _in_range(o1, 0, 32), _in_range(o2, 0, 32), _in_range(o3, 0, 32)
+    imm12 = _in_range(o3, -2**11, 2**11)
+    valid = np.zeros(n, dtype=bool)
+
+    sel = fmt == FORMAT_CODES['R']
+    valid[sel] = (reg1 & reg2 & reg3)[sel]
+    words[sel] = base[sel] | o1[sel] << 7 | o2[sel] << 15 | o3[sel] << 20
+
+    sel = fmt == FORMAT_CODES['I']
+    valid[sel] = (reg1 & reg2 & imm12)[sel]
+    words[sel] = base[sel] | o1[sel] << 7 | o2[sel] << 15 | (o3[sel] & 0xFFF) << 20
+
+    sel = fmt == FORMAT_CODES['S']
+    valid[sel] = (reg1 & reg2 & imm12)[sel]
+    imm = o3[sel]
+    words[sel] = base[sel] | (imm & 0x1F) << 7 | o1[sel] << 15 | o2[sel] << 20 | (imm >> 5 & 0x7F) << 25
+
+    sel = fmt == FORMAT_CODES['B']
+    valid[sel] = (reg1 & reg2 & _in_range(o3, -2**12, 2**12))[sel]
+    imm = o3[sel]
+    words[sel] = base[sel] | (imm >> 1 & 0x1F) << 7 | o1[sel] << 15 | o2[sel] << 20 | (imm >> 6 & 0x7F) << 25
+
+    sel = fmt == FORMAT_CODES['J']
+    valid[sel] = (reg1 & _in_range(o2, -2**20, 2**20))[sel]
+    words[sel] = base[sel] | o1[sel] << 7 | (o2[sel] >> 1 & 0xFFFFF) << 12
+
+    sel = fmt == OTHER
+    valid[sel] = True
+    return words, valid
+
+
+## Scalar fallback for the rows _pack() could not encode
+def _fill_invalid(words, valid, get_line, isa):
+    '''reproduces the result, or the error message, of the string encoder'''
+    errors = []
+    for row in np.flatnonzero(~valid).tolist():
+        try:
+            words[row] = int(get_line_machine_code(get_line(row), isa), 2)
+        except (KeyError, ValueError, IndexError, TypeError) as e:
+            errors.append((row, str(e)))
+    if errors:
+        raise EncodingError(errors)
+    return words.astype(np.uint32)
+
+
+def encode_machine_code_vector(inst_asm, isa=None, vector_table=None):
+    '''converts the assembly code to machine code words like encode_machine_code(),
+    returned as a NumPy uint32 array. Rows are grouped by format and packed with
+    whole-column shifts and masks; rows the columns cannot represent go through
+    the scalar get_line_machine_code(). Every row that fails raises together in
+    one EncodingError.'''
+    _require_numpy()
+    if isa is None:
+        isa = get_default_isa()
+    if vector_table is None:
+        vector_table = build_vector_table(isa)
+    index, fmt_of, base_of = vector_table
+    if len(inst_asm) == 0:
+        return np.zeros(0, dtype=np.uint32)
+    words, valid = _pack(*_columns(inst_asm, index), fmt_of, base_of)
+    return _fill_invalid(words, valid, inst_asm.__getitem__, isa)
+
+
+# %% [markdown]
+# Reading a `*_out1.txt` file straight into columns: tokens are found with whole-buffer masks over the raw bytes, integer operands are converted digit column by digit column and mnemonics are looked up with `searchsorted`, so no Python object is created per token.
+# 
+# _Lines the columns cannot represent (non-integer operands, very long tokens, unknown instructions) are re-read with `parse_processed_line()` and encoded by the scalar path._
+
+# %%
+## str.split() whitespace within ASCII
+_WHITESPACE = None
+if np is not None:
+    _WHITESPACE = np.zeros(256, dtype=bool)
+    _WHITESPACE[[9, 10, 11, 12, 13, 28, 29, 30, 31, 32]] = True
+
+MAX_TOKEN_BYTES = 18  # longer integers would overflow int64
+
+
+def _parse_columns(data, index):
+    '''returns (ids, ops, nops, line_starts) for the bytes of a pre-processed
+    file, with the same rows as read_processed(). Rows that need the scalar
+    path get id -1.'''
+    buf = np.frombuffer(data, dtype=np.uint8)
+    newlines = np.flatnonzero(buf == 10)
+    line_starts = np.concatenate(([0], newlines + 1))
+    if len(buf) == 0 or buf[-1] == 10:
+        line_starts = line_starts[:-1]
+    n = len(line_starts)
+
+    # token boundaries
+    is_tok = ~_WHITESPACE[buf]
+    edges = np.diff(np.concatenate(([False], is_tok, [False])).astype(np.int8))
+    tok_start = np.flatnonzero(edges == 1)
+    tok_len = np.flatnonzero(edges == -1) - tok_start
+    tok_line = np.searchsorted(newlines, tok_start)
+    counts = np.bincount(tok_line, minlength=n)[:n]
+    first_tok = np.cumsum(counts) - counts
+
+    # token bytes as a fixed-width (tokens, width) matrix, zero padded
+    width = max(1, min(int(tok_len.max()) if len(tok_len) else 1, MAX_TOKEN_BYTES))
+    cols = np.arange(width)
+    inside = cols < tok_len[:, None]
+    chars = np.where(inside, buf[np.minimum(tok_start[:, None] + cols, len(buf) - 1)], 0).astype(np.uint8)
+    too_long = tok_len > MAX_TOKEN_BYTES
+
+    # integers: [+-]?[0-9]+, like the regex in parse_processed_line()
+    digit = (chars >= 48) & (chars <= 57) & inside
+    signed = (chars[:, 0] == 43) | (chars[:, 0] == 45)
+    digit[:, 0] |= signed & (tok_len > 1)
+    is_int = digit.sum(axis=1) == tok_len
+    is_int &= ~too_long
+    values = np.zeros(len(tok_len), dtype=np.int64)
+    for j in range(width):
+        step = inside[:, j] & ~(signed & (j == 0))
+        values = np.where(step, values * 10 + (chars[:, j].astype(np.int64) - 48), values)
+    values = np.where(signed & (chars[:, 0] == 45), -values, values)
+
+    # mnemonic ids
+    nops = counts.astype(np.int32) - 1
+    has_name = counts > 0
+    ids = np.full(n, -1, dtype=np.int32)
+    names = np.array([name.encode() for name in sorted(index)], dtype='S')
+    name_ids = np.array([index[name] for name in sorted(index)], dtype=np.int32)
+    first = first_tok[has_name]
+    mnemonic = chars[first].view(f'S{width}').ravel()
+    if names.dtype.itemsize > width:
+        mnemonic = mnemonic.astype(names.dtype)
+    else:
+        names = names.astype(mnemonic.dtype)
+    pos = np.minimum(np.searchsorted(names, mnemonic), len(names) - 1)
+    found = (names[pos] == mnemonic) & ~too_long[first]
+    ids[np.flatnonzero(has_name)[found]] = name_ids[pos[found]]
+
+    # operand columns; a non-integer operand sends the row to the scalar path
+    ops = np.zeros((n, 3), dtype=np.int64)
+    for k in range(3):
+        has = counts > k + 1
+        tok = first_tok[has] + k + 1
+        ops[has, k] = values[tok]
+        ids[np.flatnonzero(has)[~is_int[tok]]] = -1
+    return ids, ops, nops, line_starts
+
+
+def encode_processed_file_vector(filename, isa=None, vector_table=None):
+    '''read_processed() + encode_machine_code_vector() for a `*_out1.txt` file,
+    parsing the file straight into columns. Returns a NumPy uint32 array.'''
+    _require_numpy()
+    if isa is None:
+        isa = get_default_isa()
+    if vector_table is None:
+        vector_table = build_vector_table(isa)
+    index, fmt_of, base_of = vector_table
+    with open(filename, 'rb') as f:
+        data = f.read()
+    if b'\r' in data:
+        # text mode reads \r\n and a lone \r as line endings
+        data = data.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+    if not data.isascii():
+        # non-ASCII whitespace rules differ; parse the text the scalar way
+        return encode_machine_code_vector(read_processed(filename, isa), isa, vector_table)
+    ids, ops, nops, line_starts = _parse_columns(data, index)
+    if len(ids) == 0:
+        return np.zeros(0, dtype=np.uint32)
+    words, valid = _pack(ids, ops, nops, fmt_of, base_of)
+    ends = np.append(line_starts[1:], len(data))
+    get_line = lambda row: parse_processed_line(data[line_starts[row]:ends[row]].decode(), isa)
+    return _fill_invalid(words, valid, get_line, isa)
+
+
+def to_array(words):
+    '''converts a uint32 NumPy array to an array('I') like encode_machine_code() returns'''
+    return array('I', words.astype(np.uint32, copy=False).tobytes())